@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import Category, Transaction, Budget, Investment
+from .models import Category, Transaction, Budget, Investment, MonthlyCategoryTotal, BudgetAlert, InvestmentValuation
 
 # Register your models here.
 admin.site.register(Category)
 admin.site.register(Transaction)
 admin.site.register(Budget)
-admin.site.register(Investment)
\ No newline at end of file
+admin.site.register(Investment)
+admin.site.register(MonthlyCategoryTotal)
+admin.site.register(BudgetAlert)
+admin.site.register(InvestmentValuation)
@@ -0,0 +1,175 @@
+"""
+Budget threshold alerts.
+
+The MonthlyCategoryTotal rollup already is a running, atomically updated
+spend counter per (user, category, month), i.e. per budget month. Whenever
+rollups.apply_deltas() changes expense totals, check_keys() compares the
+new totals of the affected budgets with BUDGET_ALERT_THRESHOLDS (percent of
+monthly_limit) and creates, clears or re-arms BudgetAlert rows. The cost
+is a fixed number of queries per write, whatever the size of the ledger.
+
+Each threshold fires once per budget: the (budget, threshold) row is unique.
+When an edit or delete takes spend back under a threshold the alert is
+cleared, and crossing it again fires it again. Events are handed to the
+callables listed in BUDGET_ALERT_SINKS after the DB transaction commits.
+Sinks run on the thread that committed, so webhook_sink only queues the
+POST: one background thread per process delivers the batches in order,
+each with BUDGET_ALERT_WEBHOOK_TIMEOUT, and the response is sent without
+waiting for the receiver.
+"""
+import json
+import logging
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Budget, BudgetAlert, MonthlyCategoryTotal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = (80, 100)
+CROSSED = 'budget.threshold_crossed'
+CLEARED = 'budget.threshold_cleared'
+
+_webhook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='budget-alert-webhook')
+
+
+def get_thresholds():
+    return sorted(getattr(settings, 'BUDGET_ALERT_THRESHOLDS', DEFAULT_THRESHOLDS))
+
+
+def is_crossed(spent, limit, threshold):
+    if limit <= 0:
+        return spent > 0
+    return spent * 100 >= limit * threshold
+
+
+def check_keys(keys, chunk_size=500):
+    """Re-evaluate the budgets matching rollup keys (user, category, type, year, month)."""
+    months = sorted({(user_id, category_id, year, month) for user_id, category_id, tx_type, year, month in keys
+                     if tx_type == 'expense'})
+    for i in range(0, len(months), chunk_size):
+        q = reduce(or_, (
+            Q(user_id=user_id, category_id=category_id, year=year, month=month)
+            for user_id, category_id, year, month in months[i:i + chunk_size]
+        ))
+        check_budgets(Budget.objects.filter(q))
+
+
+def check_budgets(budgets):
+    """Create, clear or re-arm the alerts of the given budgets from their current month's spend."""
+    budgets = list(budgets)
+    if not budgets:
+        return []
+
+    spend_q = reduce(or_, (
+        Q(user_id=b.user_id, category_id=b.category_id, year=b.year, month=b.month) for b in budgets
+    ))
+    spent = {
+        (user_id, category_id, year, month): total
+        for user_id, category_id, year, month, total in MonthlyCategoryTotal.objects
+        .filter(spend_q, type='expense')
+        .values_list('user_id', 'category_id', 'year', 'month', 'total')
+    }
+    existing = {
+        (alert.budget_id, alert.threshold): alert
+        for alert in BudgetAlert.objects.select_for_update().filter(budget__in=budgets)
+    }
+
+    now = timezone.now()
+    created, updated, events = [], [], []
+    for budget in budgets:
+        total = spent.get((budget.user_id, budget.category_id, budget.year, budget.month), Decimal('0'))
+        for threshold in get_thresholds():
+            crossed = budget.is_active and is_crossed(total, budget.monthly_limit, threshold)
+            alert = existing.get((budget.id, threshold))
+            if crossed and alert is None:
+                alert = BudgetAlert(
+                    user_id=budget.user_id, budget=budget, threshold=threshold,
+                    spent=total, monthly_limit=budget.monthly_limit, triggered_at=now
+                )
+                created.append(alert)
+            elif crossed and not alert.is_active:
+                alert.is_active = True
+                alert.spent, alert.monthly_limit = total, budget.monthly_limit
+                alert.triggered_at, alert.cleared_at = now, None
+                updated.append(alert)
+            elif not crossed and alert is not None and alert.is_active:
+                alert.is_active = False
+                alert.cleared_at = now
+                updated.append(alert)
+            else:
+                continue
+            events.append((alert, budget))
+
+    if created:
+        BudgetAlert.objects.bulk_create(created)
+    if updated:
+        BudgetAlert.objects.bulk_update(updated, ['is_active', 'spent', 'monthly_limit', 'triggered_at', 'cleared_at'])
+    events = [event_for(alert, budget) for alert, budget in events]
+    if events and get_sinks():
+        transaction.on_commit(lambda: dispatch(events))
+    return events
+
+
+def event_for(alert, budget):
+    return {
+        'event': CROSSED if alert.is_active else CLEARED,
+        'alert_id': alert.pk,
+        'user_id': alert.user_id,
+        'budget_id': budget.id,
+        'category_id': budget.category_id,
+        'year': budget.year,
+        'month': budget.month,
+        'threshold': alert.threshold,
+        'spent': str(alert.spent),
+        'monthly_limit': str(alert.monthly_limit),
+        'at': (alert.triggered_at if alert.is_active else alert.cleared_at).isoformat(),
+    }
+
+
+# Sinks
+
+def get_sinks():
+    return [import_string(path) for path in getattr(settings, 'BUDGET_ALERT_SINKS', [])]
+
+
+def dispatch(events):
+    for sink in get_sinks():
+        try:
+            sink(events)
+        except Exception:
+            # Alerts are already stored; a failing sink must not break the write that triggered them
+            logger.exception("Budget alert sink %r failed", sink)
+
+
+def log_sink(events):
+    for event in events:
+        logger.info("%s", json.dumps(event))
+
+
+def webhook_sink(events):
+    """POST the events as JSON to BUDGET_ALERT_WEBHOOK_URL, from a background thread."""
+    _webhook_executor.submit(post_webhook, events)
+
+
+def post_webhook(events):
+    request = urllib.request.Request(
+        settings.BUDGET_ALERT_WEBHOOK_URL,
+        data=json.dumps({'events': events}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=settings.BUDGET_ALERT_WEBHOOK_TIMEOUT):
+            pass
+    except Exception:
+        logger.exception("Budget alert webhook delivery failed")
@@ -0,0 +1,380 @@
+"""
+Queries and response bodies of the analytics views.
+
+Each *_queries() function returns {name: callable}, one callable per query,
+none of which depends on another's result. The sync views in views.py
+evaluate them one after another with run(); the async views in
+async_views.py run them concurrently. The matching *_payload() function
+builds the response body from the results, so both flavours answer with
+the same data. Views with query parameters parse them with the matching
+*_range() function, which raises ValueError with the message for the client.
+
+Category names come from the user's category map (categories.py), one more
+entry in the queries that costs no query while the map is cached, instead
+of joins in every query.
+"""
+from datetime import date
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+
+from . import categories as category_map
+from . import budgets, periods, rollups
+from .models import Budget, Investment, MonthlyCategoryTotal, Transaction
+
+MAX_SUMMARY_BUCKETS = 5000
+MAX_PROGRESS_MONTHS = 120
+TRUNC_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+
+def run(queries):
+    return {name: query() for name, query in queries.items()}
+
+
+# Dashboard
+
+def dashboard_queries(user, today):
+    user_rollups = MonthlyCategoryTotal.objects.filter(user=user)
+    current_month_q = Q(year=today.year, month=today.month)
+    return {
+        # Current month and all-time totals in one pass over the rollup
+        'totals': lambda: user_rollups.aggregate(
+            monthly_income=Sum('total', filter=current_month_q & Q(type='income'), default=0),
+            monthly_expenses=Sum('total', filter=current_month_q & Q(type='expense'), default=0),
+            all_time_income=Sum('total', filter=Q(type='income'), default=0),
+            all_time_expenses=Sum('total', filter=Q(type='expense'), default=0),
+        ),
+        # Spend per category this month: feeds both the top categories and the budgets
+        'month_spend': lambda: list(
+            user_rollups
+            .filter(current_month_q, type='expense')
+            .values_list('category_id', 'total')
+        ),
+        'recent_transactions': lambda: list(
+            Transaction.objects.filter(user=user)
+            .order_by('-date', '-created_at')[:5]
+        ),
+        'portfolio': lambda: Investment.objects.filter(user=user).aggregate(
+            total_invested=Sum('amount_invested', default=0),
+            total_current_value=Sum('current_value', default=0),
+        ),
+        'budgets': lambda: list(
+            Budget.objects.filter(user=user, month=today.month, year=today.year, is_active=True)
+        ),
+        'categories': lambda: category_map.for_user(user),
+    }
+
+
+def dashboard_payload(results, today):
+    totals = results['totals']
+    monthly_income = totals['monthly_income']
+    monthly_expenses = totals['monthly_expenses']
+    current_balance = totals['all_time_income'] - totals['all_time_expenses']
+
+    categories = results['categories']
+    current_month_spend = results['month_spend']
+    spent_by_category = dict(current_month_spend)
+    top_categories = sorted(current_month_spend, key=lambda row: row[1], reverse=True)[:5]
+
+    total_invested = results['portfolio']['total_invested']
+    total_current_value = results['portfolio']['total_current_value']
+
+    budget_progress = []
+    for budget in results['budgets']:
+        spent = spent_by_category.get(budget.category_id, 0)
+        progress_percentage = (spent / budget.monthly_limit * 100) if budget.monthly_limit > 0 else 0
+        budget_progress.append({
+            'category': categories.name(budget.category_id),
+            'budgeted': float(budget.monthly_limit),
+            'spent': float(spent),
+            'remaining': float(budget.monthly_limit - spent),
+            'progress_percentage': round(progress_percentage, 2),
+            'is_over_budget': spent > budget.monthly_limit
+        })
+
+    return {
+        'current_month_summary': {
+            'income': float(monthly_income),
+            'expenses': float(monthly_expenses),
+            'net_income': float(monthly_income - monthly_expenses),
+            'month': today.month,
+            'year': today.year
+        },
+        'overall_summary': {
+            'total_balance': float(current_balance),
+            'total_invested': float(total_invested),
+            'portfolio_value': float(total_current_value),
+            'portfolio_gain_loss': float(total_current_value - total_invested)
+        },
+        'top_spending_categories': [
+            {'category': categories.name(category_id), 'amount': float(total)}
+            for category_id, total in top_categories
+        ],
+        'recent_transactions': [
+            {
+                'id': t.id,
+                'amount': float(t.amount),
+                'type': t.type,
+                'category': categories.name(t.category_id),
+                'description': t.description,
+                'date': t.date
+            }
+            for t in results['recent_transactions']
+        ],
+        'budget_progress': budget_progress
+    }
+
+
+# Monthly summary
+
+def monthly_summary_range(query_params, today):
+    """(start, end, granularity, year) of a request; year is None for an explicit start/end range."""
+    granularity = query_params.get('granularity', 'month')
+    if granularity not in periods.GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(periods.GRANULARITIES)}")
+
+    # Either an explicit start/end range or a single calendar year
+    year = None
+    if query_params.get('start') or query_params.get('end'):
+        start = periods.parse_bound(query_params.get('start', str(today.year)))
+        end = periods.parse_bound(query_params.get('end', str(today.year)), is_end=True)
+    else:
+        try:
+            year = int(query_params.get('year', today.year))
+        except ValueError:
+            raise ValueError("year must be an integer")
+        start, end = date(year, 1, 1), date(year, 12, 31)
+
+    if start > end:
+        raise ValueError("start must not be after end")
+    if sum(1 for _ in periods.iter_buckets(start, end, granularity)) > MAX_SUMMARY_BUCKETS:
+        raise ValueError(f"Range too large for {granularity} granularity")
+    return start, end, granularity, year
+
+
+def monthly_totals(user, start, end, granularity):
+    """One grouped query with conditional income/expense sums: {bucket_start: (income, expenses)}"""
+    income_q = Q(type='income')
+    expense_q = Q(type='expense')
+
+    if granularity in ('month', 'quarter', 'year') and periods.is_whole_months(start, end):
+        rows = (
+            MonthlyCategoryTotal.objects.filter(user=user)
+            .filter(rollups.month_range_q((start.year, start.month), (end.year, end.month)))
+            .values('year', 'month')
+            .annotate(income=Sum('total', filter=income_q), expenses=Sum('total', filter=expense_q))
+            .order_by()
+        )
+        keyed = (
+            (periods.bucket_start(date(row['year'], row['month'], 1), granularity), row)
+            for row in rows
+        )
+    else:
+        rows = (
+            Transaction.objects.filter(user=user, **periods.date_range_filter(start, end))
+            .annotate(period=TRUNC_FUNCTIONS[granularity]('date'))
+            .values('period')
+            .annotate(income=Sum('amount', filter=income_q), expenses=Sum('amount', filter=expense_q))
+            .order_by()
+        )
+        keyed = ((row['period'], row) for row in rows)
+
+    totals = {}
+    for bucket, row in keyed:
+        income, expenses = totals.get(bucket, (0, 0))
+        totals[bucket] = (income + (row['income'] or 0), expenses + (row['expenses'] or 0))
+    return totals
+
+
+def monthly_summary_queries(user, start, end, granularity):
+    return {'totals': lambda: monthly_totals(user, start, end, granularity)}
+
+
+def monthly_summary_payload(results, start, end, granularity, year):
+    totals = results['totals']
+    summary = []
+    for bucket in periods.iter_buckets(start, end, granularity):
+        income, expenses = totals.get(bucket, (0, 0))
+        item = {
+            'period': bucket,
+            'income': float(income),
+            'expenses': float(expenses),
+            'net_income': float(income - expenses)
+        }
+        if granularity == 'month':
+            item['year'] = bucket.year
+            item['month'] = bucket.month
+        summary.append(item)
+
+    data = {
+        'start': start,
+        'end': end,
+        'granularity': granularity,
+        'summary': summary
+    }
+    if year is not None:
+        data['year'] = year
+    if granularity == 'month':
+        data['monthly_summary'] = summary
+    return data
+
+
+# Category breakdown
+
+def whole_month_range(start, end):
+    """((year, month), (year, month)) when the range covers whole months, else None."""
+    if start and start.day != 1:
+        return None
+    if end and end != periods.month_range(end.year, end.month)[1]:
+        return None
+    return (
+        (start.year, start.month) if start else None,
+        (end.year, end.month) if end else None
+    )
+
+
+def category_breakdown_queries(user, start, end):
+    month_range = whole_month_range(start, end)
+    if month_range is not None:
+        # Whole months can be answered from the rollup
+        rows = MonthlyCategoryTotal.objects.filter(user=user).filter(rollups.month_range_q(*month_range))
+        amount_field = 'total'
+    else:
+        rows = Transaction.objects.filter(user=user, **periods.date_range_filter(start, end))
+        amount_field = 'amount'
+
+    def breakdown(tx_type):
+        # Grouping by category id is grouping by name: names are unique per user and type
+        return lambda: list(
+            rows.filter(type=tx_type)
+            .values('category_id')
+            .annotate(total=Sum(amount_field))
+            .order_by('-total')
+        )
+    return {
+        'income': breakdown('income'),
+        'expenses': breakdown('expense'),
+        'categories': lambda: category_map.for_user(user),
+    }
+
+
+def category_breakdown_payload(results, start_date, end_date):
+    categories = results['categories']
+    return {
+        'date_range': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'income_by_category': [
+            {'category': categories.name(item['category_id']), 'amount': float(item['total'])}
+            for item in results['income']
+        ],
+        'expenses_by_category': [
+            {'category': categories.name(item['category_id']), 'amount': float(item['total'])}
+            for item in results['expenses']
+        ]
+    }
+
+
+# Investment performance
+
+def investment_performance_queries(user):
+    investments = Investment.objects.filter(user=user)
+    return {
+        'totals': lambda: investments.aggregate(
+            total_invested=Sum('amount_invested', default=0),
+            total_current_value=Sum('current_value', default=0),
+        ),
+        'investments': lambda: list(investments),
+        'by_type': lambda: list(
+            investments.values('type')
+            .annotate(total_invested=Sum('amount_invested'), total_current_value=Sum('current_value'))
+            .order_by()
+        ),
+    }
+
+
+def investment_performance_payload(results):
+    total_invested = results['totals']['total_invested']
+    total_current_value = results['totals']['total_current_value']
+    total_profit_loss = total_current_value - total_invested
+    overall_return_percentage = (total_profit_loss / total_invested) * 100 if total_invested > 0 else 0
+
+    type_breakdown = []
+    for item in results['by_type']:
+        invested = item['total_invested'] or 0
+        current = item['total_current_value'] or 0
+        profit_loss = current - invested
+        percentage = (profit_loss / invested * 100) if invested > 0 else 0
+        type_breakdown.append({
+            'type': item['type'],
+            'total_invested': float(invested),
+            'total_current_value': float(current),
+            'profit_loss': float(profit_loss),
+            'profit_loss_percentage': round(percentage, 2)
+        })
+
+    return {
+        'portfolio_summary': {
+            'total_invested': float(total_invested),
+            'total_current_value': float(total_current_value),
+            'total_profit_loss': float(total_profit_loss),
+            'overall_return_percentage': round(overall_return_percentage, 2)
+        },
+        'individual_investments': [
+            {
+                'id': investment.id,
+                'name': investment.name,
+                'type': investment.type,
+                'amount_invested': float(investment.amount_invested),
+                'current_value': float(investment.current_value),
+                'profit_loss': float(investment.profit_loss),
+                'profit_loss_percentage': float(investment.profit_loss_percentage),
+                'purchase_date': investment.purchase_date
+            }
+            for investment in results['investments']
+        ],
+        'performance_by_type': type_breakdown
+    }
+
+
+# Budget progress
+
+def budget_progress_range(query_params, today):
+    """((year, month), (year, month), single): ?from=2024-01&to=2025-12, or ?month=&year= for a single month."""
+    if 'from' in query_params or 'to' in query_params:
+        start = periods.parse_bound(query_params.get('from') or query_params['to'])
+        end = periods.parse_bound(query_params.get('to') or query_params['from'], is_end=True)
+        start, end = (start.year, start.month), (end.year, end.month)
+        if start > end:
+            raise ValueError("'from' must not be after 'to'")
+        if budgets.month_count(start, end) > MAX_PROGRESS_MONTHS:
+            raise ValueError(f"At most {MAX_PROGRESS_MONTHS} months per request")
+        return start, end, False
+
+    # Single month, defaulting to the current month
+    try:
+        month = int(query_params.get('month', today.month))
+        try:
+            year = int(query_params.get('year', today.year))
+        except ValueError:
+            raise ValueError("year must be an integer")
+    except ValueError:
+        raise ValueError("month and year must be integers")
+    if not 1 <= month <= 12:
+        raise ValueError("month must be between 1 and 12")
+    return (year, month), (year, month), True
+
+
+def budget_progress_queries(user, start, end):
+    return {'report': lambda: budgets.evaluate([user.id], start, end)[user.id]}
+
+
+def budget_progress_payload(results, single):
+    return results['report']['months'][0] if single else results['report']
@@ -0,0 +1,187 @@
+"""
+Async analytics views for ASGI deployments.
+
+These serve the same URLs and responses as their namesakes in views.py
+(settings.ANALYTICS_ASYNC_VIEWS switches urls.py over to them). The
+difference is that a request's independent sub-queries (analytics.py) run
+at the same time: the dashboard's totals, category spend, recent
+transactions, portfolio and budgets take as long as the slowest of them
+instead of their sum, and the event loop serves other requests meanwhile.
+
+They are APIViews whose dispatch() is a coroutine: DRF's initial()
+(authentication, permissions, throttling, content negotiation) runs
+through sync_to_async on the shared thread, as do the response cache and
+ETag validation, and errors go through DRF's exception handler, so the
+responses match the sync views' down to the error bodies and headers.
+
+Thread sensitivity: Django's async ORM (aaggregate(), async for, ...) runs
+every query through sync_to_async(thread_sensitive=True), i.e. on one
+shared thread and one connection, so gathering its coroutines does not
+overlap the queries. Each sub-query here runs on a thread of a bounded
+pool instead (ANALYTICS_QUERY_THREADS, which also bounds the extra
+database connections per process). No request ends on those threads, so
+close_old_connections() runs after every query as request_finished would:
+the connection is closed unless CONN_MAX_AGE keeps it.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import analytics, caching, conditional, periods
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ANALYTICS_QUERY_THREADS,
+    thread_name_prefix='analytics-query',
+)
+
+
+def in_own_connection(query):
+    def run():
+        # Drops the thread's connection if it broke or outlived CONN_MAX_AGE
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather(queries):
+    """analytics.run(), with every query on its own thread and connection at once."""
+    names = list(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(in_own_connection(queries[name]), thread_sensitive=False, executor=_executor)()
+        for name in names
+    ))
+    return dict(zip(names, results))
+
+
+def cached(request, endpoint):
+    """(etag, last_modified, cache key, cached data) of a request, in one sync_to_async hop."""
+    user_id = request.user.pk
+    etag, last_modified = conditional.validators_for(user_id, endpoint, request.query_params)
+    key = caching.response_key(user_id, endpoint, request.query_params)
+    return etag, last_modified, key, caching.get_cache().get(key)
+
+
+def store(key, data):
+    caching.get_cache().set(key, data, caching.get_timeout())
+
+
+class AsyncAnalyticsView(APIView):
+    """Authenticated, conditional and cached GET, like the APIViews' decorators."""
+    permission_classes = [IsAuthenticated]
+    endpoint = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch(), awaiting the handler
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def get(self, request):
+        etag, last_modified, key, data = await sync_to_async(cached)(request, self.endpoint)
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None and data is not None:
+            caching.record(self.endpoint, 'hits')
+            response = Response(data, headers={'X-Cache': 'HIT'})
+        elif response is None:
+            caching.record(self.endpoint, 'misses')
+            response = await self.compute(request)
+            if response.status_code == 200:
+                await sync_to_async(store)(key, response.data)
+            response['X-Cache'] = 'MISS'
+        if response.status_code in (200, 304):
+            conditional.set_validators(response, etag, last_modified)
+        return response
+
+    async def compute(self, request):
+        raise NotImplementedError
+
+
+class DashboardAnalyticsView(AsyncAnalyticsView):
+    endpoint = 'dashboard'
+
+    async def compute(self, request):
+        today = timezone.now().date()
+        results = await gather(analytics.dashboard_queries(request.user, today))
+        return Response(analytics.dashboard_payload(results, today))
+
+
+class MonthlySummaryView(AsyncAnalyticsView):
+    endpoint = 'monthly-summary'
+
+    async def compute(self, request):
+        try:
+            start, end, granularity, year = analytics.monthly_summary_range(
+                request.query_params, timezone.now().date()
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = await gather(analytics.monthly_summary_queries(request.user, start, end, granularity))
+        return Response(analytics.monthly_summary_payload(results, start, end, granularity, year))
+
+
+class CategoryBreakdownView(AsyncAnalyticsView):
+    endpoint = 'category-breakdown'
+
+    async def compute(self, request):
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        try:
+            start = periods.parse_bound(start_date) if start_date else None
+            end = periods.parse_bound(end_date, is_end=True) if end_date else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = await gather(analytics.category_breakdown_queries(request.user, start, end))
+        return Response(analytics.category_breakdown_payload(results, start_date, end_date))
+
+
+class InvestmentPerformanceView(AsyncAnalyticsView):
+    endpoint = 'investment-performance'
+
+    async def compute(self, request):
+        results = await gather(analytics.investment_performance_queries(request.user))
+        return Response(analytics.investment_performance_payload(results))
+
+
+class BudgetProgressView(AsyncAnalyticsView):
+    endpoint = 'budget-progress'
+
+    async def compute(self, request):
+        try:
+            start, end, single = analytics.budget_progress_range(request.query_params, timezone.now().date())
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = await gather(analytics.budget_progress_queries(request.user, start, end))
+        return Response(analytics.budget_progress_payload(results, single))
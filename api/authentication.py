@@ -0,0 +1,157 @@
+"""
+JWT authentication without per-request queries.
+
+simplejwt's JWTAuthentication validates the access token's signature and
+expiry without the database, then loads the User row for every request.
+CachedJWTAuthentication keeps the fields authentication needs
+(CACHED_USER_FIELDS and a digest of the password hash, never the hash) in
+the analytics cache for AUTH_USER_CACHE_TIMEOUT seconds, and rebuilds the
+user from them with the other fields deferred. Saving or deleting a user
+drops their entry once the transaction commits (see signals.py). The cache
+is shared by all workers (caching.check_shared_cache() refuses to start
+several with a process-local one), so deactivation and password changes
+apply on the next request to any worker; bulk update() calls that skip
+signals apply within the timeout.
+
+Logging out blacklists the refresh token and, through revoke(), the access
+token that made the request. Access tokens are checked against a
+process-local set of blacklisted jtis, reloaded from the token_blacklist
+tables at most every AUTH_REVOCATION_REFRESH_SECONDS. Only tokens that
+expire within ACCESS_TOKEN_LIFETIME can be live access tokens, so the set
+stays as small as the logouts of one access lifetime. A revocation made by
+another process is seen after at most one refresh interval; one made in
+this process applies immediately.
+
+prune_tokens deletes the expired rows of both tables in batches.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch, get_md5_hash_password
+
+from . import caching
+
+_revoked = set()  # jtis from the last reload
+_revoked_here = {}  # jti: exp of access tokens revoked by this process, until a reload has them
+_revoked_loaded_at = None  # monotonic time of the last reload
+_revoked_lock = threading.Lock()
+
+CACHED_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+# Users
+
+def user_key(user_id):
+    return f'{caching.KEY_PREFIX}:auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    caching.get_cache().delete(user_key(user_id))
+
+
+def forget_user_on_commit(user_id):
+    # Also now, so this transaction's own later requests don't see the old row
+    forget_user(user_id)
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+# Revoked access tokens
+
+def load_revoked():
+    now = timezone.now()
+    return set(
+        BlacklistedToken.objects
+        .filter(token__expires_at__gt=now, token__expires_at__lte=now + api_settings.ACCESS_TOKEN_LIFETIME)
+        .values_list('token__jti', flat=True)
+    )
+
+
+def is_revoked(jti):
+    global _revoked, _revoked_loaded_at
+    now = time.monotonic()
+    with _revoked_lock:
+        stale = _revoked_loaded_at is None or now - _revoked_loaded_at >= settings.AUTH_REVOCATION_REFRESH_SECONDS
+        if stale and _revoked_loaded_at is not None:
+            # One thread reloads; the others answer from the current set meanwhile
+            _revoked_loaded_at = now
+    if stale:
+        revoked = load_revoked()
+        with _revoked_lock:
+            _revoked = revoked
+            _revoked_loaded_at = now
+            expired = time.time()
+            for revoked_jti, exp in list(_revoked_here.items()):
+                if revoked_jti in revoked or exp <= expired:
+                    del _revoked_here[revoked_jti]
+    with _revoked_lock:
+        return jti in _revoked or jti in _revoked_here
+
+
+def revoke(token, user=None):
+    """Blacklist an access token, as BlacklistMixin.blacklist() does for refresh tokens."""
+    jti = token[api_settings.JTI_CLAIM]
+    outstanding, _ = OutstandingToken.objects.get_or_create(
+        jti=jti,
+        defaults={
+            'user': user,
+            'token': str(token),
+            'created_at': token.current_time,
+            'expires_at': datetime_from_epoch(token['exp']),
+        },
+    )
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    transaction.on_commit(lambda: mark_revoked(jti, token['exp']))
+
+
+def mark_revoked(jti, exp):
+    with _revoked_lock:
+        _revoked_here[jti] = exp
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti is not None and is_revoked(jti):
+            raise InvalidToken(_("Token is blacklisted"))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        cache = caching.get_cache()
+        key = user_key(user_id)
+        # In model field order, as from_db() expects
+        fields = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in CACHED_USER_FIELDS]
+        cached = cache.get(key)
+        if cached is None:
+            row = (
+                self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*fields, 'password').first()
+            )
+            if row is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cached = (row[:-1], get_md5_hash_password(row[-1]))
+            cache.set(key, cached, settings.AUTH_USER_CACHE_TIMEOUT)
+        values, password_digest = cached
+        # The other fields are deferred: reading one queries, save() writes only these
+        user = self.user_model.from_db(router.db_for_read(self.user_model), fields, values)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_digest
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
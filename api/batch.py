@@ -0,0 +1,163 @@
+"""
+List-mode batch endpoints for the model viewsets.
+
+POST   <resource>/batch/  [{...}, ...]           create every item
+PATCH  <resource>/batch/  [{"id": 1, ...}, ...]  partially update every item
+DELETE <resource>/batch/  {"ids": [1, 2, ...]}   delete every item
+
+Referenced categories are validated against the user's cached category map
+and the writes go through bulk_create / bulk_update / a single delete inside
+one atomic block. Rows being updated or deleted are locked with
+select_for_update() first, as Transaction.save() does, so the rollup
+deltas are taken from the rows a concurrent write can no longer change.
+If any item fails validation nothing is written and the response lists the
+errors by item index.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import caching
+from . import categories as category_map
+
+
+class BatchMixin:
+    batch_max_size = 500
+    # Name of the Category FK on the model, or None when it has none
+    batch_category_field = 'category'
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='batch')
+    def batch(self, request):
+        if request.method == 'DELETE':
+            data = request.data.get('ids') if isinstance(request.data, dict) else request.data
+        else:
+            data = request.data
+        if not isinstance(data, list) or not data:
+            return Response({"error": "Expected a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.batch_max_size:
+            return Response(
+                {"error": f"At most {self.batch_max_size} items per batch"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        handler = {
+            'POST': self.batch_create,
+            'PATCH': self.batch_update,
+            'DELETE': self.batch_delete,
+        }[request.method]
+        try:
+            with transaction.atomic():
+                response = handler(data)
+                if response.status_code < 400:
+                    # bulk_create/bulk_update send no signals
+                    caching.bump_version_on_commit(request.user.pk)
+                return response
+        except IntegrityError as e:
+            return Response({"error": f"Batch conflicts with existing data: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    def get_batch_categories(self, items, instances=()):
+        """The user's category map (categories.py), which validates every item without a query."""
+        if not self.batch_category_field:
+            return None
+        return category_map.for_user(self.request.user)
+
+    def get_batch_serializer(self, instance=None, data=None, categories=None, partial=False):
+        context = self.get_serializer_context()
+        context['categories'] = categories
+        return self.get_serializer_class()(instance, data=data, partial=partial, context=context)
+
+    def batch_errors(self, errors):
+        return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Create
+
+    def batch_create(self, items):
+        categories = self.get_batch_categories(items)
+        model = self.get_queryset().model
+        objects, errors = [], []
+        for index, item in enumerate(items):
+            serializer = self.get_batch_serializer(data=item, categories=categories)
+            if serializer.is_valid():
+                objects.append(model(**{**serializer.validated_data, 'user': self.request.user}))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        if errors:
+            return self.batch_errors(errors)
+
+        self.perform_batch_create(objects)
+        data = self.get_serializer(objects, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def perform_batch_create(self, objects):
+        self.get_queryset().model.objects.bulk_create(objects)
+
+    # Update
+
+    def batch_update(self, items):
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        # Locked until commit, so rollup deltas are computed from the rows as they are written over
+        instances = self.get_queryset().select_for_update().order_by('pk').in_bulk(
+            [pk for pk in ids if isinstance(pk, int)]
+        )
+        categories = self.get_batch_categories(items, instances.values())
+
+        changes, errors = [], []
+        fields = set()
+        for index, item in enumerate(items):
+            instance = instances.get(item.get('id')) if isinstance(item, dict) else None
+            if instance is None:
+                errors.append({'index': index, 'errors': {'id': ["Not found."]}})
+                continue
+            data = {key: value for key, value in item.items() if key != 'id'}
+            serializer = self.get_batch_serializer(instance, data=data, categories=categories, partial=True)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            error = self.validate_batch_update(instance, serializer.validated_data, categories)
+            if error:
+                errors.append({'index': index, 'errors': error})
+                continue
+            changes.append((instance, serializer.validated_data))
+            fields.update(serializer.validated_data)
+        if errors:
+            return self.batch_errors(errors)
+
+        self.perform_batch_update(changes, fields)
+        data = self.get_serializer([instance for instance, _ in changes], many=True).data
+        return Response(data)
+
+    def validate_batch_update(self, instance, validated_data, categories):
+        return None
+
+    def perform_batch_update(self, changes, fields):
+        now = timezone.now()
+        objects = []
+        for instance, validated_data in changes:
+            for name, value in validated_data.items():
+                setattr(instance, name, value)
+            instance.updated_at = now
+            objects.append(instance)
+        if objects:
+            self.get_queryset().model.objects.bulk_update(objects, sorted(fields | {'updated_at'}))
+
+    # Delete
+
+    def batch_delete(self, ids):
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.get_queryset().filter(id__in=ids)
+        found = set(queryset.select_for_update().order_by('pk').values_list('id', flat=True))
+        errors = [
+            {'index': index, 'errors': {'id': ["Not found."]}}
+            for index, pk in enumerate(ids) if pk not in found
+        ]
+        if errors:
+            return self.batch_errors(errors)
+
+        deleted = self.perform_batch_delete(queryset)
+        return Response({'deleted': deleted})
+
+    def perform_batch_delete(self, queryset):
+        return queryset.delete()[1].get(queryset.model._meta.label, 0)
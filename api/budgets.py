@@ -0,0 +1,159 @@
+"""
+Set-based budget evaluation.
+
+Spent, remaining, progress and over-budget are computed for every active
+budget of one or many users over a range of months with two queries: one
+for the budgets and one grouped read of the MonthlyCategoryTotal rollup.
+Matching spend to budgets happens in memory, so the cost does not depend
+on the number of budgets, categories or months.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.utils import timezone
+
+from . import periods, rollups
+from .models import Budget, MonthlyCategoryTotal
+
+
+def iter_months(start, end):
+    """Yield (year, month) tuples from start to end inclusive."""
+    year, month = start
+    while (year, month) <= tuple(end):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_count(start, end):
+    return (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+
+
+def percentage(part, whole):
+    return round(part / whole * 100, 2) if whole > 0 else 0
+
+
+def days_left_in_month(year, month, today=None):
+    today = today or timezone.now().date()
+    if (today.year, today.month) == (year, month):
+        return (periods.month_range(year, month)[1] - today).days
+    return 0
+
+
+def load_budgets(user_ids, start, end):
+    """{user_id: {(year, month): [budget rows]}} for active budgets in the range."""
+    budgets = defaultdict(lambda: defaultdict(list))
+    rows = (
+        Budget.objects
+        .filter(rollups.month_range_q(start, end), user_id__in=user_ids, is_active=True)
+        .values('id', 'user_id', 'category_id', 'category__name', 'monthly_limit', 'year', 'month')
+        .order_by('user_id', 'year', 'month', 'category__name', 'id')
+    )
+    for row in rows:
+        budgets[row['user_id']][(row['year'], row['month'])].append(row)
+    return budgets
+
+
+def load_spending(user_ids, start, end):
+    """{user_id: {(year, month): {category_id: (name, total)}}} of expenses in the range."""
+    spending = defaultdict(lambda: defaultdict(dict))
+    rows = (
+        MonthlyCategoryTotal.objects
+        .filter(rollups.month_range_q(start, end), user_id__in=user_ids, type='expense')
+        .values_list('user_id', 'year', 'month', 'category_id', 'category__name', 'total')
+        .order_by('user_id', 'year', 'month', 'category__name')
+    )
+    for user_id, year, month, category_id, name, total in rows:
+        spending[user_id][(year, month)][category_id] = (name, total)
+    return spending
+
+
+def evaluate_month(year, month, budgets, spending, today=None):
+    """Progress report for one month of one user, in the BudgetProgressView response shape."""
+    days_left = days_left_in_month(year, month, today)
+    category_progress = []
+    total_budgeted = Decimal('0')
+    total_spent = Decimal('0')
+
+    for budget in budgets:
+        limit = budget['monthly_limit']
+        spent = spending.get(budget['category_id'], (None, Decimal('0')))[1]
+        category_progress.append({
+            'budget_id': budget['id'],
+            'category_id': budget['category_id'],
+            'category_name': budget['category__name'],
+            'budgeted_amount': float(limit),
+            'spent_amount': float(spent),
+            'remaining_amount': float(limit - spent),
+            'progress_percentage': percentage(spent, limit),
+            'is_over_budget': spent > limit,
+            'days_left_in_month': days_left,
+        })
+        total_budgeted += limit
+        total_spent += spent
+
+    budgeted_categories = {budget['category_id'] for budget in budgets}
+    categories_without_budget = [
+        {'category_id': category_id, 'category_name': name, 'spent_amount': float(spent)}
+        for category_id, (name, spent) in spending.items()
+        if category_id not in budgeted_categories
+    ]
+
+    return {
+        'period': {'month': month, 'year': year},
+        'overall_summary': {
+            'total_budgeted': float(total_budgeted),
+            'total_spent': float(total_spent),
+            'total_remaining': float(total_budgeted - total_spent),
+            'overall_progress_percentage': percentage(total_spent, total_budgeted),
+            'is_over_overall_budget': total_spent > total_budgeted,
+        },
+        'category_progress': category_progress,
+        'categories_without_budget': categories_without_budget,
+    }
+
+
+def summarize(months):
+    total_budgeted = sum(Decimal(str(m['overall_summary']['total_budgeted'])) for m in months)
+    total_spent = sum(Decimal(str(m['overall_summary']['total_spent'])) for m in months)
+    return {
+        'total_budgeted': float(total_budgeted),
+        'total_spent': float(total_spent),
+        'total_remaining': float(total_budgeted - total_spent),
+        'overall_progress_percentage': percentage(total_spent, total_budgeted),
+        'is_over_overall_budget': total_spent > total_budgeted,
+        'months_over_budget': sum(1 for m in months if m['overall_summary']['is_over_overall_budget']),
+    }
+
+
+def evaluate(user_ids, start, end, today=None):
+    """Evaluate every active budget of the given users between two (year, month) tuples.
+
+    Returns {user_id: {'period', 'overall_summary', 'months'}}; each entry of
+    'months' is an evaluate_month() report. Runs two queries in total.
+    """
+    user_ids = list(user_ids)
+    budgets = load_budgets(user_ids, start, end)
+    spending = load_spending(user_ids, start, end)
+
+    reports = {}
+    for user_id in user_ids:
+        months = [
+            evaluate_month(year, month, budgets[user_id][(year, month)], spending[user_id][(year, month)], today)
+            for year, month in iter_months(start, end)
+        ]
+        reports[user_id] = {
+            'period': {'from': '%04d-%02d' % tuple(start), 'to': '%04d-%02d' % tuple(end)},
+            'overall_summary': summarize(months),
+            'months': months,
+        }
+    return reports
+
+
+def evaluate_users(user_ids, start, end, chunk_size=500, today=None):
+    """Yield (user_id, report) for many users, two queries per chunk (for nightly jobs)."""
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        reports = evaluate(chunk, start, end, today)
+        for user_id in chunk:
+            yield user_id, reports[user_id]
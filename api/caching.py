@@ -0,0 +1,194 @@
+"""
+Per-user versioned response cache for the analytics endpoints.
+
+Every user has a data version in the cache. Cached responses are keyed by
+(user, version, endpoint, normalized query params), plus today's date for
+endpoints whose body depends on it (as_of()), and any write to the
+user's transactions, budgets, investments or categories bumps the version
+once the DB transaction commits. Invalidation is therefore a single
+cache.incr() -- stale entries are simply never read again and age out
+through their timeout.
+
+The backend is whatever ANALYTICS_CACHE_ALIAS points at. Versions are only
+bumped in the cache of the process that made the write, so locmem is only
+correct for a single worker process: with several gunicorn workers (or
+hosts) the others would keep serving the user's pre-write analytics, and
+ETags, for up to ANALYTICS_CACHE_TIMEOUT. Several workers need a shared
+backend (Redis, Memcached); gunicorn.conf.py refuses to start them without
+one (check_shared_cache()).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+KEY_PREFIX = 'budgetguy'
+
+
+def get_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300)
+
+
+def is_process_local(alias=None):
+    """Whether the cache lives in this process's memory, where other processes never see its writes."""
+    return isinstance(caches[alias or getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')], LocMemCache)
+
+
+def check_shared_cache(workers):
+    """Refuse to run several worker processes on a per-process cache."""
+    if workers > 1 and is_process_local():
+        raise ImproperlyConfigured(
+            f"{workers} worker processes can't share a local-memory cache: data versions, ETags, "
+            "cached users and replica stickiness would differ between workers. Set REDIS_URL or run one worker."
+        )
+
+
+# Endpoints whose body depends on today's date (current month, default ranges, days left)
+DATE_RELATIVE_ENDPOINTS = frozenset({
+    'dashboard', 'monthly-summary', 'budget-progress', 'investment-returns', 'investment-history',
+})
+
+
+def as_of(endpoint):
+    """Today's date for a date-relative endpoint, else None: part of its ETag (and cache key)."""
+    return timezone.now().date() if endpoint in DATE_RELATIVE_ENDPOINTS else None
+
+
+# Data versions
+
+def version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def changed_key(user_id):
+    return f'{KEY_PREFIX}:changed:{user_id}'
+
+
+def data_version(user_id):
+    cache = get_cache()
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never repeats an older one
+        now = time.time()
+        cache.add(key, int(now * 1000), timeout=None)
+        cache.add(changed_key(user_id), now, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def last_changed(user_id):
+    """Unix time of the user's last write as seen by the cache (or of the version seed)."""
+    cache = get_cache()
+    changed = cache.get(changed_key(user_id))
+    if changed is None:
+        now = time.time()
+        cache.add(changed_key(user_id), now, timeout=None)
+        changed = cache.get(changed_key(user_id), now)
+    return changed
+
+
+def bump_version(user_id):
+    cache = get_cache()
+    cache.set(changed_key(user_id), time.time(), timeout=None)
+    try:
+        return cache.incr(version_key(user_id))
+    except ValueError:
+        return data_version(user_id)
+
+
+class _VersionBump:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def __call__(self):
+        bump_version(self.user_id)
+
+
+def bump_version_on_commit(user_id):
+    """Bump the user's version after the current DB transaction commits (at most once per transaction)."""
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        for _, func, _ in connection.run_on_commit:
+            if isinstance(func, _VersionBump) and func.user_id == user_id:
+                return
+    transaction.on_commit(_VersionBump(user_id))
+
+
+def bump_versions_on_commit(user_ids):
+    """Bump many users' versions after commit with a single callback (bulk jobs across users)."""
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: [bump_version(user_id) for user_id in user_ids])
+
+
+# Response cache
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record(endpoint, outcome):
+    with _stats_lock:
+        _stats[(endpoint, outcome)] += 1
+
+
+def stats():
+    """Hit/miss counters for this process, per endpoint."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    result = {}
+    for (endpoint, outcome), count in sorted(snapshot.items()):
+        result.setdefault(endpoint, {'hits': 0, 'misses': 0})[outcome] = count
+    for counters in result.values():
+        total = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / total, 4) if total else 0
+    return result
+
+
+def response_key(user_id, endpoint, query_params):
+    params = '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        for value in sorted(query_params.getlist(key))
+    )
+    digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+    today = as_of(endpoint)
+    if today is not None:
+        endpoint = f'{endpoint}@{today.isoformat()}'
+    return f'{KEY_PREFIX}:response:{user_id}:{data_version(user_id)}:{endpoint}:{digest}'
+
+
+def cached_response(endpoint):
+    """Cache successful GET responses of an APIView method per user and data version."""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = get_cache()
+            key = response_key(request.user.pk, endpoint, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                record(endpoint, 'hits')
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            record(endpoint, 'misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, get_timeout())
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+"""
+Per-user category map: id -> (name, type, is_active).
+
+A user has a handful of categories that rarely change, but serializer
+validation, the exports and the analytics views all need their names or
+types. for_user() loads them in one query into the analytics cache, keyed
+by the user's data version (caching.py), so a category write anywhere
+invalidates the map with the rest of the user's cached data. The map is
+also kept on the request's user object for the rest of the request.
+
+CategoryMap answers the lookups those callers used to query for:
+categories[pk] is a Category instance for FK assignment (only the mapped
+fields are loaded), name(pk) a display name and find(name, type) the
+case-insensitive duplicate check.
+
+The map can be older than the rows that point into it: another process's
+version bump may not reach this process's cache, and a reader can run
+between a commit and its on_commit bump. So an id that isn't in the map
+reloads it from the database, once per map, and after that is looked up
+on its own; only an id the database doesn't have either is missing.
+"""
+from . import caching
+from .models import Category
+
+FIELDS = ('id', 'user_id', 'name', 'type', 'is_active')
+
+
+def map_key(user_id, version):
+    return f'{caching.KEY_PREFIX}:categories:{user_id}:{version}'
+
+
+def load(user_id):
+    return {
+        pk: (name, category_type, is_active)
+        for pk, name, category_type, is_active in (
+            Category.objects.filter(user_id=user_id).values_list('id', 'name', 'type', 'is_active')
+        )
+    }
+
+
+class CategoryMap:
+    def __init__(self, user_id, rows, version=None):
+        self.user_id = user_id
+        self.rows = rows
+        self.version = version
+        self.reloaded = False
+        self.instances = {}
+        self.by_name = None
+
+    def row(self, pk):
+        row = self.rows.get(pk)
+        if row is None:
+            row = self.refresh(pk)
+            if row is None:
+                raise KeyError(pk)
+        return row
+
+    def refresh(self, pk):
+        """Catch up with categories created since the map was loaded; the row for pk, or None."""
+        if not self.reloaded:
+            self.reloaded = True
+            self.rows = load(self.user_id)
+            if self.version is not None:
+                caching.get_cache().set(map_key(self.user_id, self.version), self.rows, caching.get_timeout())
+        elif pk not in self.rows:
+            row = Category.objects.filter(pk=pk, user_id=self.user_id).values_list('name', 'type', 'is_active').first()
+            if row is not None:
+                self.rows = {**self.rows, pk: row}
+        self.by_name = None
+        return self.rows.get(pk)
+
+    def __contains__(self, pk):
+        try:
+            self.row(pk)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, pk):
+        instance = self.instances.get(pk)
+        if instance is None:
+            instance = Category.from_db(None, FIELDS, (pk, self.user_id, *self.row(pk)))
+            self.instances[pk] = instance
+        return instance
+
+    def get(self, pk, default=None):
+        return self[pk] if pk in self else default
+
+    def name(self, pk):
+        return self.row(pk)[0]
+
+    def find(self, name, category_type):
+        """Id of the user's category with this name (any case) and type, or None."""
+        if self.by_name is None:
+            self.by_name = {
+                (row_name.casefold(), row_type): pk for pk, (row_name, row_type, _) in self.rows.items()
+            }
+        return self.by_name.get((name.casefold(), category_type))
+
+
+def for_user(user):
+    version = caching.data_version(user.pk)
+    memo = user.__dict__.get('_category_map')
+    if memo is not None and memo[0] == version:
+        return memo[1]
+
+    cache = caching.get_cache()
+    key = map_key(user.pk, version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = load(user.pk)
+        cache.set(key, rows, caching.get_timeout())
+    categories = CategoryMap(user.pk, rows, version)
+    # Like ModelBackend's permission cache; request.user is a new object on every request
+    user._category_map = (version, categories)
+    return categories
@@ -0,0 +1,84 @@
+"""
+Conditional GET (ETag / Last-Modified) for the list, detail and analytics endpoints.
+
+Every response a user can see is derived from their own transactions,
+budgets, investments and categories, so the per-user data version from
+caching.py is a complete validator: the ETag is a hash of (user, version,
+endpoint, query params) and Last-Modified is the time of the user's last
+write. Endpoints whose body depends on today's date (caching.as_of())
+also hash the date, and their Last-Modified is at least today's midnight,
+so the day or month rolling over changes them without a write. Both are read from the cache before the queryset is touched, so a
+304 costs no database queries and no serialization. Creates, updates and
+deletes (including the batch and import paths) bump the version, which
+changes the ETag. The version has to come from a cache every worker
+shares, or another worker would answer 304 for changed data; see
+caching.check_shared_cache().
+"""
+import hashlib
+from datetime import datetime, time, timezone
+from email.utils import formatdate
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import caching
+
+
+def validators_for(user_id, endpoint, query_params):
+    """(ETag, Last-Modified as Unix time) of a user's view of an endpoint."""
+    params = '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        for value in sorted(query_params.getlist(key))
+    )
+    version = caching.data_version(user_id)
+    today = caching.as_of(endpoint)
+    digest = hashlib.md5(f'{user_id}:{version}:{endpoint}:{today or ""}:{params}'.encode('utf-8')).hexdigest()
+    last_modified = caching.last_changed(user_id)
+    if today is not None:
+        last_modified = max(last_modified, datetime.combine(today, time.min, tzinfo=timezone.utc).timestamp())
+    return f'"{digest}"', int(last_modified)
+
+
+def get_validators(request, endpoint):
+    return validators_for(request.user.pk, endpoint, request.query_params)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = formatdate(last_modified, usegmt=True)
+    # Responses are per user; make browsers and proxies revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+
+
+def conditional_response(endpoint):
+    """Answer GET/HEAD with 304 when the client's validators still match the user's data."""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            name = endpoint(self) if callable(endpoint) else endpoint
+            etag, last_modified = get_validators(request, name)
+            not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+            response = not_modified or view_method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def viewset_endpoint(view):
+    return f"{view.basename}-{view.action}:{view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, '')}"
+
+
+class ConditionalGetMixin:
+    """Conditional list and retrieve for ModelViewSets whose querysets are scoped to request.user."""
+
+    @conditional_response(viewset_endpoint)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(viewset_endpoint)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
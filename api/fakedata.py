@@ -0,0 +1,174 @@
+"""
+Synthetic ledgers for benchmarks and local development.
+
+generate_ledger() fills one user's account with categories, transactions,
+budgets, investments and valuation history that look like a real
+household's: a monthly salary and rent, frequent small card payments,
+occasional large purchases. Everything is written with bulk_create, so
+derived data (the rollup, budget alerts, cache versions) is rebuilt once
+at the end instead of per row.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import alerts, caching, rollups, valuations
+from .models import Budget, Category, Investment, InvestmentValuation, Transaction
+
+INCOME_CATEGORIES = {
+    'Salary': None,  # paid monthly
+    'Freelance': (200, 2500),
+    'Interest': (1, 60),
+}
+EXPENSE_CATEGORIES = {
+    # name: (weight, low, high, merchants)
+    'Groceries': (30, 8, 180, ['Tesco', 'Aldi', 'Whole Foods', 'Lidl', 'Corner Shop']),
+    'Dining Out': (18, 6, 120, ['Pizza Place', 'Sushi Bar', 'Cafe Nero', 'Burger Joint', 'Thai Kitchen']),
+    'Transport': (15, 2, 60, ['Uber', 'Metro', 'Shell', 'BP', 'Train Tickets']),
+    'Shopping': (10, 10, 400, ['Amazon', 'IKEA', 'Zara', 'Apple Store', 'Bookshop']),
+    'Entertainment': (8, 5, 90, ['Netflix', 'Spotify', 'Cinema', 'Steam', 'Concert Tickets']),
+    'Utilities': (6, 30, 220, ['Electricity', 'Water', 'Gas', 'Internet', 'Phone']),
+    'Health': (5, 10, 300, ['Pharmacy', 'Dentist', 'Gym', 'Optician']),
+    'Travel': (3, 80, 1500, ['Airline', 'Hotel', 'Airbnb', 'Car Rental']),
+    'Rent': None,  # paid monthly
+}
+INVESTMENTS = [
+    ('stocks', ['AAPL', 'MSFT', 'GOOG', 'AMZN', 'NVDA', 'VTI', 'VOO', 'TSLA']),
+    ('crypto', ['BTC', 'ETH', 'SOL']),
+    ('real_estate', ['VNQ', 'O']),
+    ('others', ['GLD', 'BND']),
+]
+
+
+def months_back(day, months):
+    """First day of the month `months` months before the one containing `day`."""
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_starts(start, months):
+    year, month = start.year, start.month
+    for _ in range(months):
+        yield date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def random_amount(rng, low, high):
+    # Skewed towards the low end, like real card spend
+    return Decimal(str(round(low + (high - low) * rng.random() ** 2.5, 2)))
+
+
+def create_categories(user):
+    existing = {(c.name, c.type): c for c in Category.objects.filter(user=user)}
+    wanted = [(name, 'income') for name in INCOME_CATEGORIES] + [(name, 'expense') for name in EXPENSE_CATEGORIES]
+    Category.objects.bulk_create(
+        [Category(user=user, name=name, type=tx_type) for name, tx_type in wanted if (name, tx_type) not in existing]
+    )
+    return {(c.name, c.type): c for c in Category.objects.filter(user=user)}
+
+
+def iter_transactions(user, categories, count, start, end, rng):
+    """Yield unsaved Transactions: recurring salary and rent plus weighted random spending."""
+    days = (end - start).days + 1
+    months = list(month_starts(start, (end.year - start.year) * 12 + end.month - start.month + 1))
+    salary = Decimal(rng.randrange(2500, 9000))
+    rent = (salary * Decimal('0.3')).quantize(Decimal('1'))
+
+    recurring = []
+    for first in months:
+        recurring.append(('Salary', 'income', salary, first + timedelta(days=24), 'Monthly salary'))
+        recurring.append(('Rent', 'expense', rent, first, 'Monthly rent'))
+    recurring = [row for row in recurring if start <= row[3] <= end][:count]
+
+    for name, tx_type, amount, day, description in recurring:
+        yield Transaction(user=user, category=categories[(name, tx_type)], type=tx_type,
+                          amount=amount, date=day, description=description)
+
+    spending = [(name, spec) for name, spec in EXPENSE_CATEGORIES.items() if spec]
+    weights = [spec[0] for _, spec in spending]
+    for _ in range(count - len(recurring)):
+        day = start + timedelta(days=rng.randrange(days))
+        if rng.random() < 0.04:
+            name = rng.choice(['Freelance', 'Interest'])
+            low, high = INCOME_CATEGORIES[name]
+            yield Transaction(user=user, category=categories[(name, 'income')], type='income',
+                              amount=random_amount(rng, low, high), date=day, description=name)
+            continue
+        name, (_, low, high, merchants) = rng.choices(spending, weights)[0]
+        yield Transaction(user=user, category=categories[(name, 'expense')], type='expense',
+                          amount=random_amount(rng, low, high), date=day,
+                          description=f"{rng.choice(merchants)} #{rng.randrange(10000)}")
+
+
+def generate_ledger(user, transactions=1000, months=24, budget_months=12, investments=10,
+                    end=None, seed=None, batch_size=5000):
+    """Fill one user's account. Returns a dict of row counts."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = months_back(end, months - 1)
+
+    with transaction.atomic():
+        categories = create_categories(user)
+
+        batch, written = [], 0
+        for tx in iter_transactions(user, categories, transactions, start, end, rng):
+            batch.append(tx)
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            Transaction.objects.bulk_create(batch)
+            written += len(batch)
+        rollups.rebuild([user.pk])
+
+        budget_start = max(start, months_back(end, budget_months - 1))
+        budgets = [
+            Budget(user=user, category=categories[(name, 'expense')], year=first.year, month=first.month,
+                   monthly_limit=Decimal(rng.randrange(spec[2], spec[2] * 8, 10)))
+            for first in month_starts(budget_start, budget_months) if first <= end
+            for name, spec in EXPENSE_CATEGORIES.items() if spec and rng.random() < 0.7
+        ]
+        Budget.objects.bulk_create(budgets, ignore_conflicts=True)
+        alerts.check_budgets(Budget.objects.filter(user=user))
+
+        holdings = []
+        for i in range(investments):
+            inv_type, symbols = rng.choice(INVESTMENTS)
+            invested = Decimal(rng.randrange(500, 50000))
+            holdings.append(Investment(
+                user=user, name=f"{rng.choice(symbols)} position {i + 1}", symbol=rng.choice(symbols),
+                type=inv_type, others='Commodity fund' if inv_type == 'others' else None,
+                amount_invested=invested, current_value=invested, quantity=Decimal(rng.randrange(1, 500)),
+                purchase_date=start + timedelta(days=rng.randrange((end - start).days + 1)),
+            ))
+        Investment.objects.bulk_create(holdings)
+        history = []
+        for holding in holdings:
+            value = holding.amount_invested
+            for first in month_starts(holding.purchase_date, months):
+                day = min(first + timedelta(days=27), end)
+                if day < holding.purchase_date:
+                    continue
+                value = (value * Decimal(str(rng.lognormvariate(0.005, 0.05)))).quantize(Decimal('0.01'))
+                history.append(InvestmentValuation(investment=holding, user=user, date=day, value=value))
+                if day >= end:
+                    break
+            holding.current_value = value
+        Investment.objects.bulk_update(holdings, ['current_value'], batch_size=1000)
+        InvestmentValuation.objects.bulk_create(history, batch_size=batch_size, ignore_conflicts=True)
+        valuations.record_investments(holdings, on=end)
+        # Includes the rows record_investments() adds for the end date
+        valuation_count = InvestmentValuation.objects.filter(investment__in=holdings).count()
+
+        caching.bump_version_on_commit(user.pk)
+
+    return {
+        'categories': len(categories),
+        'transactions': written,
+        'budgets': len(budgets),
+        'investments': len(holdings),
+        'valuations': valuation_count,
+    }
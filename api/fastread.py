@@ -0,0 +1,154 @@
+"""
+Fast read path for the list endpoints.
+
+A ModelSerializer list builds a model instance per row and runs every
+field's to_representation() on it. FastReadMixin can answer the viewset's
+list action from values_list() tuples instead, with the same filters,
+ordering and pagination and the same response body: the row layout is
+derived from the serializer's fields, related fields read the FK column,
+fields that are not columns (profit_loss, ...) come from the viewset's
+fast_read_annotations as SQL expressions, and only DecimalFields (with
+DRF's quantization) and datetimes outside UTC are formatted in Python.
+Dates, strings and numbers are left to the renderer (renderers.py), which
+encodes them in C; datetimes too, unless orjson and the installed DRF
+encode them differently (renderers.NATIVE_DATETIMES).
+
+The fast path is opt-in: ?fields=id,amount,date takes it, returning only
+those fields and selecting only their columns (unknown names are a 400).
+Full lists take it only with settings.FAST_READ_LISTS; otherwise they go
+through the serializer as before.
+"""
+import decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.db.models import Func
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import renderers
+
+
+class PercentOf(Func):
+    """part * 100 / whole, for annotations that replace a model property computing a percentage."""
+    template = '(%(expressions)s)'
+    arg_joiner = ' * 100 / '
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores whole-number decimals as integers and would divide them as integers
+        return self.as_sql(compiler, connection, arg_joiner=' * 100.0 / ', **extra_context)
+
+
+def decimal_formatter(field):
+    """field.to_representation for Decimal values, without its per-value context copy."""
+    if field.decimal_places is None or field.normalize_output or field.localize \
+            or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def format_decimal(value):
+        if type(value) is not decimal.Decimal:
+            return field.to_representation(value)
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return format_decimal
+
+
+def build_plan(serializer_class, model, annotations):
+    """[(field name, column or annotation name, formatter or None)] in the serializer's field order."""
+    plan = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if name in annotations:
+            source = name
+        elif isinstance(field, serializers.RelatedField):
+            source = model._meta.get_field(field.source).attname
+        elif field.source in {f.attname for f in model._meta.concrete_fields}:
+            source = field.source
+        else:
+            raise ImproperlyConfigured(
+                f"{serializer_class.__name__}.{name} is neither a column nor in fast_read_annotations"
+            )
+        if isinstance(field, serializers.DecimalField):
+            formatter = decimal_formatter(field)
+        elif isinstance(field, serializers.DateTimeField):
+            formatter = field
+        else:
+            formatter = None
+        plan.append((name, source, formatter))
+    return plan
+
+
+class FastReadMixin:
+    """List action served from values_list() rows, with ?fields= sparse fieldsets."""
+    fast_read_annotations = {}
+    fields_query_param = 'fields'
+
+    @classmethod
+    def get_read_plan(cls):
+        plan = cls.__dict__.get('_read_plan')
+        if plan is None:
+            model = cls.serializer_class.Meta.model
+            plan = build_plan(cls.serializer_class, model, cls.fast_read_annotations)
+            cls._read_plan = plan
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        requested = request.query_params.get(self.fields_query_param, '')
+        names = {name.strip() for name in requested.split(',') if name.strip()}
+        if not names and not getattr(settings, 'FAST_READ_LISTS', False):
+            return super().list(request, *args, **kwargs)
+        if names:
+            unknown = names - {name for name, _, _ in plan}
+            if unknown:
+                return Response(
+                    {"error": f"Unknown fields: {', '.join(sorted(unknown))}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            plan = [entry for entry in plan if entry[0] in names]
+
+        queryset = self.read_queryset(self.filter_queryset(self.get_queryset()), plan)
+        page = self.paginate_queryset(queryset)
+        data = self.represent(page if page is not None else queryset, plan)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def read_queryset(self, queryset, plan):
+        """The queryset as tuples in plan order, selecting only the plan's columns and annotations."""
+        annotations = {source: self.fast_read_annotations[source] for _, source, _ in plan
+                       if source in self.fast_read_annotations}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values_list(*[source for _, source, _ in plan])
+
+    def represent(self, rows, plan):
+        """Response data for read_queryset() rows."""
+        names = [name for name, _, _ in plan]
+        formatters = []
+        utc = not settings.USE_TZ or timezone.get_current_timezone_name() == 'UTC'
+        native = utc and renderers.NATIVE_DATETIMES
+        for index, (_, _, formatter) in enumerate(plan):
+            if isinstance(formatter, serializers.DateTimeField):
+                # Datetimes come back in UTC, which the renderer writes as the field would
+                formatter = None if native else formatter.to_representation
+            if formatter is not None:
+                formatters.append((index, formatter))
+
+        if not formatters:
+            return [dict(zip(names, row)) for row in rows]
+        data = []
+        for row in rows:
+            values = list(row)
+            for index, formatter in formatters:
+                if values[index] is not None:
+                    values[index] = formatter(values[index])
+            data.append(dict(zip(names, values)))
+        return data
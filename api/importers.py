@@ -0,0 +1,351 @@
+"""
+Bulk import of bank statements.
+
+Uploads are parsed as a stream (CSV, OFX or JSON), validated in batches,
+de-duplicated by a per-user content hash and written with bulk_create, or
+with COPY on PostgreSQL. Categories are resolved through a per-import cache
+and created on first use. Rows that fail validation are reported back
+individually; everything else is imported in a single DB transaction.
+Rows a concurrent import of the same statement commits first trip the
+unique (user, import_hash) constraint; the batch is redone and they are
+counted as duplicates, as if the hash check had seen them.
+"""
+import csv
+import hashlib
+import io
+import json
+import re
+import unicodedata
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import caching, rollups
+from .models import Category, Transaction
+
+try:
+    import ijson
+except ImportError:  # optional: stream large JSON arrays instead of loading them whole
+    ijson = None
+
+FILE_TYPES = ('csv', 'ofx', 'json')
+DEFAULT_CATEGORY = 'Uncategorized'
+MAX_REPORTED_ERRORS = 1000
+AMOUNT_FIELD = Transaction._meta.get_field('amount')
+CENT = Decimal(1).scaleb(-AMOUNT_FIELD.decimal_places)
+MAX_AMOUNT = Decimal(10) ** (AMOUNT_FIELD.max_digits - AMOUNT_FIELD.decimal_places) - CENT
+# Plain decimals, optionally with comma thousands separators: 1234.56, -1,234.56, +.5
+AMOUNT = re.compile(r'[+-]?(\d{1,3}(,\d{3})+|\d+)?(\.\d+)?')
+EXTRA_FIELDS = '_extra'
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_file_type(filename, requested=None):
+    file_type = (requested or filename.rsplit('.', 1)[-1]).lower()
+    if file_type == 'qfx':
+        file_type = 'ofx'
+    if file_type not in FILE_TYPES:
+        raise ImportFormatError(f"Unsupported file type '{file_type}', expected one of {', '.join(FILE_TYPES)}")
+    return file_type
+
+
+# Parsers: each yields (row number, dict of raw values)
+
+def parse_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text, restkey=EXTRA_FIELDS)
+    if not reader.fieldnames:
+        return
+    for number, row in enumerate(reader, start=2):  # row 1 is the header
+        extra = row.pop(EXTRA_FIELDS, None)
+        if extra:
+            yield number, {'_error': f"Row has {len(extra)} more field(s) than the header"}
+            continue
+        yield number, {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def parse_ofx(stream, chunk_size=64 * 1024):
+    # OFX 1.x is SGML without closing tags on leaf elements, so scan tags rather than parse XML
+    buffer = ''
+    current = None
+    number = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8', errors='replace')
+        buffer += chunk
+        cut = len(buffer) if not chunk else max(buffer.rfind('<'), 0)
+        for closing, tag, value in OFX_TAG.findall(buffer[:cut]):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    number += 1
+                    yield number, current
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing:
+                current[tag.lower()] = value.strip()
+        buffer = buffer[cut:]
+        if not chunk:
+            break
+
+
+def parse_json(stream):
+    if ijson is not None:
+        items = ijson.items(stream, 'item')
+    else:
+        items = json.load(stream)
+        if not isinstance(items, list):
+            raise ImportFormatError("JSON imports must be an array of transaction objects")
+    for number, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            yield number, {'_error': 'Expected an object'}
+            continue
+        yield number, {str(key).lower(): ('' if value is None else str(value)).strip() for key, value in item.items()}
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx, 'json': parse_json}
+
+
+def normalize_ofx(raw):
+    amount = raw.get('trnamt', '')
+    description = ' - '.join(part for part in (raw.get('name'), raw.get('memo')) if part)
+    return {
+        'date': raw.get('dtposted', ''),
+        'amount': amount,
+        'type': '',
+        'category': raw.get('category', ''),
+        'description': description,
+        'external_id': raw.get('fitid', ''),
+    }
+
+
+class TransactionImporter:
+    batch_size = 2000
+
+    def __init__(self, user, date_format=None, use_copy=True, batch_size=None):
+        self.user = user
+        self.date_format = date_format
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        if batch_size:
+            self.batch_size = batch_size
+        self.categories = None
+        self.categories_created = []
+        self.seen = Counter()
+        self.deltas = rollups.new_deltas()
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = []
+        self.error_count = 0
+
+    def run(self, stream, file_type):
+        parse = PARSERS[file_type]
+        with transaction.atomic():
+            self.load_categories()
+            batch = []
+            for number, raw in parse(stream):
+                if file_type == 'ofx':
+                    raw = normalize_ofx(raw)
+                row = self.validate(number, raw)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+            rollups.apply_deltas(self.deltas)
+            if self.imported:
+                caching.bump_version_on_commit(self.user.pk)
+        return self.report()
+
+    def report(self):
+        return {
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'failed': self.error_count,
+            'categories_created': self.categories_created,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+    def add_error(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    # Categories
+
+    def load_categories(self):
+        self.categories = {
+            (name.lower(), category_type): pk
+            for pk, name, category_type in Category.objects.filter(user=self.user).values_list('id', 'name', 'type')
+        }
+
+    def resolve_category(self, name, tx_type):
+        # Key on the name as it would be stored, so names that only differ past the cut share a category
+        name = (name or DEFAULT_CATEGORY).title()[:Category._meta.get_field('name').max_length].strip()
+        key = (name.lower(), tx_type)
+        if key not in self.categories:
+            category = Category.objects.create(user=self.user, name=name, type=tx_type)
+            self.categories[key] = category.pk
+            self.categories_created.append({'id': category.pk, 'name': category.name, 'type': tx_type})
+        return self.categories[key]
+
+    # Validation
+
+    def parse_amount(self, value):
+        # Currency symbols and spaces go; anything else that isn't a plain decimal is an error
+        value = ''.join(ch for ch in value if not ch.isspace() and unicodedata.category(ch) != 'Sc')
+        if not value or not AMOUNT.fullmatch(value) or not any(ch.isdigit() for ch in value):
+            raise InvalidOperation(value)
+        return Decimal(value.replace(',', ''))
+
+    def parse_date(self, value):
+        value = value.strip()
+        if self.date_format:
+            return datetime.strptime(value, self.date_format).date()
+        if re.fullmatch(r'\d{8}.*', value):  # OFX: YYYYMMDD[HHMMSS[.XXX][TZ]]
+            return datetime.strptime(value[:8], '%Y%m%d').date()
+        return date.fromisoformat(value[:10])
+
+    def validate(self, number, raw):
+        if '_error' in raw:
+            self.add_error(number, {'non_field_errors': [raw['_error']]})
+            return None
+
+        errors = {}
+        try:
+            tx_date = self.parse_date(raw.get('date', ''))
+        except ValueError:
+            errors['date'] = [f"Invalid date '{raw.get('date', '')}'"]
+
+        tx_type = raw.get('type', '').lower()
+        amount = None
+        try:
+            signed = self.parse_amount(raw.get('amount', ''))
+            amount = abs(signed).quantize(CENT)
+        except InvalidOperation:
+            errors['amount'] = [f"Invalid amount '{raw.get('amount', '')}'"]
+        else:
+            if not tx_type:
+                # Signed statement amounts: negative is money out
+                tx_type = 'expense' if signed < 0 else 'income'
+            if amount <= 0:
+                errors['amount'] = ["Amount must be greater than zero."]
+            elif amount > MAX_AMOUNT:
+                errors['amount'] = ["Amount is too large."]
+
+        if tx_type not in dict(Transaction.TYPE_CHOICES):
+            errors['type'] = [f"Invalid type '{tx_type}'"]
+
+        if errors:
+            self.add_error(number, errors)
+            return None
+
+        description = raw.get('description', '')
+        category_name = raw.get('category', '')
+        content = '|'.join([
+            tx_date.isoformat(), tx_type, str(amount), category_name.lower(),
+            description, raw.get('external_id', ''),
+        ])
+        # Identical rows within one file are legitimate (two coffees on the same day),
+        # so the n-th occurrence gets its own hash; re-importing the file still matches
+        self.seen[content] += 1
+        import_hash = hashlib.sha256(f"{content}|{self.seen[content]}".encode('utf-8')).hexdigest()
+
+        return {
+            'number': number,
+            'date': tx_date,
+            'type': tx_type,
+            'amount': amount,
+            'category': category_name,
+            'description': description or None,
+            'import_hash': import_hash,
+        }
+
+    # Writing
+
+    def existing_hashes(self, hashes):
+        return set(
+            Transaction.objects.filter(user=self.user, import_hash__in=hashes).values_list('import_hash', flat=True)
+        )
+
+    def write_batch(self, batch):
+        existing = self.existing_hashes([row['import_hash'] for row in batch])
+        now = timezone.now()
+        objects = []
+        for row in batch:
+            if row['import_hash'] in existing:
+                self.duplicates += 1
+                continue
+            objects.append(Transaction(
+                user=self.user,
+                category_id=self.resolve_category(row['category'], row['type']),
+                type=row['type'],
+                amount=row['amount'],
+                description=row['description'],
+                date=row['date'],
+                import_hash=row['import_hash'],
+                created_at=now,
+                updated_at=now,
+            ))
+        if not objects:
+            return
+
+        try:
+            # Savepoint, so losing a race with a concurrent import of the same rows only redoes this batch
+            with transaction.atomic():
+                self.insert(objects)
+        except IntegrityError:
+            # The other import committed some of these rows after the check above: they are duplicates too
+            existing = self.existing_hashes([t.import_hash for t in objects])
+            self.duplicates += len(existing)
+            objects = [t for t in objects if t.import_hash not in existing]
+            if not objects:
+                return
+            with transaction.atomic():
+                self.insert(objects)
+
+        for key, (amount, count) in rollups.deltas_for(objects).items():
+            rollups.add_delta(self.deltas, key, amount, count)
+        self.imported += len(objects)
+
+    def insert(self, objects):
+        if self.use_copy and self.copy(objects):
+            return
+        Transaction.objects.bulk_create(objects, batch_size=1000)
+
+    def copy(self, objects):
+        # COPY is only wired up for psycopg2; anything else falls back to bulk_create
+        with connection.cursor() as cursor:
+            raw_cursor = getattr(cursor, 'cursor', None)
+            if not hasattr(raw_cursor, 'copy_expert'):
+                self.use_copy = False
+                return False
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for t in objects:
+                writer.writerow([
+                    t.user_id, t.category_id, t.type, t.amount, t.description,
+                    t.date.isoformat(), t.created_at.isoformat(), t.updated_at.isoformat(), t.import_hash,
+                ])
+            buffer.seek(0)
+            raw_cursor.copy_expert(
+                f"COPY {Transaction._meta.db_table} "
+                "(user_id, category_id, type, amount, description, date, created_at, updated_at, import_hash) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        return True
@@ -0,0 +1,189 @@
+"""
+Throughput of the analytics endpoints: sync views under WSGI vs async views under ASGI.
+
+Starts the project twice on a local port: gunicorn (gthread workers, the
+sync APIViews) and uvicorn (ANALYTICS_ASYNC_VIEWS=1, the async views with
+concurrent sub-queries), with the same number of worker processes. Each
+server is loaded by keep-alive HTTP/1.1 clients at every --concurrency
+level for --duration seconds, cycling through --paths. Every request
+carries a unique query parameter so it misses the response cache and does
+the database work (--cached disables this).
+"""
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import caching
+
+from .bench_endpoints import SIZES, bench_user, percentile
+
+DEFAULT_PATHS = [
+    '/api/analytics/dashboard/',
+    '/api/analytics/monthly-summary/',
+    '/api/analytics/category-breakdown/',
+    '/api/analytics/investment-performance/',
+    '/api/analytics/budget-progress/',
+]
+
+
+async def fetch(reader, writer, request):
+    """Send one request; returns (status, keep_alive)."""
+    writer.write(request)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    headers = dict(
+        (name.strip().lower(), value.strip())
+        for name, value in (line.split(':', 1) for line in head[1:] if ':' in line)
+    )
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, requests, deadline, record):
+    connection = None
+    while time.monotonic() < deadline:
+        if connection is None:
+            connection = await asyncio.open_connection('127.0.0.1', port)
+        started = time.perf_counter()
+        try:
+            status, keep_alive = await fetch(*connection, next(requests))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status, keep_alive = None, False
+        record(status, (time.perf_counter() - started) * 1000)
+        if not keep_alive:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, paths, headers, concurrency, duration, cached):
+    counter = itertools.count()
+
+    def requests():
+        for path in itertools.cycle(paths):
+            if not cached:
+                path = f"{path}{'&' if '?' in path else '?'}bench={next(counter)}"
+            yield f"GET {path} HTTP/1.1\r\n{headers}\r\n".encode('latin-1')
+
+    timings, statuses = [], {}
+
+    def record(status, elapsed):
+        statuses[status] = statuses.get(status, 0) + 1
+        if status is not None and status < 400:
+            timings.append(elapsed)
+
+    shared = requests()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, shared, deadline, record) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': sum(statuses.values()),
+        'ok': len(timings),
+        'errors': sum(count for status, count in statuses.items() if status is None or status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'rps': round(len(timings) / elapsed, 1),
+        **{f'p{pct}_ms': round(percentile(timings, pct), 2) if timings else None for pct in (50, 95, 99)},
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare sync WSGI (gunicorn) and async ASGI (uvicorn) throughput of the analytics endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[10, 100, 500])
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per server and concurrency level")
+        parser.add_argument('--warmup', type=float, default=2)
+        parser.add_argument('--workers', type=int, default=2, help="Worker processes per server")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker")
+        parser.add_argument('--size', default='medium', choices=list(SIZES), help="Ledger of the bench user")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--host-header', default='localhost')
+        parser.add_argument('--cached', action='store_true', help="Let repeated requests hit the response cache")
+        parser.add_argument('--servers', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        try:
+            # gunicorn.conf.py refuses the same thing, less readably
+            caching.check_shared_cache(options['workers'])
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        user = bench_user(options['size'], self.stdout)
+        token = RefreshToken.for_user(user).access_token
+        headers = f"Host: {options['host_header']}\r\nAuthorization: Bearer {token}\r\n"
+
+        results = {'paths': options['paths'], 'workers': options['workers'], 'servers': {}}
+        for server in options['servers']:
+            results['servers'][server] = {}
+            process = self.start(server, options)
+            try:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{server}: {' '.join(process.args[2:4])}"))
+                for concurrency in options['concurrency']:
+                    if options['warmup']:
+                        asyncio.run(load(options['port'], options['paths'], headers, concurrency,
+                                         options['warmup'], options['cached']))
+                    row = asyncio.run(load(options['port'], options['paths'], headers, concurrency,
+                                           options['duration'], options['cached']))
+                    results['servers'][server][concurrency] = row
+                    self.stdout.write(
+                        f"  c={concurrency:<5} {row['rps']:>8} req/s  p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  "
+                        f"p99 {row['p99_ms']} ms  errors {row['errors']}/{row['requests']}"
+                    )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def start(self, server, options):
+        port = str(options['port'])
+        env = dict(os.environ, ANALYTICS_ASYNC_VIEWS='1' if server == 'asgi' else '0', API_THROTTLING='0')
+        if server == 'wsgi':
+            command = [
+                sys.executable, '-m', 'gunicorn', 'guy.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']), '--worker-class', 'gthread',
+                '--threads', str(options['threads']), '--log-level', 'warning',
+            ]
+        else:
+            command = [
+                sys.executable, '-m', 'uvicorn', 'guy.asgi:application', '--host', '127.0.0.1', '--port', port,
+                '--workers', str(options['workers']), '--lifespan', 'off', '--log-level', 'warning',
+                '--no-access-log',
+            ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"{server} server exited with status {process.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f"{server} server did not start listening on port {port}")
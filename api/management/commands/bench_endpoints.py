@@ -0,0 +1,394 @@
+"""
+Per-endpoint benchmark suite.
+
+Every route in api/urls.py is called through the full Django stack (URL
+routing, JWT authentication, middleware, rendering) for ledgers of several
+sizes, and latency percentiles, query counts, peak memory and response size
+are recorded per route. Writes run inside a transaction that is rolled back,
+so the ledger is identical for every iteration.
+
+    manage.py bench_endpoints --sizes small medium --output before.json
+    manage.py bench_endpoints --sizes small medium --output after.json
+    manage.py bench_endpoints --compare before.json after.json
+"""
+import io
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import date
+from types import SimpleNamespace
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import caching, fakedata, urls
+from api.models import Budget, BudgetAlert, Category, Investment, Transaction
+
+SIZES = {
+    'small': {'transactions': 200, 'months': 6, 'budget_months': 3, 'investments': 5},
+    'medium': {'transactions': 20_000, 'months': 24, 'budget_months': 12, 'investments': 50},
+    'huge': {'transactions': 1_000_000, 'months': 120, 'budget_months': 24, 'investments': 500},
+}
+PASSWORD = 'bench-password'
+PERCENTILES = (50, 90, 95, 99)
+
+
+def import_file(ctx):
+    rows = ['date,type,category,amount,description']
+    rows += [f"{ctx.today.isoformat()},expense,Groceries,{i + 1}.25,Bench import {i}" for i in range(100)]
+    upload = io.BytesIO('\n'.join(rows).encode('utf-8'))
+    upload.name = 'statement.csv'
+    return {'file': upload}
+
+
+def price_file(ctx):
+    rows = ['symbol,price'] + [f"{symbol},{100 + i}" for i, symbol in enumerate(ctx.symbols)]
+    upload = io.BytesIO('\n'.join(rows).encode('utf-8'))
+    upload.name = 'prices.csv'
+    return {'file': upload}
+
+
+# (label, url name, method, options). Options: detail (ctx attribute whose pk goes in the URL),
+# query, data (callable taking ctx), format ('json' or 'multipart'), auth (default True).
+CASES = [
+    ('register', 'register', 'post', {'auth': False, 'data': lambda ctx: {
+        'username': 'bench-register', 'email': 'bench-register@example.com',
+        'password': 'Bench-Pass-9431', 'password2': 'Bench-Pass-9431'}}),
+    ('login', 'login', 'post', {'auth': False, 'data': lambda ctx: {
+        'username': ctx.user.username, 'password': PASSWORD}}),
+    ('logout', 'logout', 'post', {'data': lambda ctx: {'refresh': str(RefreshToken.for_user(ctx.user))}}),
+    ('token-refresh', 'token_refresh', 'post', {'auth': False, 'data': lambda ctx: {
+        'refresh': str(RefreshToken.for_user(ctx.user))}}),
+
+    ('dashboard', 'dashboard-analytics', 'get', {}),
+    ('monthly-summary', 'monthly-summary', 'get', {}),
+    ('monthly-summary-weekly', 'monthly-summary', 'get', {'query': {'granularity': 'week'}}),
+    ('category-breakdown', 'category-breakdown', 'get', {}),
+    ('investment-performance', 'investment-performance', 'get', {}),
+    ('budget-progress', 'budget-progress', 'get', {}),
+    ('budget-progress-range', 'budget-progress', 'get', {'query': lambda ctx: {
+        'from': f"{ctx.today.year - 1}-{ctx.today.month:02d}", 'to': f"{ctx.today.year}-{ctx.today.month:02d}"}}),
+    ('investment-returns', 'investment-returns', 'get', {'query': {'include': 'holdings'}}),
+    ('investment-history', 'investment-history', 'get', {'query': {'interval': 'weekly'}}),
+    ('cache-stats', 'analytics-cache-stats', 'get', {}),
+    ('metrics', 'metrics', 'get', {}),
+
+    ('api-root', 'api-root', 'get', {}),
+    ('category-list', 'category-list', 'get', {}),
+    ('category-create', 'category-list', 'post', {'data': lambda ctx: {'name': 'Bench', 'type': 'expense'}}),
+    ('category-detail', 'category-detail', 'get', {'detail': 'category'}),
+    ('category-update', 'category-detail', 'patch', {'detail': 'category', 'data': lambda ctx: {'name': 'Renamed'}}),
+    ('category-delete', 'category-detail', 'delete', {'detail': 'category'}),
+    ('category-batch', 'category-batch', 'post', {'data': lambda ctx: [
+        {'name': f'Bench {i}', 'type': 'expense'} for i in range(50)]}),
+
+    ('transaction-list', 'transaction-list', 'get', {}),
+    ('transaction-list-search', 'transaction-list', 'get', {'query': {'search': 'uber'}}),
+    ('transaction-list-amount', 'transaction-list', 'get', {'query': {'search': '>500', 'ordering': '-amount'}}),
+    ('transaction-create', 'transaction-list', 'post', {'data': lambda ctx: {
+        'category': ctx.category.pk, 'type': 'expense', 'amount': '12.50', 'date': ctx.today.isoformat(),
+        'description': 'Bench'}}),
+    ('transaction-detail', 'transaction-detail', 'get', {'detail': 'transaction'}),
+    ('transaction-update', 'transaction-detail', 'patch', {'detail': 'transaction', 'data': lambda ctx: {
+        'amount': '99.99'}}),
+    ('transaction-delete', 'transaction-detail', 'delete', {'detail': 'transaction'}),
+    ('transaction-batch', 'transaction-batch', 'post', {'data': lambda ctx: [
+        {'category': ctx.category.pk, 'type': 'expense', 'amount': f'{i + 1}.00', 'date': ctx.today.isoformat()}
+        for i in range(100)]}),
+    ('transaction-import', 'transaction-import-file', 'post', {'data': import_file, 'format': 'multipart'}),
+    ('transaction-export-csv', 'transaction-export-csv', 'get', {}),
+    ('transaction-export-csv-gzip', 'transaction-export-csv', 'get', {'query': {'compress': 'gzip'}}),
+    ('transaction-export-pdf', 'transaction-export-pdf', 'get', {}),
+
+    ('budget-list', 'budget-list', 'get', {}),
+    ('budget-create', 'budget-list', 'post', {'data': lambda ctx: {
+        'category': ctx.category.pk, 'monthly_limit': '500.00', 'month': 1, 'year': 1999}}),
+    ('budget-detail', 'budget-detail', 'get', {'detail': 'budget'}),
+    ('budget-update', 'budget-detail', 'patch', {'detail': 'budget', 'data': lambda ctx: {'monthly_limit': '1.00'}}),
+    ('budget-delete', 'budget-detail', 'delete', {'detail': 'budget'}),
+    ('budget-batch', 'budget-batch', 'post', {'data': lambda ctx: [
+        {'category': ctx.category.pk, 'monthly_limit': '500.00', 'month': month, 'year': 1999}
+        for month in range(1, 13)]}),
+    ('budget-alert-list', 'budget-alert-list', 'get', {}),
+    ('budget-alert-detail', 'budget-alert-detail', 'get', {'detail': 'alert'}),
+
+    ('investment-list', 'investment-list', 'get', {}),
+    ('investment-create', 'investment-list', 'post', {'data': lambda ctx: {
+        'name': 'Bench fund', 'symbol': 'VTI', 'type': 'stocks', 'amount_invested': '1000.00',
+        'current_value': '1100.00', 'quantity': '10', 'purchase_date': ctx.today.isoformat()}}),
+    ('investment-detail', 'investment-detail', 'get', {'detail': 'investment'}),
+    ('investment-update', 'investment-detail', 'patch', {'detail': 'investment', 'data': lambda ctx: {
+        'current_value': '1234.56'}}),
+    ('investment-delete', 'investment-detail', 'delete', {'detail': 'investment'}),
+    ('investment-revalue', 'investment-revalue', 'post', {'data': price_file, 'format': 'multipart'}),
+]
+
+
+def bench_user(size, stdout):
+    """The staff user bench-<size>, with a generated ledger of that size."""
+    user, created = User.objects.get_or_create(
+        username=f'bench-{size}', defaults={'email': f'bench-{size}@example.com', 'is_staff': True}
+    )
+    if created:
+        user.password = make_password(PASSWORD)
+        user.save(update_fields=['password'])
+        stdout.write(f"Generating the {size} ledger...")
+        fakedata.generate_ledger(user, seed=len(size), **SIZES[size])
+    return user
+
+
+def route_names(patterns=None):
+    """Names of every route in api/urls.py, including the router's."""
+    names = set()
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(timings):
+    result = {f'p{pct}_ms': round(percentile(timings, pct), 2) for pct in PERCENTILES}
+    result['min_ms'] = round(min(timings), 2)
+    result['max_ms'] = round(max(timings), 2)
+    result['mean_ms'] = round(statistics.fmean(timings), 2)
+    return result
+
+
+class Command(BaseCommand):
+    help = "Time every API route at several ledger sizes; write latency, query and memory figures as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SIZES))
+        parser.add_argument('--repeat', type=int, default=10, help="Timed requests per route and size")
+        parser.add_argument('--only', nargs='+', help="Run only cases whose label contains one of these")
+        parser.add_argument('--skip', nargs='+', default=[], help="Skip cases whose label contains one of these")
+        parser.add_argument('--warm-cache', action='store_true',
+                            help="Keep cached analytics responses between requests (default: every request misses)")
+        parser.add_argument('--output', help="Write results as JSON to this path")
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                            help="Diff two result files instead of running")
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help="With --compare: p50 slowdown (%%) reported as a regression")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'], options['fail_on_regression'])
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        uncovered = route_names() - {name for _, name, _, _ in CASES}
+        if uncovered:
+            self.stderr.write(f"Routes without a benchmark case: {', '.join(sorted(uncovered))}")
+        cases = [
+            case for case in CASES
+            if (not options['only'] or any(part in case[0] for part in options['only']))
+            and not any(part in case[0] for part in options['skip'])
+        ]
+
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'repeat': options['repeat'],
+                'warm_cache': options['warm_cache'],
+            },
+            'sizes': {},
+        }
+        # The test client talks to the 'testserver' host
+        with override_settings(ALLOWED_HOSTS=['testserver'], API_THROTTLING=False):
+            for size in options['sizes']:
+                ctx = self.prepare(size)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{size}: {ctx.counts['transactions']} transactions, {ctx.counts['budgets']} budgets, "
+                    f"{ctx.counts['investments']} investments ({connection.vendor})"
+                ))
+                measured = {}
+                for label, name, method, case_options in cases:
+                    measured[label] = self.run_case(ctx, name, method, case_options, options)
+                    row = measured[label]
+                    self.stdout.write(
+                        f"  {label:<30} {row['status']:>3}  p50 {row['p50_ms']:>9} ms  p95 {row['p95_ms']:>9} ms  "
+                        f"{row['queries']:>4} queries  {row['peak_memory_kb']:>9} KB"
+                    )
+                results['sizes'][size] = {'counts': ctx.counts, 'cases': measured}
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def prepare(self, size):
+        """The size's bench user and ledger, generated on first use and reused afterwards."""
+        user = bench_user(size, self.stdout)
+        counts = {
+            'transactions': Transaction.objects.filter(user=user).count(),
+            'budgets': Budget.objects.filter(user=user).count(),
+            'investments': Investment.objects.filter(user=user).count(),
+        }
+        investments = Investment.objects.filter(user=user)
+        return SimpleNamespace(
+            user=user,
+            counts=counts,
+            today=date.today(),
+            token=str(RefreshToken.for_user(user).access_token),
+            category=Category.objects.filter(user=user, type='expense').order_by('id').first(),
+            transaction=Transaction.objects.filter(user=user).order_by('-date', '-id').first(),
+            budget=Budget.objects.filter(user=user).order_by('-year', '-month', 'id').first(),
+            alert=BudgetAlert.objects.filter(user=user).order_by('id').first(),
+            investment=investments.order_by('id').first(),
+            symbols=sorted(set(investments.exclude(symbol=None).values_list('symbol', flat=True))),
+        )
+
+    def request(self, ctx, name, method, case_options):
+        client = APIClient()
+        if case_options.get('auth', True):
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {ctx.token}')
+        detail = case_options.get('detail')
+        if detail:
+            target = getattr(ctx, detail)
+            if target is None:
+                return None
+            url = reverse(name, kwargs={'pk': target.pk})
+        else:
+            url = reverse(name)
+
+        query = case_options.get('query') or {}
+        query = query(ctx) if callable(query) else query
+        data = case_options['data'](ctx) if 'data' in case_options else None
+        if method == 'get':
+            return lambda: client.get(url, query)
+        if query:
+            url = f"{url}?{'&'.join(f'{key}={value}' for key, value in query.items())}"
+        return lambda: getattr(client, method)(url, data, format=case_options.get('format', 'json'))
+
+    def call(self, ctx, name, method, case_options, warm_cache, measure):
+        """One request inside a rolled-back transaction; returns (response, measure's result)."""
+        if not warm_cache:
+            caching.bump_version(ctx.user.pk)
+        with transaction.atomic():
+            send = self.request(ctx, name, method, case_options)
+            if send is None:
+                transaction.set_rollback(True)
+                return None, None
+            with measure() as probe:
+                response = send()
+                # Streamed exports do their work while the body is consumed
+                size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming \
+                    else len(response.content)
+            transaction.set_rollback(True)
+        response.size = size
+        return response, probe.result
+
+    def run_case(self, ctx, name, method, case_options, options):
+        warm = options['warm_cache']
+        # One untimed request first: imports, URL resolver and query plan caches
+        response, _ = self.call(ctx, name, method, case_options, warm, Timer)
+        if response is None:
+            return {'status': 'n/a', 'skipped': 'no object to request', **{key: None for key in (
+                'p50_ms', 'p95_ms', 'queries', 'peak_memory_kb')}}
+
+        timings, queries = [], []
+        for _ in range(options['repeat']):
+            response, (elapsed, query_count) = self.call(ctx, name, method, case_options, warm, TimerWithQueries)
+            timings.append(elapsed)
+            queries.append(query_count)
+        # Memory on its own request: tracemalloc slows everything down
+        _, peak = self.call(ctx, name, method, case_options, warm, MemoryProbe)
+
+        return {
+            'status': response.status_code,
+            'bytes': response.size,
+            'queries': int(statistics.median(queries)),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+            **summarize(timings),
+        }
+
+    def compare(self, base_path, new_path, threshold, fail):
+        with open(base_path) as f:
+            base = json.load(f)
+        with open(new_path) as f:
+            new = json.load(f)
+
+        regressions = 0
+        for size, new_size in new['sizes'].items():
+            base_cases = base['sizes'].get(size, {}).get('cases', {})
+            self.stdout.write(self.style.MIGRATE_HEADING(size))
+            for label, row in new_size['cases'].items():
+                old = base_cases.get(label)
+                if not old or old.get('p50_ms') is None or row.get('p50_ms') is None:
+                    continue
+                change = (row['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+                memory = row['peak_memory_kb'] - old['peak_memory_kb']
+                queries = row['queries'] - old['queries']
+                line = (
+                    f"  {label:<30} p50 {old['p50_ms']:>9} -> {row['p50_ms']:>9} ms ({change:+6.1f}%)  "
+                    f"queries {old['queries']:>4} -> {row['queries']:<4}  memory {memory:+10.1f} KB"
+                )
+                if change > threshold or queries > 0:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line + '  REGRESSION'))
+                elif change < -threshold or queries < 0:
+                    self.stdout.write(self.style.SUCCESS(line))
+                else:
+                    self.stdout.write(line)
+
+        self.stdout.write(f"{regressions} regression(s) beyond {threshold}% or with more queries")
+        if regressions and fail:
+            raise CommandError("Benchmark regressions found")
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.result = (time.perf_counter() - self.started) * 1000
+
+
+class TimerWithQueries:
+    def __enter__(self):
+        self.queries = CaptureQueriesContext(connection)
+        self.queries.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.queries.__exit__(*exc_info)
+        self.result = (elapsed, len(self.queries))
+
+
+class MemoryProbe:
+    def __enter__(self):
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.result = peak
@@ -0,0 +1,65 @@
+import json
+import statistics
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api import returns
+
+DEFAULT_SIZES = [100, 1_000, 10_000]
+
+
+def synthetic_portfolio(holdings, months_of_history, seed=0):
+    rng = np.random.default_rng(seed)
+    as_of = date.today()
+    purchase_days = as_of.toordinal() - rng.integers(30, 3650, holdings)
+    purchase_months = np.array([returns.month_index(date.fromordinal(int(d))) for d in purchase_days])
+    invested = rng.uniform(100, 10_000, holdings).round(2)
+    current = (invested * rng.lognormal(0.05, 0.3, holdings)).round(2)
+
+    # Month-end valuations for the last months_of_history months of every holding
+    as_of_month = returns.month_index(as_of)
+    point_holding = np.repeat(np.arange(holdings), months_of_history)
+    point_month = as_of_month - np.tile(np.arange(months_of_history, 0, -1), holdings)
+    point_value = invested[point_holding] * rng.lognormal(0.0, 0.2, len(point_holding))
+    return returns.Portfolio(
+        np.arange(holdings), rng.integers(0, len(returns.TYPES), holdings), invested, current,
+        purchase_days, purchase_months, point_holding, point_month, point_value, as_of
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark the returns engine (TWR, XIRR, attribution) on synthetic portfolios."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--holdings', type=int, nargs='+', default=DEFAULT_SIZES)
+        parser.add_argument('--months', type=int, default=60, help="Month-end valuations per holding")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        results = []
+        for holdings in options['holdings']:
+            portfolio = synthetic_portfolio(holdings, options['months'])
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                returns.compute(portfolio, include_holdings=True)
+                timings.append((time.perf_counter() - started) * 1000)
+            result = {
+                'holdings': holdings,
+                'value_points': len(portfolio.point_value) + 2 * holdings,
+                'best_ms': round(min(timings), 2),
+                'median_ms': round(statistics.median(timings), 2),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{holdings:>7} holdings  {result['value_points']:>9} value points  "
+                f"best {result['best_ms']:>8} ms  median {result['median_ms']:>8} ms"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,100 @@
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework import filters
+
+from api import rollups
+from api.models import Category, Transaction
+from api.search import TransactionSearchFilter
+
+DEFAULT_TERMS = ['coffee', 'gro', 'landlord oct', 'transport', 'uber', '42.10', '>900', '10..20']
+WORDS = [
+    'coffee', 'groceries', 'landlord', 'october', 'uber', 'train', 'pharmacy', 'bakery',
+    'cinema', 'electricity', 'insurance', 'gym', 'bookstore', 'restaurant', 'taxi', 'salary',
+]
+CATEGORIES = ['Groceries', 'Rent', 'Transport', 'Utilities', 'Dining Out', 'Health']
+
+
+class Command(BaseCommand):
+    help = "Benchmark transaction search: DRF ILIKE search vs the indexed search backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Ledger size for the bench user")
+        parser.add_argument('--username', default='bench-search')
+        parser.add_argument('--terms', nargs='+', default=DEFAULT_TERMS)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        user = self.seed(options['username'], options['rows'])
+        queryset = Transaction.objects.filter(user=user)
+        backends = [
+            ('ilike', filters.SearchFilter()),
+            ('indexed', TransactionSearchFilter()),
+        ]
+        view = SimpleNamespace(search_fields=['description', 'category__name', 'amount'])
+
+        self.stdout.write(f"{connection.vendor}, {queryset.count()} rows, best/median of {options['repeat']}")
+        results = []
+        for term in options['terms']:
+            request = SimpleNamespace(query_params={'search': term}, user=user)
+            row = {'term': term}
+            for name, backend in backends:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    filtered = backend.filter_queryset(request, queryset, view)
+                    page = list(filtered.order_by('-date', '-created_at', '-id')[:50])
+                    count = filtered.count()
+                    timings.append((time.perf_counter() - started) * 1000)
+                row[name] = {
+                    'best_ms': round(min(timings), 2),
+                    'median_ms': round(statistics.median(timings), 2),
+                    'matches': count,
+                    'first_page': len(page),
+                }
+            results.append(row)
+            self.stdout.write(
+                f"{term!r:>16}  ilike {row['ilike']['best_ms']:>9} ms / {row['ilike']['median_ms']:>9} ms  "
+                f"indexed {row['indexed']['best_ms']:>9} ms / {row['indexed']['median_ms']:>9} ms  "
+                f"({row['indexed']['matches']} matches)"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def seed(self, username, rows, batch_size=10_000):
+        user, _ = User.objects.get_or_create(username=username)
+        existing = Transaction.objects.filter(user=user).count()
+        if existing >= rows:
+            return user
+
+        categories = [
+            Category.objects.get_or_create(user=user, name=name, type='expense')[0]
+            for name in CATEGORIES
+        ]
+        start = date(2015, 1, 1)
+        self.stdout.write(f"Seeding {rows - existing} transactions for {username}...")
+        for offset in range(existing, rows, batch_size):
+            Transaction.objects.bulk_create([
+                Transaction(
+                    user=user,
+                    category=categories[i % len(categories)],
+                    type='expense',
+                    amount=Decimal(i * 7919 % 100000) / 100,
+                    description=f"{WORDS[i % len(WORDS)]} {WORDS[i * 31 % len(WORDS)]} #{i}",
+                    date=start + timedelta(days=i % 3650),
+                )
+                for i in range(offset, min(offset + batch_size, rows))
+            ])
+        # bulk_create skips Transaction.save(), so rebuild this user's rollup rows
+        rollups.rebuild([user.pk])
+        return user
@@ -0,0 +1,115 @@
+"""
+List serialization: ModelSerializer + DRF's JSONRenderer vs the fast read path.
+
+For --rows transactions and investments of one generated ledger, times
+fetching the rows, building the response data and rendering it to JSON,
+both ways, and measures the memory each takes with tracemalloc on a
+separate run. The two bodies are checked to be identical. The fast path
+is also run with a ?fields= sparse fieldset. (The API takes the fast path
+for ?fields= requests, and for full lists with FAST_READ_LISTS.)
+
+    manage.py bench_serialization --rows 10000 --output serialization.json
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from api import fakedata
+from api.models import Investment, Transaction
+from api.renderers import FastJSONRenderer
+from api.views import InvestmentViewSet, TransactionViewSet
+
+CASES = [
+    # (label, viewset, ordering, sparse fieldset)
+    ('transactions', TransactionViewSet, ('-date', '-created_at', '-id'), ['id', 'category', 'amount', 'date']),
+    ('investments', InvestmentViewSet, ('-purchase_date', '-id'),
+     ['id', 'name', 'current_value', 'profit_loss_percentage']),
+]
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return body, {
+        'best_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'peak_kib': round(peak / 1024),
+        'bytes': len(body),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark list serialization: ModelSerializer vs values() rows with the orjson renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help="Transactions and investments to serialize")
+        parser.add_argument('--username', default='bench-serialization')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        rows = options['rows']
+        user = self.seed(options['username'], rows)
+        request = SimpleNamespace(user=user)
+
+        self.stdout.write(f"{connection.vendor}, {rows} rows, best/median of {options['repeat']}, peak memory")
+        results = []
+        for label, viewset_class, ordering, sparse in CASES:
+            view = viewset_class()
+            model = viewset_class.serializer_class.Meta.model
+            queryset = model.objects.filter(user=user).order_by(*ordering)[:rows]
+            plan = view.get_read_plan()
+            sparse_plan = [entry for entry in plan if entry[0] in sparse]
+
+            def serializer():
+                data = viewset_class.serializer_class(queryset, many=True, context={'request': request}).data
+                return JSONRenderer().render(data)
+
+            def fast(plan=plan):
+                return FastJSONRenderer().render(view.represent(view.read_queryset(queryset, plan), plan))
+
+            row = {'model': label}
+            before, row['serializer'] = measure(serializer, options['repeat'])
+            after, row['fast'] = measure(fast, options['repeat'])
+            _, row['fast_sparse'] = measure(lambda: fast(sparse_plan), options['repeat'])
+            row['identical'] = before == after
+            row['sparse_fields'] = sparse
+            results.append(row)
+            for name in ('serializer', 'fast', 'fast_sparse'):
+                figures = row[name]
+                self.stdout.write(
+                    f"{label:>13} {name:<11} {figures['best_ms']:>9} ms / {figures['median_ms']:>9} ms  "
+                    f"{figures['peak_kib']:>8} KiB  {figures['bytes']:>9} bytes"
+                )
+            if not row['identical']:
+                self.stdout.write(self.style.WARNING(f"{label}: response bodies differ"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def seed(self, username, rows):
+        user, created = User.objects.get_or_create(username=username)
+        if created or Transaction.objects.filter(user=user).count() < rows \
+                or Investment.objects.filter(user=user).count() < rows:
+            self.stdout.write(f"Generating {rows} transactions and investments for {username}...")
+            Transaction.objects.filter(user=user).delete()
+            Investment.objects.filter(user=user).delete()
+            fakedata.generate_ledger(user, transactions=rows, investments=rows, months=24, budget_months=1, seed=0)
+        return user
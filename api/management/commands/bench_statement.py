@@ -0,0 +1,82 @@
+import json
+import multiprocessing
+import resource
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from tempfile import TemporaryFile
+
+from django.core.management.base import BaseCommand
+
+from api.statements import StatementRenderer
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def synthetic_rows(count):
+    start = date(2015, 1, 1)
+    categories = ['Groceries', 'Rent', 'Salary', 'Transport', 'Utilities', 'Dining Out']
+    for i in range(count):
+        tx_type = 'income' if i % 7 == 0 else 'expense'
+        yield (
+            start + timedelta(days=i % 3650),
+            tx_type,
+            categories[i % len(categories)],
+            Decimal(i % 50000) / 100,
+            f"Card payment #{i}",
+        )
+
+
+def render(count, results):
+    subtotals = [
+        {'category__name': name, 'type': 'expense', 'total': Decimal('1000.00'), 'count': count // 6}
+        for name in ['Groceries', 'Rent', 'Transport', 'Utilities', 'Dining Out']
+    ]
+    totals = {'income': Decimal('123456.78'), 'expenses': Decimal('98765.43')}
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    with TemporaryFile() as output:
+        renderer = StatementRenderer("Benchmark statement", totals, subtotals)
+        renderer.render(synthetic_rows(count), output)
+        size = output.seek(0, 2)
+    elapsed = time.perf_counter() - started
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        'rows': count,
+        'pages': renderer.page_number,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(count / elapsed),
+        'peak_rss_mb': round(peak / 1024, 1),
+        'rss_growth_mb': round((peak - baseline) / 1024, 1),
+        'pdf_mb': round(size / 1024 / 1024, 1),
+    })
+
+
+class Command(BaseCommand):
+    help = "Benchmark the PDF statement renderer: wall time and peak RSS per row count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES)
+        parser.add_argument('--output', help="Write results as JSON to this path")
+
+    def handle(self, *args, **options):
+        results = []
+        for count in options['rows']:
+            # A fresh process per size so each peak RSS stands on its own
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=render, args=(count, queue))
+            worker.start()
+            result = queue.get()
+            worker.join()
+            results.append(result)
+            self.stdout.write(
+                f"{result['rows']:>9} rows  {result['pages']:>6} pages  {result['seconds']:>8}s  "
+                f"{result['rows_per_second']:>7} rows/s  peak RSS {result['peak_rss_mb']} MB  "
+                f"(+{result['rss_growth_mb']} MB)  pdf {result['pdf_mb']} MB"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
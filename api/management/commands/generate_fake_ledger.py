@@ -0,0 +1,60 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api import fakedata
+
+
+class Command(BaseCommand):
+    help = "Create users with realistic synthetic ledgers (bulk inserts, suitable for millions of rows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--transactions', type=int, default=1000, help="Transactions per user")
+        parser.add_argument('--months', type=int, default=24, help="History length, ending this month")
+        parser.add_argument('--budget-months', type=int, default=12, help="Most recent months with budgets")
+        parser.add_argument('--investments', type=int, default=10, help="Investments per user")
+        parser.add_argument('--prefix', default='fake', help="Usernames are <prefix>-1, <prefix>-2, ...")
+        parser.add_argument('--password', default='fake-password')
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible ledgers")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['months'] < 1:
+            raise CommandError("--users and --months must be at least 1")
+
+        usernames = [f"{options['prefix']}-{i}" for i in range(1, options['users'] + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if existing:
+            self.stdout.write(f"Skipping {len(existing)} existing user(s)")
+        # Hash once: PBKDF2 per user would dominate small ledgers
+        password = make_password(options['password'])
+        User.objects.bulk_create([
+            User(username=name, email=f"{name}@example.com", password=password)
+            for name in usernames if name not in existing
+        ])
+
+        totals = {}
+        started = time.perf_counter()
+        new_users = User.objects.filter(username__in=usernames).exclude(username__in=existing).order_by('id')
+        for i, user in enumerate(new_users):
+            seed = None if options['seed'] is None else options['seed'] + i
+            counts = fakedata.generate_ledger(
+                user,
+                transactions=options['transactions'],
+                months=options['months'],
+                budget_months=options['budget_months'],
+                investments=options['investments'],
+                seed=seed,
+                batch_size=options['batch_size'],
+            )
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+            self.stdout.write(f"{user.username}: {counts['transactions']} transactions")
+
+        summary = ', '.join(f"{value} {key}" for key, value in totals.items()) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary} in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted JWTs in batches. An expired token fails "
+        "validation anyway, so its rows are no longer needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Tokens deleted per transaction")
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the expired tokens")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now)
+        if options['dry_run']:
+            blacklisted = BlacklistedToken.objects.filter(token__expires_at__lte=now).count()
+            self.stdout.write(f"{expired.count()} expired tokens, {blacklisted} of them blacklisted")
+            return
+
+        outstanding = blacklisted = 0
+        last_pk = 0
+        while True:
+            # Walk up the primary key, so no batch rescans the rows deleted before it
+            ids = list(
+                expired.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            with transaction.atomic():
+                # Cascades to the tokens' BlacklistedToken rows
+                _, deleted = OutstandingToken.objects.filter(pk__in=ids).delete()
+            outstanding += deleted.get(OutstandingToken._meta.label, 0)
+            blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {outstanding} expired tokens, {blacklisted} of them blacklisted"
+        ))
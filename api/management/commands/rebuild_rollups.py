@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the MonthlyCategoryTotal rollup from the transaction ledger, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only compare the rollup with the ledger")
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limit to a user id (repeatable)")
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+
+        if options['check']:
+            mismatches = rollups.check(user_ids)
+            for key, expected, actual in mismatches[:50]:
+                self.stderr.write(f"{key}: expected {expected}, found {actual}")
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} rollup rows differ from the ledger")
+            self.stdout.write(self.style.SUCCESS("Rollup matches the ledger"))
+            return
+
+        written = rollups.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollup: {written} rows"))
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.revaluation import PriceFileError, Revaluation, load_prices_from_path
+
+
+class Command(BaseCommand):
+    help = "Revalue every investment with a symbol from a price snapshot (CSV symbol,price or JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Price file; .csv or .json")
+        parser.add_argument('--file-type', choices=['csv', 'json'], help="Override the type taken from the extension")
+        parser.add_argument('--chunk-size', type=int, help="Rows per write (default %d)" % Revaluation.chunk_size)
+
+    def handle(self, *args, **options):
+        try:
+            prices = load_prices_from_path(options['path'], options['file_type'])
+        except (OSError, PriceFileError, ValueError) as e:
+            raise CommandError(str(e))
+
+        report = Revaluation(prices, chunk_size=options['chunk_size']).run()
+        self.stdout.write(
+            f"{report['updated']} investments revalued ({report['matched']} matched, "
+            f"{report['unchanged']} unchanged, {report['users']} users) in {report['seconds']}s"
+        )
+        if report['missing_quantity_count']:
+            self.stdout.write(self.style.WARNING(
+                f"{report['missing_quantity_count']} matched investments have no quantity:"
+            ))
+            self.stdout.write(json.dumps(report['missing_quantity'], indent=2))
+        if report['out_of_range_count']:
+            self.stdout.write(self.style.ERROR(
+                f"{report['out_of_range_count']} investments were skipped, their new value is out of range:"
+            ))
+            self.stdout.write(json.dumps(report['out_of_range'], indent=2))
+        if report['unmatched_symbols']:
+            self.stdout.write(f"No holdings for: {', '.join(report['unmatched_symbols'])}")
@@ -0,0 +1,199 @@
+"""
+Request metrics in Prometheus format.
+
+MetricsMiddleware records, per resolved URL name (dashboard-analytics,
+transaction-list, ...): request count by method and status, latency, the
+number and total time of SQL queries and response size. Streamed
+responses (CSV/PDF exports) run their queries while the body is sent, so
+they are recorded when the stream is exhausted.
+
+Queries are counted by an execute wrapper installed on every connection
+when it is created (see signals.py). It adds to the QueryRecorder in a
+context variable, so queries are counted whichever thread runs them: the
+request thread, Django's sync_to_async thread or the per-query threads of
+the async analytics views. The middleware works in both WSGI and ASGI
+handlers.
+
+Metrics are prometheus_client objects, so an observation is a few dict
+lookups and float adds. With several gunicorn workers, set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start:
+each worker then writes its values to memory-mapped files there and
+render() aggregates all of them (gunicorn.conf.py clears the directory on
+start and marks exited workers dead).
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+UNRESOLVED = 'unresolved'
+_recorder = ContextVar('query_recorder', default=None)
+
+REQUESTS = Counter(
+    'api_requests_total', 'Requests by URL name, method and status',
+    ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'api_request_duration_seconds', 'Time from the request arriving to the response body being produced',
+    ['view', 'method'],
+    buckets=(.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10, 30),
+)
+QUERIES = Histogram(
+    'api_request_db_queries', 'SQL queries per request',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+QUERY_TIME = Histogram(
+    'api_request_db_duration_seconds', 'Total SQL execution time per request',
+    ['view'],
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Response body size',
+    ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class QueryRecorder:
+    """Query count and time of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # Async views run sub-queries on several threads at once
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(time.perf_counter() - started)
+
+
+def install(connection):
+    # First, so that execute_wrapper() blocks open when the connection is made don't pop it
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name or match.route or UNRESOLVED
+
+
+def observe(request, response, seconds, recorder, size):
+    view = view_name(request)
+    REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+    LATENCY.labels(view, request.method).observe(seconds)
+    QUERIES.labels(view).observe(recorder.count)
+    QUERY_TIME.labels(view).observe(recorder.seconds)
+    if size is not None:
+        RESPONSE_SIZE.labels(view).observe(size)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, started, recorder)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, started, recorder)
+
+    def finish(self, request, response, started, recorder):
+        if not response.streaming:
+            observe(request, response, time.perf_counter() - started, recorder, len(response.content))
+        elif response.is_async:
+            content = response.streaming_content
+            response.streaming_content = self.astream(request, response, content, started, recorder)
+        else:
+            content = response.streaming_content
+            response.streaming_content = self.stream(request, response, content, started, recorder)
+        return response
+
+    # Each step sets the recorder itself: a body may be iterated from another context than the view's
+
+    def stream(self, request, response, content, started, recorder):
+        size = 0
+        iterator = iter(content)
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = next(iterator, None)
+                finally:
+                    _recorder.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            observe(request, response, time.perf_counter() - started, recorder, size)
+
+    async def astream(self, request, response, content, started, recorder):
+        size = 0
+        iterator = aiter(content)
+        try:
+            while True:
+                token = _recorder.set(recorder)
+                try:
+                    chunk = await anext(iterator, None)
+                finally:
+                    _recorder.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            observe(request, response, time.perf_counter() - started, recorder, size)
+
+
+def render():
+    """Every metric in the Prometheus text format, aggregated across workers in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_rollup(apps, schema_editor):
+    Transaction = apps.get_model('api', 'Transaction')
+    MonthlyCategoryTotal = apps.get_model('api', 'MonthlyCategoryTotal')
+    rows = (
+        Transaction.objects
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('user_id', 'category_id', 'type', 'year', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    MonthlyCategoryTotal.objects.bulk_create(
+        (MonthlyCategoryTotal(**row) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=20)),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9), (10, 10), (11, 11), (12, 12)])),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Monthly category totals',
+                'unique_together': {('user', 'year', 'month', 'category', 'type')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_monthlycategorytotal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date', 'created_at'], name='api_tx_user_date_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'date'], include=('amount',), name='api_tx_user_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'date'], include=('amount',), name='api_tx_user_cat_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('import_hash__isnull', False)), fields=('user', 'import_hash'), name='api_tx_user_import_hash_uniq'),
+        ),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Kept outside the model: a tsvector column and an FTS5 table are vendor specific,
+# and both are maintained by triggers so every write path (save, bulk_create, COPY) is covered.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE api_transaction ADD COLUMN search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION api_transaction_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT name FROM api_category WHERE id = NEW.category_id), ''
+            )), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER api_transaction_search_vector_trg
+    BEFORE INSERT OR UPDATE OF description, category_id ON api_transaction
+    FOR EACH ROW EXECUTE FUNCTION api_transaction_search_vector()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION api_category_search_vector() RETURNS trigger AS $$
+    BEGIN
+        -- Touching category_id re-runs the transaction trigger with the new name
+        UPDATE api_transaction SET category_id = category_id WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER api_category_search_vector_trg
+    AFTER UPDATE OF name ON api_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION api_category_search_vector()
+    """,
+    """
+    UPDATE api_transaction t SET search_vector =
+        setweight(to_tsvector('simple', coalesce(t.description, '')), 'A') ||
+        setweight(to_tsvector('simple', c.name), 'B')
+    FROM api_category c WHERE c.id = t.category_id
+    """,
+    "CREATE INDEX api_tx_search_vector_idx ON api_transaction USING gin (search_vector)",
+    "CREATE INDEX api_tx_description_trgm_idx ON api_transaction USING gin (description gin_trgm_ops)",
+    "CREATE INDEX api_category_name_trgm_idx ON api_category USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS api_category_name_trgm_idx",
+    "DROP INDEX IF EXISTS api_tx_description_trgm_idx",
+    "DROP TRIGGER IF EXISTS api_category_search_vector_trg ON api_category",
+    "DROP FUNCTION IF EXISTS api_category_search_vector()",
+    "DROP TRIGGER IF EXISTS api_transaction_search_vector_trg ON api_transaction",
+    "DROP FUNCTION IF EXISTS api_transaction_search_vector()",
+    "ALTER TABLE api_transaction DROP COLUMN IF EXISTS search_vector",
+]
+
+# Note: SQLite migrations that rebuild api_transaction drop its triggers; recreate them afterwards.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_transaction_fts USING fts5(
+        description, category_name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_ai AFTER INSERT ON api_transaction BEGIN
+        INSERT INTO api_transaction_fts (rowid, description, category_name)
+        VALUES (new.id, coalesce(new.description, ''),
+                coalesce((SELECT name FROM api_category WHERE id = new.category_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_au AFTER UPDATE OF description, category_id ON api_transaction BEGIN
+        DELETE FROM api_transaction_fts WHERE rowid = old.id;
+        INSERT INTO api_transaction_fts (rowid, description, category_name)
+        VALUES (new.id, coalesce(new.description, ''),
+                coalesce((SELECT name FROM api_category WHERE id = new.category_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER api_transaction_fts_ad AFTER DELETE ON api_transaction BEGIN
+        DELETE FROM api_transaction_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER api_category_fts_au AFTER UPDATE OF name ON api_category BEGIN
+        UPDATE api_transaction_fts SET category_name = new.name
+        WHERE rowid IN (SELECT id FROM api_transaction WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO api_transaction_fts (rowid, description, category_name)
+    SELECT t.id, coalesce(t.description, ''), c.name
+    FROM api_transaction t JOIN api_category c ON c.id = t.category_id
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_category_fts_au",
+    "DROP TRIGGER IF EXISTS api_transaction_fts_ad",
+    "DROP TRIGGER IF EXISTS api_transaction_fts_au",
+    "DROP TRIGGER IF EXISTS api_transaction_fts_ai",
+    "DROP TABLE IF EXISTS api_transaction_fts",
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def execute(schema_editor, direction):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return  # other databases keep DRF's ILIKE search
+    for sql in statements[direction]:
+        schema_editor.execute(sql)
+
+
+def create_search(apps, schema_editor):
+    execute(schema_editor, 0)
+
+
+def drop_search(apps, schema_editor):
+    execute(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_budgetalert'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'amount'], name='api_tx_user_amount_idx'),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_transaction_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='symbol',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-17 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_valuations(apps, schema_editor):
+    Investment = apps.get_model('api', 'Investment')
+    InvestmentValuation = apps.get_model('api', 'InvestmentValuation')
+    rows = Investment.objects.values_list('id', 'user_id', 'updated_at', 'current_value')
+    InvestmentValuation.objects.bulk_create(
+        (
+            InvestmentValuation(investment_id=pk, user_id=user_id, date=updated_at.date(), value=value)
+            for pk, user_id, updated_at, value in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_investment_symbol'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestmentValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('investment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='api.investment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Investment valuations',
+                'indexes': [models.Index(fields=['user', 'date'], include=('investment', 'value'), name='api_valuation_user_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('investment', 'date'), name='api_valuation_investment_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_valuations, migrations.RunPython.noop),
+    ]
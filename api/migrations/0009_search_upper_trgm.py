@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Substring search compiles to UPPER(col::text) LIKE UPPER('%term%'); the trigram indexes of
+# 0006 are on the raw columns (kept for ?search_mode=fuzzy) and cannot serve it.
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX api_tx_description_upper_trgm_idx ON api_transaction "
+    "USING gin ((UPPER(description::text)) gin_trgm_ops)",
+    "CREATE INDEX api_category_name_upper_trgm_idx ON api_category "
+    "USING gin ((UPPER(name::text)) gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS api_category_name_upper_trgm_idx",
+    "DROP INDEX IF EXISTS api_tx_description_upper_trgm_idx",
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_investmentvaluation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
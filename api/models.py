@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
@@ -35,12 +35,30 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(null=True ,blank=True)
     date = models.DateField()
+    import_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)  # set by bulk imports
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = 'Transactions'
         ordering = ['-date', '-created_at'] #newest first
+        indexes = [
+            # Newest-first listings per user
+            models.Index(fields=['user', 'date', 'created_at'], name='api_tx_user_date_created_idx'),
+            # Per-user income/expense sums; amount is included so they can run as index-only scans
+            models.Index(fields=['user', 'type', 'date'], include=['amount'], name='api_tx_user_type_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], include=['amount'], name='api_tx_user_cat_date_idx'),
+            # Exact and range amount search
+            models.Index(fields=['user', 'amount'], name='api_tx_user_amount_idx'),
+        ]
+        constraints = [
+            # Re-importing the same statement must not duplicate rows
+            models.UniqueConstraint(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='api_tx_user_import_hash_uniq'
+            ),
+        ]
         
     def __str__(self):
         return f"${self.amount} - {self.category.name} ({self.date})"
@@ -50,6 +68,15 @@ class Transaction(models.Model):
         if self.category and self.type != self.category.type:
             raise ValidationError(f'Transaction type must match category type ({self.category.type})')
     
+    def save(self, *args, **kwargs):
+        # Keep the monthly rollup in step with the ledger, in the same DB transaction
+        from .rollups import previous_state, record_save
+        
+        with db_transaction.atomic():
+            previous = previous_state(self)
+            super().save(*args, **kwargs)
+            record_save(self, previous)
+    
 class Budget(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -77,6 +104,7 @@ class Investment(models.Model):
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    symbol = models.CharField(max_length=20, null=True, blank=True, db_index=True)  # ticker used by revaluation
     type = models.CharField(max_length=30, choices=INVESTMENT_CHOICES)
     others = models.TextField(null=True, blank=True) 
     amount_invested = models.DecimalField(max_digits=15, decimal_places=2)
@@ -102,4 +130,62 @@ class Investment(models.Model):
         if self.amount_invested > 0:
             return ((self.current_value - self.amount_invested) / self.amount_invested) * 100
         return 0
+
+
+class MonthlyCategoryTotal(models.Model):
+    """Running per-month totals of the ledger, maintained by api.rollups."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    type = models.CharField(max_length=20, choices=Transaction.TYPE_CHOICES)
+    year = models.IntegerField()
+    month = models.IntegerField(choices=[(i, i) for i in range(1, 13)])
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
     
+    class Meta:
+        verbose_name_plural = 'Monthly category totals'
+        unique_together = ('user', 'year', 'month', 'category', 'type')
+        
+    def __str__(self):
+        return f"{self.category_id} {self.type} - {self.month}/{self.year} (${self.total})"
+
+
+class BudgetAlert(models.Model):
+    """A Budget.monthly_limit threshold crossed by the month's spend, maintained by api.alerts."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alerts')
+    threshold = models.PositiveSmallIntegerField()  # percent of monthly_limit
+    spent = models.DecimalField(max_digits=14, decimal_places=2)  # spend when the threshold was crossed
+    monthly_limit = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField(default=True)  # False once an edit or delete took spend back under
+    triggered_at = models.DateTimeField()
+    cleared_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'Budget alerts'
+        ordering = ['-triggered_at']
+        unique_together = ('budget', 'threshold')  # One alert per threshold per budget month
+        
+    def __str__(self):
+        return f"{self.budget_id} {self.threshold}% - ${self.spent}"
+
+
+class InvestmentValuation(models.Model):
+    """End-of-day value of an investment; one row per investment per day, upserted by api.valuations."""
+    investment = models.ForeignKey(Investment, on_delete=models.CASCADE, related_name='valuations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # denormalized for portfolio series
+    date = models.DateField()
+    value = models.DecimalField(max_digits=15, decimal_places=2)
+    
+    class Meta:
+        verbose_name_plural = 'Investment valuations'
+        constraints = [
+            # Also the index behind per-investment series
+            models.UniqueConstraint(fields=['investment', 'date'], name='api_valuation_investment_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], include=['investment', 'value'], name='api_valuation_user_date_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.investment_id} {self.date} (${self.value})"
@@ -0,0 +1,180 @@
+"""
+Keyset pagination for the list endpoints.
+
+Pages are selected with a WHERE clause on the full ordering key, e.g.
+(date, created_at, id) < (last row), instead of OFFSET, so the cost of a
+page does not grow with how deep the client has scrolled. The cursor
+carries the key of the boundary row plus the ordering it was built for,
+so cursors stay valid alongside filters and ?ordering=.
+
+Clients that send ?offset= or ?limit= get classic limit/offset pages for
+admin-style tables that need to jump around.
+"""
+import json
+from base64 import b64decode, b64encode
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def resolve_field(model, path):
+    """Follow a 'category__name' style path to the model field it ends on."""
+    field = None
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        if field.is_relation and field.related_model is not None:
+            model = field.related_model
+    return field
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.offset_requested(request):
+            self.offset_paginator = LimitOffsetPagination()
+            self.offset_paginator.default_limit = self.get_page_size(request)
+            self.offset_paginator.max_limit = self.max_page_size
+            return self.offset_paginator.paginate_queryset(queryset, request, view)
+        self.offset_paginator = None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        key_fields = [resolve_field(queryset.model, name) for name, _ in self.fields]
+
+        values, reverse = self.decode_cursor(request, key_fields)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_q(values, reverse))
+
+        queryset = queryset.annotate(**{
+            f'keyset_{i}': F(name) for i, (name, _) in enumerate(self.fields)
+        })
+        order = [
+            f'-{name}' if descending != reverse else name
+            for name, descending in self.fields
+        ]
+        results = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_extra = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = values is not None, has_extra
+        else:
+            self.has_next, self.has_previous = has_extra, values is not None
+        self.page = results
+        return results
+
+    def offset_requested(self, request):
+        return (
+            self.cursor_query_param not in request.query_params
+            and ('offset' in request.query_params or 'limit' in request.query_params)
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        # Honour ?ordering= from the view's OrderingFilter, then make the key unique with the pk
+        ordering = list(self.ordering)
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = list(backend().get_ordering(request, queryset, view) or ordering)
+                break
+        ordering = [name[:-2] + 'id' if name.lstrip('-') == 'pk' else name for name in ordering]
+        if not any(name.lstrip('-') == 'id' for name in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def keyset_q(self, values, reverse):
+        # (a, b, c) > (x, y, z) expanded as a > x OR (a = x AND b > y) OR ...
+        clauses = []
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (prev_name, _) in enumerate(self.fields[:i]):
+                clause &= Q(**{prev_name: values[j]})
+            clauses.append(clause)
+        return reduce(or_, clauses)
+
+    def decode_cursor(self, request, key_fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if payload['o'] != self.ordering:
+                raise ValueError('cursor was built for a different ordering')
+            values = [field.to_python(value) for field, value in zip(key_fields, payload['v'])]
+            if len(values) != len(key_fields):
+                raise ValueError('cursor key length mismatch')
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def keyset_values(self, row):
+        if isinstance(row, tuple):
+            # values_list() rows (fastread.py) end with the keyset annotations
+            return list(row[-len(self.fields):])
+        return [getattr(row, f'keyset_{i}') for i in range(len(self.fields))]
+
+    def encode_cursor(self, instance, reverse):
+        values = self.keyset_values(instance)
+        payload = {
+            'o': self.ordering,
+            'v': [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values],
+            'r': int(reverse),
+        }
+        encoded = b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('-date', '-created_at', '-id')
+
+
+class BudgetPagination(KeysetPagination):
+    ordering = ('-year', '-month', '-id')
+
+
+class InvestmentPagination(KeysetPagination):
+    ordering = ('-purchase_date', '-id')
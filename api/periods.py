@@ -0,0 +1,81 @@
+"""
+Date range and bucketing helpers shared by the analytics views.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+
+def month_range(year, month):
+    """Return the first and last day of a calendar month."""
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def date_range_filter(start=None, end=None, field='date'):
+    """Build filter kwargs for an inclusive date range.
+
+    Plain range predicates keep the (user, ..., date) indexes usable, unlike
+    date__month/date__year lookups which compile to EXTRACT().
+    """
+    filters = {}
+    if start:
+        filters[f'{field}__gte'] = start
+    if end:
+        filters[f'{field}__lte'] = end
+    return filters
+
+
+def parse_bound(value, is_end=False):
+    """Parse 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' into a date.
+
+    Partial values expand to the first day of the period, or the last day when is_end is set.
+    """
+    parts = value.split('-')
+    try:
+        if len(parts) == 1:
+            year = int(parts[0])
+            return date(year, 12, 31) if is_end else date(year, 1, 1)
+        if len(parts) == 2:
+            year, month = int(parts[0]), int(parts[1])
+            return date(year, month, monthrange(year, month)[1] if is_end else 1)
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY, YYYY-MM or YYYY-MM-DD")
+
+
+def bucket_start(day, granularity):
+    """Return the first day of the bucket containing `day`."""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return date(day.year, 1, 1)
+
+
+def next_bucket(start, granularity):
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'year':
+        return date(start.year + 1, 1, 1)
+    step = 3 if granularity == 'quarter' else 1
+    month = start.month - 1 + step
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def iter_buckets(start, end, granularity):
+    """Yield the start of every bucket overlapping [start, end]."""
+    current = bucket_start(start, granularity)
+    while current <= end:
+        yield current
+        current = next_bucket(current, granularity)
+
+
+def is_whole_months(start, end):
+    return start.day == 1 and end.day == monthrange(end.year, end.month)[1]
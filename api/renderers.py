@@ -0,0 +1,58 @@
+"""
+JSON rendering with orjson.
+
+FastJSONRenderer writes the same JSON as DRF's JSONRenderer with its
+default settings (compact, UTF-8) but encodes in C: dicts, lists, strings,
+numbers, UUIDs and, while they come out as DRF writes them, dates, times
+and datetimes never reach Python code. Anything else (Decimal, lazy
+translations, timedelta, querysets, ...) goes through DRF's
+JSONEncoder.default, so it is represented exactly as before.
+Pretty-printed responses (?indent= in the Accept header, the browsable
+API) and non-compact settings use DRF's renderer.
+
+Whether orjson's dates, times and datetimes match DRF's depends on the
+DRF release (older ones cut microseconds to milliseconds), so it is
+checked on import: NATIVE_DATETIMES is False when they differ, and then
+they go through DRF's encoder too (OPT_PASSTHROUGH_DATETIME).
+
+orjson writes NaN and infinity as null where DRF's strict mode raises.
+"""
+import json
+from datetime import date, datetime, time, timedelta, timezone
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_default = JSONEncoder().default
+
+DATETIME_SAMPLES = [
+    datetime(2000, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+    datetime(2000, 1, 2, 3, 4, 5, 678901, tzinfo=timezone(timedelta(hours=-5))),
+    datetime(2000, 1, 2, 3, 4, 5, 678901),
+    datetime(2000, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    date(2000, 1, 2),
+    time(3, 4, 5, 678901),
+]
+NATIVE_DATETIMES = all(
+    orjson.dumps(value, option=orjson.OPT_UTC_Z) == json.dumps(_default(value)).encode()
+    for value in DATETIME_SAMPLES
+)
+OPTIONS = orjson.OPT_NON_STR_KEYS | (orjson.OPT_UTC_Z if NATIVE_DATETIMES else orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def dumps(data):
+    ret = orjson.dumps(data, default=_default, option=OPTIONS)
+    # Like DRF, keep the output a strict JavaScript subset
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.compact or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
@@ -0,0 +1,246 @@
+"""
+Vectorized portfolio returns: time-weighted return, XIRR and per-type attribution.
+
+A user's holdings and valuation history are loaded once into NumPy arrays
+(two queries) and every figure is computed with array operations, so the
+cost grows with the number of value points rather than with Python loops
+over holdings.
+
+Cash flows: a holding is bought for amount_invested on purchase_date and
+is worth current_value today. Between the two, the month-end values from
+InvestmentValuation are used. TWR links monthly sub-period returns with
+purchases treated as flows at the start of their month. XIRR solves
+sum(flow * (1 + r) ** years_before_today) = 0 with Newton's method,
+for the portfolio and every investment type at once.
+"""
+from datetime import date
+
+import numpy as np
+from django.utils import timezone
+
+from . import valuations
+from .models import Investment, InvestmentValuation
+
+TYPES = [choice for choice, _ in Investment.INVESTMENT_CHOICES]
+DAYS_PER_YEAR = 365.25
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+class Portfolio:
+    """A user's holdings and value history as arrays."""
+
+    def __init__(self, ids, types, invested, current, purchase_days, purchase_months,
+                 point_holding, point_month, point_value, as_of):
+        self.ids = ids
+        self.types = types
+        self.invested = invested
+        self.current = current
+        self.purchase_days = purchase_days  # date.toordinal()
+        self.purchase_months = purchase_months  # month_index()
+        self.point_holding = point_holding  # holding index of each month-end valuation
+        self.point_month = point_month
+        self.point_value = point_value
+        self.as_of = as_of
+
+    @classmethod
+    def load(cls, user, as_of=None):
+        as_of = as_of or timezone.now().date()
+        rows = list(
+            Investment.objects.filter(user=user)
+            .values_list('id', 'type', 'amount_invested', 'current_value', 'purchase_date')
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        type_index = {name: i for i, name in enumerate(TYPES)}
+        types = np.array([type_index.get(row[1], len(TYPES) - 1) for row in rows], dtype=np.int64)
+        invested = np.array([row[2] for row in rows], dtype=np.float64)
+        current = np.array([row[3] for row in rows], dtype=np.float64)
+        purchase_days = np.array([row[4].toordinal() for row in rows], dtype=np.int64)
+        purchase_months = np.array([month_index(row[4]) for row in rows], dtype=np.int64)
+
+        point_holding, point_month, point_value = [], [], []
+        if rows:
+            position = {pk: i for i, pk in enumerate(ids.tolist())}
+            start = date.fromordinal(int(purchase_days.min()))
+            history = InvestmentValuation.objects.filter(user=user)
+            for investment_id, bucket, value in valuations.bucket_rows(history, start, as_of, 'month'):
+                if investment_id in position:
+                    point_holding.append(position[investment_id])
+                    point_month.append(month_index(bucket))
+                    point_value.append(value)
+
+        return cls(
+            ids, types, invested, current, purchase_days, purchase_months,
+            np.array(point_holding, dtype=np.int64),
+            np.array(point_month, dtype=np.int64),
+            np.array(point_value, dtype=np.float64),
+            as_of,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def value_matrix(portfolio, groups, group_count):
+    """Month-end value (groups x months) and purchase flows per month, plus the first month index."""
+    n = len(portfolio)
+    as_of_month = month_index(portfolio.as_of)
+    purchase_months = portfolio.purchase_months
+    first = int(purchase_months.min())
+    months = as_of_month - first + 1
+
+    # Every known value of every holding, in order: cost at purchase, month-end valuations, value today
+    holding = np.concatenate([np.arange(n), portfolio.point_holding, np.arange(n)])
+    month = np.concatenate([purchase_months, portfolio.point_month, np.full(n, as_of_month)])
+    value = np.concatenate([portfolio.invested, portfolio.point_value, portfolio.current])
+    sequence = np.concatenate([np.zeros(n), np.ones(len(portfolio.point_holding)), np.full(n, 2)])
+    keep = month >= purchase_months[holding]
+    holding, month, value, sequence = holding[keep], month[keep], value[keep], sequence[keep]
+
+    order = np.lexsort((sequence, month, holding))
+    holding, month, value = holding[order], month[order], value[order]
+    # Each point adds its change over the holding's previous point; cumulative sums then give values
+    delta = np.diff(value, prepend=0.0)
+    first_point = np.ones(len(holding), dtype=bool)
+    first_point[1:] = holding[1:] != holding[:-1]
+    delta[first_point] = value[first_point]
+
+    cells = groups[holding] * months + (month - first)
+    values = np.bincount(cells, weights=delta, minlength=group_count * months).reshape(group_count, months)
+    values = np.cumsum(values, axis=1)
+    flow_cells = groups * months + (purchase_months - first)
+    flows = np.bincount(flow_cells, weights=portfolio.invested, minlength=group_count * months)
+    return values, flows.reshape(group_count, months), first
+
+
+def time_weighted_returns(values, flows):
+    """Linked monthly returns per row; NaN for rows that never held anything."""
+    previous = np.concatenate([np.zeros((len(values), 1)), values[:, :-1]], axis=1)
+    base = previous + flows
+    growth = np.divide(values, base, out=np.ones_like(base), where=base > 0)
+    twr = np.prod(growth, axis=1) - 1
+    twr[values.max(axis=1, initial=0) <= 0] = np.nan
+    return twr
+
+
+def xirr(groups, group_count, amounts, years, iterations=100, tolerance=1e-10):
+    """Solve every group's XIRR at once. amounts are signed flows, years their age at valuation time.
+
+    Groups that don't converge (a holding written down to nothing has no rate above -100%) are NaN;
+    the others keep their rate.
+    """
+    rate = np.full(group_count, 0.1)
+    converged = np.zeros(group_count, dtype=bool)
+    for _ in range(iterations):
+        growth = (1 + rate[groups]) ** years
+        npv = np.bincount(groups, weights=amounts * growth, minlength=group_count)
+        slope = np.bincount(groups, weights=amounts * years * growth / (1 + rate[groups]), minlength=group_count)
+        step = np.divide(npv, slope, out=np.zeros_like(npv), where=slope != 0)
+        step[converged] = 0
+        rate = np.maximum(rate - step, -0.9999)
+        converged |= np.abs(step) < tolerance
+        if converged.all():
+            break
+    rate[~converged] = np.nan
+    # A group whose flows all happen today has no defined rate
+    span = np.bincount(groups, weights=years, minlength=group_count)
+    rate[span == 0] = np.nan
+    return rate
+
+
+def holding_xirr(portfolio):
+    """Closed form for two-flow holdings: (value / cost) ** (1 / years) - 1."""
+    years = (portfolio.as_of.toordinal() - portfolio.purchase_days) / DAYS_PER_YEAR
+    ratio = np.divide(portfolio.current, portfolio.invested, out=np.full(len(portfolio), np.nan),
+                      where=portfolio.invested > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(years > 0, ratio ** (1 / np.where(years > 0, years, 1)) - 1, np.nan)
+    return rate
+
+
+def percent(value):
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value * 100, 2)
+
+
+def percents(values):
+    """percent() over an array, rounding in NumPy."""
+    rounded = np.round(values * 100, 2)
+    return [None if np.isnan(value) or np.isinf(value) else value for value in rounded.tolist()]
+
+
+def compute(portfolio, include_holdings=False):
+    """Returns and attribution for a loaded Portfolio, as a response dict."""
+    n = len(portfolio)
+    invested = float(portfolio.invested.sum())
+    current = float(portfolio.current.sum())
+    result = {
+        'as_of': portfolio.as_of,
+        'portfolio': {
+            'holdings': n,
+            'total_invested': round(invested, 2),
+            'total_current_value': round(current, 2),
+            'total_profit_loss': round(current - invested, 2),
+            'simple_return_percentage': percent((current - invested) / invested) if invested > 0 else None,
+            'twr_percentage': None,
+            'twr_annualized_percentage': None,
+            'xirr_percentage': None,
+        },
+        'by_type': [],
+    }
+    if not n:
+        return result
+
+    # Group 0 is the whole portfolio, group 1 + i is TYPES[i]
+    group_count = len(TYPES) + 1
+    type_values, type_flows, _ = value_matrix(portfolio, portfolio.types, len(TYPES))
+    twr = np.concatenate([
+        time_weighted_returns(type_values.sum(axis=0, keepdims=True), type_flows.sum(axis=0, keepdims=True)),
+        time_weighted_returns(type_values, type_flows),
+    ])
+
+    years = (portfolio.as_of.toordinal() - portfolio.purchase_days) / DAYS_PER_YEAR
+    flow_groups = np.concatenate([np.zeros(n), np.zeros(n), portfolio.types + 1, portfolio.types + 1]).astype(np.int64)
+    amounts = np.concatenate([-portfolio.invested, portfolio.current, -portfolio.invested, portfolio.current])
+    flow_years = np.concatenate([years, np.zeros(n), years, np.zeros(n)])
+    rates = xirr(flow_groups, group_count, amounts, flow_years)
+
+    held_years = float(years.max())
+    summary = result['portfolio']
+    summary['twr_percentage'] = percent(twr[0])
+    if held_years >= 1 and not np.isnan(twr[0]):
+        summary['twr_annualized_percentage'] = percent((1 + twr[0]) ** (1 / held_years) - 1)
+    summary['xirr_percentage'] = percent(rates[0])
+
+    type_invested = np.bincount(portfolio.types, weights=portfolio.invested, minlength=len(TYPES))
+    type_current = np.bincount(portfolio.types, weights=portfolio.current, minlength=len(TYPES))
+    type_count = np.bincount(portfolio.types, minlength=len(TYPES))
+    for i, name in enumerate(TYPES):
+        if not type_count[i]:
+            continue
+        gain = type_current[i] - type_invested[i]
+        result['by_type'].append({
+            'type': name,
+            'holdings': int(type_count[i]),
+            'total_invested': round(float(type_invested[i]), 2),
+            'total_current_value': round(float(type_current[i]), 2),
+            'profit_loss': round(float(gain), 2),
+            'weight_percentage': percent(type_current[i] / current) if current > 0 else None,
+            'simple_return_percentage': percent(gain / type_invested[i]) if type_invested[i] > 0 else None,
+            # Share of the portfolio's simple return earned by this type; sums to the portfolio figure
+            'contribution_percentage': percent(gain / invested) if invested > 0 else None,
+            'twr_percentage': percent(twr[1 + i]),
+            'xirr_percentage': percent(rates[1 + i]),
+        })
+
+    if include_holdings:
+        simple = np.divide(portfolio.current - portfolio.invested, portfolio.invested,
+                           out=np.full(n, np.nan), where=portfolio.invested > 0)
+        rates = holding_xirr(portfolio)
+        result['holdings'] = [
+            {'id': pk, 'type': TYPES[t], 'simple_return_percentage': s, 'xirr_percentage': r}
+            for pk, t, s, r in zip(portfolio.ids.tolist(), portfolio.types.tolist(), percents(simple), percents(rates))
+        ]
+    return result
@@ -0,0 +1,179 @@
+"""
+Bulk revaluation of investments from a price snapshot.
+
+A snapshot maps symbols to prices (CSV with symbol,price columns or JSON,
+uploaded or read from a local path). Revaluation streams every holding
+with a symbol once, in chunks of chunk_size rows, computes quantity x price
+for the chunk and writes the changed values with bulk_update(batch_size=
+update_batch_size), all inside one DB transaction. Values are computed
+with Decimal, as floats would round money. Holdings without a quantity
+cannot be priced, and values that don't fit Investment.current_value are
+skipped and logged; both are reported back.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, valuations
+from .models import Investment
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = ('csv', 'json')
+MAX_REPORTED = 1000
+VALUE_FIELD = Investment._meta.get_field('current_value')
+CENT = Decimal(1).scaleb(-VALUE_FIELD.decimal_places)
+MAX_VALUE = Decimal(10) ** (VALUE_FIELD.max_digits - VALUE_FIELD.decimal_places) - CENT
+
+
+class PriceFileError(ValueError):
+    pass
+
+
+def parse_price(symbol, value):
+    try:
+        price = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise PriceFileError(f"Invalid price '{value}' for {symbol}")
+    if not price.is_finite() or price < 0:
+        raise PriceFileError(f"Invalid price '{value}' for {symbol}")
+    return price
+
+
+def load_prices(stream, file_type):
+    """Read a snapshot into {SYMBOL: Decimal price}."""
+    if file_type not in FILE_TYPES:
+        raise PriceFileError(f"Unsupported file type '{file_type}', expected one of {', '.join(FILE_TYPES)}")
+    if file_type == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='') if not isinstance(stream, io.TextIOBase) else stream
+        reader = csv.DictReader(text)
+        fields = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+        if 'symbol' not in fields or 'price' not in fields:
+            raise PriceFileError("CSV price files need 'symbol' and 'price' columns")
+        items = ((row[fields['symbol']], row[fields['price']]) for row in reader)
+    else:
+        data = json.load(stream)
+        if isinstance(data, dict):
+            items = data.items()
+        elif isinstance(data, list):
+            items = ((item.get('symbol'), item.get('price')) for item in data if isinstance(item, dict))
+        else:
+            raise PriceFileError("JSON price files must be an object or a list of {symbol, price}")
+
+    prices = {}
+    for symbol, price in items:
+        symbol = (symbol or '').strip().upper()
+        if symbol:
+            prices[symbol] = parse_price(symbol, price)
+    return prices
+
+
+def load_prices_from_path(path, file_type=None):
+    file_type = (file_type or path.rsplit('.', 1)[-1]).lower()
+    with open(path, 'rb') as f:
+        return load_prices(f, file_type)
+
+
+class Revaluation:
+    chunk_size = 5000
+    update_batch_size = 1000
+
+    def __init__(self, prices, chunk_size=None):
+        self.prices = prices
+        if chunk_size:
+            self.chunk_size = chunk_size
+        self.matched = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.missing_quantity = []
+        self.missing_quantity_count = 0
+        self.out_of_range = []
+        self.out_of_range_count = 0
+        self.users = set()
+        self.priced_symbols = set()
+        self.updated_at = timezone.now()
+
+    def run(self):
+        started = time.perf_counter()
+        with transaction.atomic():
+            holdings = (
+                Investment.objects.filter(symbol__isnull=False)
+                .values_list('id', 'user_id', 'symbol', 'quantity', 'current_value')
+                .iterator(chunk_size=self.chunk_size)
+            )
+            chunk = []
+            for holding in holdings:
+                chunk.append(holding)
+                if len(chunk) >= self.chunk_size:
+                    self.write(self.revalue_chunk(chunk))
+                    chunk = []
+            if chunk:
+                self.write(self.revalue_chunk(chunk))
+            caching.bump_versions_on_commit(self.users)
+        return self.report(time.perf_counter() - started)
+
+    def revalue_chunk(self, holdings):
+        """[(pk, user_id, new value)] of the holdings in a chunk whose value changes."""
+        priced = [(holding, self.prices.get(holding[2].upper())) for holding in holdings]
+        priced = [(holding, price) for holding, price in priced if price is not None]
+        self.matched += len(priced)
+        self.priced_symbols.update(holding[2].upper() for holding, _ in priced)
+
+        changes = []
+        for (pk, user_id, symbol, quantity, current_value), price in priced:
+            if quantity is None:
+                self.missing_quantity_count += 1
+                if len(self.missing_quantity) < MAX_REPORTED:
+                    self.missing_quantity.append({'id': pk, 'user': user_id, 'symbol': symbol})
+                continue
+            try:
+                value = (quantity * price).quantize(CENT)
+            except InvalidOperation:
+                value = None
+            if value is None or abs(value) > MAX_VALUE:
+                self.skip_out_of_range(pk, user_id, symbol, quantity, price)
+            elif value == current_value:
+                self.unchanged += 1
+            else:
+                changes.append((pk, user_id, value))
+        return changes
+
+    def skip_out_of_range(self, pk, user_id, symbol, quantity, price):
+        logger.error("Revaluation skipped investment %s: %s x %s %s does not fit current_value",
+                     pk, quantity, symbol, price)
+        self.out_of_range_count += 1
+        if len(self.out_of_range) < MAX_REPORTED:
+            self.out_of_range.append({'id': pk, 'user': user_id, 'symbol': symbol})
+
+    def write(self, changes):
+        if not changes:
+            return
+        Investment.objects.bulk_update(
+            [Investment(pk=pk, current_value=value, updated_at=self.updated_at) for pk, _, value in changes],
+            ['current_value', 'updated_at'],
+            batch_size=self.update_batch_size,
+        )
+        valuations.record(changes, on=self.updated_at.date())
+        self.users.update(user_id for _, user_id, _ in changes)
+        self.updated += len(changes)
+
+    def report(self, seconds):
+        return {
+            'prices': len(self.prices),
+            'matched': self.matched,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'users': len(self.users),
+            'missing_quantity': self.missing_quantity,
+            'missing_quantity_count': self.missing_quantity_count,
+            'out_of_range': self.out_of_range,
+            'out_of_range_count': self.out_of_range_count,
+            'unmatched_symbols': sorted(set(self.prices) - self.priced_symbols)[:MAX_REPORTED],
+            'seconds': round(seconds, 3),
+        }
@@ -0,0 +1,206 @@
+"""
+Incremental maintenance of the MonthlyCategoryTotal rollup.
+
+Every write to the ledger is turned into a set of deltas keyed by
+(user, category, type, year, month). Transaction.save() and the post_delete
+signal apply them inside the same DB transaction as the ledger write, so the
+analytics views can read the rollup instead of re-aggregating api_transaction.
+Bulk code paths that bypass save() must call apply_deltas() themselves.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date as date_cls
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from . import caching
+
+_deferred = ContextVar('rollups_deferred', default=False)
+
+
+@contextmanager
+def deferred():
+    """Skip per-row maintenance from signals; the caller applies aggregated deltas itself."""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def rollup_key(user_id, category_id, tx_type, tx_date):
+    if isinstance(tx_date, str):
+        tx_date = date_cls.fromisoformat(tx_date)
+    return (user_id, category_id, tx_type, tx_date.year, tx_date.month)
+
+
+def add_delta(deltas, key, amount, count):
+    entry = deltas[key]
+    entry[0] += Decimal(str(amount))
+    entry[1] += count
+
+
+def new_deltas():
+    return defaultdict(lambda: [Decimal('0'), 0])
+
+
+def previous_state(instance):
+    """Return the stored (key, amount) of a transaction about to be saved, or None."""
+    if instance.pk is None:
+        return None
+    row = (
+        type(instance).objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values('user_id', 'category_id', 'type', 'date', 'amount')
+        .first()
+    )
+    if row is None:
+        return None
+    key = rollup_key(row['user_id'], row['category_id'], row['type'], row['date'])
+    return key, row['amount']
+
+
+def record_save(instance, previous):
+    deltas = new_deltas()
+    if previous is not None:
+        key, amount = previous
+        add_delta(deltas, key, -amount, -1)
+    key = rollup_key(instance.user_id, instance.category_id, instance.type, instance.date)
+    add_delta(deltas, key, instance.amount, 1)
+    apply_deltas(deltas)
+
+
+def record_delete(instance):
+    if _deferred.get():
+        return
+    deltas = new_deltas()
+    key = rollup_key(instance.user_id, instance.category_id, instance.type, instance.date)
+    add_delta(deltas, key, -Decimal(str(instance.amount)), -1)
+    apply_deltas(deltas)
+
+
+def deltas_for(transactions, sign=1):
+    """Build deltas for an iterable of Transaction instances (bulk paths)."""
+    deltas = new_deltas()
+    for t in transactions:
+        key = rollup_key(t.user_id, t.category_id, t.type, t.date)
+        add_delta(deltas, key, sign * Decimal(str(t.amount)), sign)
+    return deltas
+
+
+def apply_deltas(deltas):
+    from .alerts import check_keys
+
+    changed = []
+    for key, (amount, count) in deltas.items():
+        if amount == 0 and count == 0:
+            continue
+        apply_delta(key, amount, count)
+        changed.append(key)
+    # Budgets watching these months see the new totals within the same DB transaction
+    check_keys(changed)
+
+
+def apply_delta(key, amount, count):
+    from .models import MonthlyCategoryTotal
+
+    user_id, category_id, tx_type, year, month = key
+    rows = MonthlyCategoryTotal.objects.filter(
+        user_id=user_id, category_id=category_id, type=tx_type, year=year, month=month
+    )
+    updated = rows.update(total=F('total') + amount, count=F('count') + count)
+
+    if not updated:
+        # Nothing to subtract from (e.g. the category is being cascade-deleted)
+        if count <= 0:
+            return
+        try:
+            with transaction.atomic():
+                MonthlyCategoryTotal.objects.create(
+                    user_id=user_id, category_id=category_id, type=tx_type,
+                    year=year, month=month, total=amount, count=count
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            rows.update(total=F('total') + amount, count=F('count') + count)
+    elif count < 0:
+        rows.filter(count__lte=0).delete()
+
+
+def month_range_q(start=None, end=None):
+    """Q object selecting rollup rows between two (year, month) tuples, inclusive."""
+    q = Q()
+    if start:
+        q &= Q(year__gt=start[0]) | Q(year=start[0], month__gte=start[1])
+    if end:
+        q &= Q(year__lt=end[0]) | Q(year=end[0], month__lte=end[1])
+    return q
+
+
+def totals_by_type(rollups):
+    """Sum a rollup queryset into {'income': Decimal, 'expense': Decimal}."""
+    totals = {'income': Decimal('0'), 'expense': Decimal('0')}
+    for row in rollups.values('type').annotate(amount=Sum('total')).order_by():
+        totals[row['type']] = row['amount'] or Decimal('0')
+    return totals
+
+
+def expected_totals(user_ids=None, transactions=None):
+    """Aggregate the raw ledger (or the given transactions) into rollup-shaped rows."""
+    from .models import Transaction
+
+    if transactions is None:
+        transactions = Transaction.objects.all()
+    if user_ids:
+        transactions = transactions.filter(user_id__in=user_ids)
+    return (
+        transactions
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('user_id', 'category_id', 'type', 'year', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute the rollup from scratch. Returns the number of rows written."""
+    from .models import MonthlyCategoryTotal
+
+    with transaction.atomic():
+        existing = MonthlyCategoryTotal.objects.all()
+        if user_ids:
+            existing = existing.filter(user_id__in=user_ids)
+        affected = set(user_ids or existing.values_list('user_id', flat=True).distinct())
+        existing.delete()
+        rows = [MonthlyCategoryTotal(**row) for row in expected_totals(user_ids).iterator()]
+        MonthlyCategoryTotal.objects.bulk_create(rows, batch_size=batch_size)
+        # Cached analytics were computed from the old rows
+        caching.bump_versions_on_commit(affected | {row.user_id for row in rows})
+    return len(rows)
+
+
+def check(user_ids=None):
+    """Compare the rollup with the raw ledger. Returns a list of mismatched keys."""
+    from .models import MonthlyCategoryTotal
+
+    def keyed(rows):
+        return {
+            (r['user_id'], r['category_id'], r['type'], r['year'], r['month']): (r['total'], r['count'])
+            for r in rows
+        }
+
+    expected = keyed(expected_totals(user_ids))
+    stored = MonthlyCategoryTotal.objects.all()
+    if user_ids:
+        stored = stored.filter(user_id__in=user_ids)
+    actual = keyed(stored.values('user_id', 'category_id', 'type', 'year', 'month', 'total', 'count'))
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key) != actual.get(key):
+            mismatches.append((key, expected.get(key), actual.get(key)))
+    return mismatches
@@ -0,0 +1,248 @@
+"""
+Read-replica routing.
+
+settings.DATABASE_REPLICAS lists DATABASES aliases that replicate
+'default'. ReplicaRoutingMiddleware marks read-only requests, meaning GET
+and HEAD to the analytics views, the CSV/PDF exports and list views, and
+ReplicaRouter sends their reads to a replica:
+
+- Writes always go to the primary, and once a request has written, its
+  later reads stay on the primary too (read-after-write).
+- A request that writes makes its user sticky to the primary for
+  REPLICA_STICKY_SECONDS, so their next reads see the write even on a
+  lagging replica. The mark lives in the analytics cache, which therefore
+  has to be shared between processes and hosts: the middleware refuses to
+  start with replicas and a local-memory cache.
+- A replica is used only while healthy: it accepts connections and, on
+  PostgreSQL, is at most REPLICA_MAX_LAG seconds behind. Health is checked
+  at most every REPLICA_HEALTH_CHECK_INTERVAL seconds per process; without
+  a healthy replica, reads fall back to the primary.
+
+The replica for a request is chosen at its first read after
+authentication and kept for the rest of the request. Authentication,
+session and token tables are always read from the primary, as a user who
+just registered or logged in may not have reached the replica yet. The
+routing state is a context variable, so it follows a request into
+sync_to_async threads and the async views' query threads.
+"""
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.urls import Resolver404, resolve
+from django.utils.functional import SimpleLazyObject, empty
+
+from . import caching
+
+PRIMARY_APPS = {'admin', 'auth', 'contenttypes', 'sessions', 'token_blacklist'}
+EXPORT_ROUTES = {'transaction-export-csv', 'transaction-export-pdf'}
+
+_state = ContextVar('replica_routing', default=None)
+_health = {}  # alias: (healthy, monotonic time of the check)
+_health_lock = threading.Lock()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_read_only(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    name = match.url_name or ''
+    return 'analytics' in match.route.split('/') or name.endswith('-list') or name in EXPORT_ROUTES
+
+
+def authenticated_user_id(request):
+    """The user DRF (or the async views) authenticated, without evaluating Django's lazy session user."""
+    user = request.__dict__.get('user')
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+# Sticky to primary after a write
+
+def sticky_key(user_id):
+    return f'{caching.KEY_PREFIX}:sticky:{user_id}'
+
+
+def mark_sticky(user_id):
+    caching.get_cache().set(sticky_key(user_id), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user_id):
+    return caching.get_cache().get(sticky_key(user_id)) is not None
+
+
+# Replica health
+
+def check_health(alias):
+    try:
+        connection = connections[alias]
+        connection.ensure_connection()
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', None)
+        if connection.vendor != 'postgresql' or max_lag is None:
+            return True
+        with connection.cursor() as cursor:
+            # A caught-up replica has replayed everything it received; an idle primary leaves
+            # the last replay timestamp old, so only measure lag while WAL is outstanding
+            cursor.execute(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            lag = cursor.fetchone()[0]
+        return lag is not None and lag <= max_lag
+    except DatabaseError:
+        return False
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _health_lock:
+        cached = _health.get(alias)
+    if cached is not None and now - cached[1] < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return cached[0]
+    healthy = check_health(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    """A healthy replica alias, or the primary when there is none."""
+    healthy = [alias for alias in get_replicas() if is_healthy(alias)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    def __init__(self, request, read_only):
+        self.request = request
+        self.read_only = read_only
+        self.wrote = False
+        self.alias = None
+        self.lock = threading.Lock()
+
+    def read_alias(self):
+        if not self.read_only or self.wrote:
+            return DEFAULT_DB_ALIAS
+        with self.lock:
+            if self.alias is None:
+                user_id = authenticated_user_id(self.request)
+                if user_id is None:
+                    # Not authenticated yet; decide at the first read that knows the user
+                    return DEFAULT_DB_ALIAS
+                self.alias = DEFAULT_DB_ALIAS if is_sticky(user_id) else choose_replica()
+            return self.alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return False if db in get_replicas() else None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if get_replicas() and caching.is_process_local():
+            raise ImproperlyConfigured(
+                "DATABASE_REPLICAS needs a shared cache (REDIS_URL): the sticky-to-primary mark after a "
+                "write must reach every worker"
+            )
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not get_replicas():
+            return self.get_response(request)
+        state = RoutingState(request, is_read_only(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        if not get_replicas():
+            return await self.get_response(request)
+        state = RoutingState(request, is_read_only(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def finish(self, state, response):
+        if response.streaming:
+            # Exports query while the body is sent, after this middleware has returned
+            content = response.streaming_content
+            if response.is_async:
+                response.streaming_content = self.astream(state, content)
+            else:
+                response.streaming_content = self.stream(state, content)
+        elif state.wrote:
+            self.wrote(state)
+        return response
+
+    def wrote(self, state):
+        user_id = authenticated_user_id(state.request)
+        if user_id is not None:
+            mark_sticky(user_id)
+
+    def stream(self, state, content):
+        iterator = iter(content)
+        while True:
+            token = _state.set(state)
+            try:
+                chunk = next(iterator, None)
+            finally:
+                _state.reset(token)
+            if chunk is None:
+                break
+            yield chunk
+
+    async def astream(self, state, content):
+        iterator = aiter(content)
+        while True:
+            token = _state.set(state)
+            try:
+                chunk = await anext(iterator, None)
+            finally:
+                _state.reset(token)
+            if chunk is None:
+                break
+            yield chunk
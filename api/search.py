@@ -0,0 +1,139 @@
+"""
+Indexed transaction search.
+
+?search= is split into terms. Amount terms become numeric predicates on
+the (user, amount) index:
+
+    12.50   exact amount (also searched as text)
+    >100    >=100, <20, <=20
+    10..50  inclusive range
+
+Every other term must match the description or the category name, as a
+substring (case-insensitive) or as word prefixes ('cof sho' finds
+'Coffee shop'):
+
+- PostgreSQL: a trigger-maintained tsvector column (api_transaction.search_vector,
+  GIN indexed) answers word-prefix matches, and pg_trgm GIN indexes on
+  UPPER(description) and UPPER(category name) answer substring matches.
+  The matching categories are looked up first, so the WHERE is an OR of
+  indexable clauses (a BitmapOr) rather than a scan of the user's rows.
+  ?search_mode=fuzzy adds trigram word similarity on the raw columns, so
+  typos still match.
+- SQLite: a trigger-maintained FTS5 table (api_transaction_fts) answers
+  word-prefix matches; substrings fall back to LIKE, which scans the
+  user's rows (SQLite is the development database).
+- Other databases fall back to DRF's ILIKE search.
+
+The schema side (column, triggers, indexes, FTS table) lives in migrations
+0006_transaction_search and 0009_search_upper_trgm.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Category
+
+MODES = ('prefix', 'fuzzy')
+AMOUNT_RANGE = re.compile(r'^(\d+(?:\.\d+)?)\.\.(\d+(?:\.\d+)?)$')
+AMOUNT_BOUND = re.compile(r'^(>=|<=|>|<)(\d+(?:\.\d+)?)$')
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def amount_q(term):
+    """Numeric predicate for an amount term, or None when the term is not one."""
+    match = AMOUNT_RANGE.match(term)
+    if match:
+        low, high = sorted((Decimal(match.group(1)), Decimal(match.group(2))))
+        return Q(amount__gte=low, amount__lte=high)
+    match = AMOUNT_BOUND.match(term)
+    if match:
+        lookup = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}[match.group(1)]
+        return Q(**{f'amount__{lookup}': Decimal(match.group(2))})
+    return None
+
+
+def category_ids(user, **lookup):
+    return list(Category.objects.filter(user=user, **lookup).values_list('id', flat=True))
+
+
+def substring_q(term, user):
+    # Category ids as literals: an IN (subquery) can't take part in a BitmapOr
+    q = Q(description__icontains=term)
+    ids = category_ids(user, name__icontains=term)
+    if ids:
+        q |= Q(category_id__in=ids)
+    return q
+
+
+def postgres_text_q(term, user, mode):
+    words = WORD.findall(term)
+    q = substring_q(term, user)
+    if words:
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        q |= Q(RawSQL(
+            '"api_transaction"."search_vector" @@ to_tsquery(\'simple\', %s)', [tsquery],
+            output_field=BooleanField()
+        ))
+    if mode == 'fuzzy':
+        q |= Q(description__trigram_word_similar=term)
+        ids = category_ids(user, name__trigram_word_similar=term)
+        if ids:
+            q |= Q(category_id__in=ids)
+    return q
+
+
+def sqlite_text_q(term, user, mode):
+    words = WORD.findall(term)
+    q = substring_q(term, user)
+    if words:
+        match = ' '.join('"%s"*' % word.replace('"', '""') for word in words)
+        q |= Q(RawSQL(
+            '"api_transaction"."id" IN (SELECT rowid FROM api_transaction_fts WHERE api_transaction_fts MATCH %s)',
+            [match], output_field=BooleanField()
+        ))
+    return q
+
+
+TEXT_BACKENDS = {
+    'postgresql': postgres_text_q,
+    'sqlite': sqlite_text_q,
+}
+
+
+class TransactionSearchFilter(filters.SearchFilter):
+    """SearchFilter replacement backed by the search indexes when the database has them."""
+    mode_param = 'search_mode'
+
+    def filter_queryset(self, request, queryset, view):
+        text_q = TEXT_BACKENDS.get(connection.vendor)
+        if text_q is None:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        mode = request.query_params.get(self.mode_param, 'prefix')
+        if mode not in MODES:
+            mode = 'prefix'
+
+        for term in terms:
+            q = amount_q(term)
+            if q is None:
+                q = text_q(term, request.user, mode)
+                amount = parse_amount(term)
+                if amount is not None:
+                    q |= Q(amount=amount)
+            queryset = queryset.filter(q)
+        return queryset
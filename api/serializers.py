@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Category, Transaction, Budget, Investment
+from .models import Category, Transaction, Budget, Investment, BudgetAlert
+from . import categories as category_map
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
@@ -48,6 +49,36 @@ class LoginSerializer(serializers.Serializer):
         
 
 
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """Category FK limited to the request user's categories, resolved from their category map.
+
+    The map (categories.py) is cached across requests, so validating a category costs no query;
+    a {id: Category} map in the context takes precedence.
+    """
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is not None and hasattr(request, 'user'):
+            return Category.objects.filter(user=request.user)
+        return super().get_queryset()
+
+    def to_internal_value(self, data):
+        categories = self.context.get('categories')
+        if categories is None:
+            request = self.context.get('request')
+            if request is None or not getattr(request.user, 'is_authenticated', False):
+                return super().to_internal_value(data)
+            categories = category_map.for_user(request.user)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in categories:
+            self.fail('does_not_exist', pk_value=data)
+        return categories[pk]
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -59,17 +90,10 @@ class CategorySerializer(serializers.ModelSerializer):
         category_type = self.initial_data.get('type')
         
         # Check for duplicate category name for same user and type
-        existing = Category.objects.filter(
-            user=user, 
-            name__iexact=value, 
-            type=category_type
-        )
+        existing = category_map.for_user(user).find(value, category_type)
         
-        # If updating, exclude current instance
-        if self.instance:
-            existing = existing.exclude(pk=self.instance.pk)
-            
-        if existing.exists():
+        # If updating, the current instance may keep its name
+        if existing is not None and (self.instance is None or existing != self.instance.pk):
             raise serializers.ValidationError(f"Category '{value}' already exists for {category_type}")
         
         return value.title()  # Capitalize first letter
@@ -79,6 +103,8 @@ class CategorySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
     
 class TransactionSerializer(serializers.ModelSerializer):
+    category = CategoryField(queryset=Category.objects.all())
+    
     class Meta:
         model = Transaction
         fields = [
@@ -109,14 +135,11 @@ class TransactionSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Amount must be greater than zero.")
         return value
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            self.fields['category'].queryset = Category.objects.filter(user=request.user)
-            
+
 class BudgetSerializer(serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
+    category = CategoryField(queryset=Category.objects.all())
+    
     class Meta:
         model = Budget
         fields = [
@@ -156,13 +179,17 @@ class InvestmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Investment
         fields = [
-            'id', 'user', 'name', 'type', 'others',
+            'id', 'user', 'name', 'symbol', 'type', 'others',
             'amount_invested', 'current_value', 'quantity',
             'purchase_date', 'created_at', 'updated_at',
             'profit_loss', 'profit_loss_percentage'
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'profit_loss', 'profit_loss_percentage']
 
+    def validate_symbol(self, value):
+        value = (value or '').strip().upper()
+        return value or None
+
     def validate(self, attrs):
         # If type is "others", 'others' field must be filled
         inv_type = attrs.get('type')
@@ -180,4 +207,20 @@ class InvestmentSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['user'] = request.user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class BudgetAlertSerializer(serializers.ModelSerializer):
+    category = serializers.IntegerField(source='budget.category_id', read_only=True)
+    category_name = serializers.CharField(source='budget.category.name', read_only=True)
+    month = serializers.IntegerField(source='budget.month', read_only=True)
+    year = serializers.IntegerField(source='budget.year', read_only=True)
+
+    class Meta:
+        model = BudgetAlert
+        fields = [
+            'id', 'budget', 'category', 'category_name', 'month', 'year',
+            'threshold', 'spent', 'monthly_limit', 'is_active',
+            'triggered_at', 'cleared_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import alerts, authentication, caching, metrics, rollups, valuations
+from .models import Budget, Category, Investment, Transaction
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, **kwargs):
+    # Runs inside the deletion's atomic block, for single and queryset deletes alike
+    rollups.record_delete(instance)
+
+
+@receiver(post_save, sender=Budget)
+def budget_saved(sender, instance, **kwargs):
+    # A new or changed limit may cross (or un-cross) thresholds without any new spend
+    alerts.check_budgets([instance])
+
+
+@receiver(post_save, sender=Investment)
+def investment_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'current_value' in update_fields:
+        valuations.record_investments([instance])
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Investment)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Investment)
+@receiver(post_delete, sender=Category)
+def user_data_changed(sender, instance, **kwargs):
+    # Invalidates the user's cached analytics responses
+    caching.bump_version_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # Drops the fields cached for authentication (is_active, is_staff, password digest, ...)
+    authentication.forget_user_on_commit(instance.pk)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    metrics.install(connection)
@@ -0,0 +1,207 @@
+"""
+PDF transaction statements.
+
+ReportLab's canvas keeps every page of a document in memory until save(),
+which does not scale to statements with hundreds of thousands of rows.
+StatementRenderer instead writes a plain PDF with the standard Helvetica
+fonts one page at a time: each page's content stream is compressed and
+flushed to the output file as soon as it is full, and only the object
+offsets are kept for the xref table. Output goes to a spooled temp file
+that is handed back to the client as a streamed response.
+"""
+import zlib
+from tempfile import SpooledTemporaryFile
+
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+
+COLUMNS = [
+    # (x position, max characters)
+    (50, None),   # Date
+    (120, None),  # Type
+    (180, 15),    # Category
+    (280, None),  # Amount
+    (350, 20),    # Description
+]
+HEADINGS = ["Date", "Type", "Category", "Amount", "Description"]
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '(': '\\(', ')': '\\)', '\r': ' ', '\n': ' '})
+
+
+def pdf_string(value):
+    return '(' + str(value).translate(_ESCAPES) + ')'
+
+
+class PDFWriter:
+    """Minimal incremental PDF writer: pages are written as soon as they are finished."""
+
+    # Fixed object numbers; pages and content streams are numbered from 5 upwards
+    CATALOG, PAGES, FONT_REGULAR, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, fileobj, pagesize):
+        self.fileobj = fileobj
+        self.width, self.height = pagesize
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5
+        self.position = 0
+        self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.write_object(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>')
+        self.write_object(self.FONT_REGULAR, self.font_dict('Helvetica'))
+        self.write_object(self.FONT_BOLD, self.font_dict('Helvetica-Bold'))
+
+    def font_dict(self, name):
+        return f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        self.write(f'{object_id} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+
+    def add_page(self, operators):
+        content = zlib.compress('\n'.join(operators).encode('cp1252', errors='replace'))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+
+        self.offsets[content_id] = self.position
+        self.write(f'{content_id} 0 obj\n<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode('latin-1'))
+        self.write(content)
+        self.write(b'\nendstream\nendobj\n')
+        self.write_object(page_id, (
+            f'<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {self.width:g} {self.height:g}] '
+            f'/Resources << /Font << /F1 {self.FONT_REGULAR} 0 R /F2 {self.FONT_BOLD} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'
+        ))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        self.write_object(self.PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>')
+
+        xref_position = self.position
+        size = self.next_id
+        lines = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        for object_id in range(1, size):
+            lines.append(f'{self.offsets[object_id]:010d} 00000 n \n')
+        lines.append(f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n')
+        self.write(''.join(lines).encode('latin-1'))
+
+
+class StatementRenderer:
+    row_height = 15
+    top_margin = 50
+    bottom_margin = 50
+
+    def __init__(self, title, totals, subtotals, pagesize=letter):
+        self.title = title
+        self.totals = totals
+        self.subtotals = subtotals
+        self.pagesize = pagesize
+        self.width, self.height = pagesize
+        self.generated = timezone.localtime().strftime('%Y-%m-%d %H:%M')
+        self.page_number = 0
+
+    def render(self, rows, fileobj=None):
+        """Render the statement for an iterable of
+        (date, type, category name, amount, description) tuples.
+
+        Returns the file object, rewound to the start.
+        """
+        if fileobj is None:
+            fileobj = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.writer = PDFWriter(fileobj, self.pagesize)
+        self.page_number = 0
+
+        y = self.start_page()
+        y = self.draw_summary(y)
+        y = self.draw_subtotals(y)
+        y = self.draw_column_headings(y - 10)
+
+        for row in rows:
+            if y < self.bottom_margin + self.row_height:
+                self.finish_page()
+                y = self.draw_column_headings(self.start_page())
+            self.draw_row(y, row)
+            y -= self.row_height
+
+        self.finish_page()
+        self.writer.close()
+        fileobj.seek(0)
+        return fileobj
+
+    # Drawing primitives, appended to the current page's content stream
+
+    def text(self, x, y, value, font='Helvetica', size=9):
+        self.ops.append(f'BT /{FONTS[font]} {size} Tf {x:g} {y:g} Td {pdf_string(value)} Tj ET')
+
+    def text_right(self, x, y, value, font='Helvetica', size=9):
+        self.text(x - stringWidth(value, font, size), y, value, font, size)
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(f'{x1:g} {y1:g} m {x2:g} {y2:g} l S')
+
+    # Page layout
+
+    def start_page(self):
+        self.page_number += 1
+        self.ops = ['0.5 w']
+        top = self.height - self.top_margin
+        self.text(50, top, self.title, 'Helvetica-Bold', 12 if self.page_number > 1 else 16)
+        self.text_right(self.width - 50, top, f"Page {self.page_number}", size=8)
+        self.line(50, top - 6, self.width - 50, top - 6)
+        return top - 30
+
+    def finish_page(self):
+        bottom = self.bottom_margin
+        self.line(50, bottom - 10, self.width - 50, bottom - 10)
+        self.text(50, bottom - 22, f"Generated {self.generated}", size=8)
+        self.text_right(self.width - 50, bottom - 22, f"Page {self.page_number}", size=8)
+        self.writer.add_page(self.ops)
+        self.ops = None
+
+    def draw_summary(self, y):
+        income = self.totals.get('income') or 0
+        expenses = self.totals.get('expenses') or 0
+        self.text(50, y, f"Total Income: ${income}", size=12)
+        self.text(200, y, f"Total Expenses: ${expenses}", size=12)
+        self.text(350, y, f"Net: ${income - expenses}", size=12)
+        return y - 30
+
+    def draw_subtotals(self, y):
+        if not self.subtotals:
+            return y
+        self.text(50, y, "By category", 'Helvetica-Bold', 10)
+        y -= self.row_height
+        for item in self.subtotals:
+            if y < self.bottom_margin + self.row_height:
+                self.finish_page()
+                y = self.start_page()
+            self.text(50, y, str(item['category__name'])[:25])
+            self.text(180, y, item['type'])
+            self.text(280, y, f"${item['total']}")
+            self.text(350, y, f"{item['count']} transactions")
+            y -= self.row_height
+        return y - 10
+
+    def draw_column_headings(self, y):
+        for (x, _), heading in zip(COLUMNS, HEADINGS):
+            self.text(x, y, heading, 'Helvetica-Bold', 10)
+        return y - 20
+
+    def draw_row(self, y, row):
+        tx_date, tx_type, category, amount, description = row
+        values = (str(tx_date), tx_type, category or '', f"${amount}", description or '')
+        cells = [
+            f'1 0 0 1 {x} {y:g} Tm {pdf_string(value[:limit] if limit else value)} Tj'
+            for (x, limit), value in zip(COLUMNS, values)
+        ]
+        # One text block per row keeps the content stream small
+        self.ops.append('BT /F1 9 Tf ' + ' '.join(cells) + ' ET')
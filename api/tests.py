@@ -1,3 +1,1523 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+import numpy as np
+import orjson
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.db.models import F, QuerySet, Sum
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import (
+    alerts, analytics, async_views, authentication, budgets, caching, exports, fakedata, importers, metrics, pagination,
+    periods, renderers, returns, revaluation, rollups, routing, throttling, valuations, views,
+)
+from . import categories as category_map
+from .models import (
+    Budget, BudgetAlert, Category, Investment, InvestmentValuation, MonthlyCategoryTotal, Transaction,
+)
+from .search import TransactionSearchFilter
+from .serializers import InvestmentSerializer
+
+# A cache that, unlike locmem, other processes would see
+SHARED_CACHE_DIR = tempfile.mkdtemp(prefix='budgetguy-cache-')
+
+
+class DashboardAnalyticsQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('dashboard', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def add_data(self, categories):
+        for i in range(categories):
+            category = Category.objects.create(user=self.user, name=f'Category {categories}-{i}', type='expense')
+            Budget.objects.create(
+                user=self.user, category=category, monthly_limit=100,
+                month=self.today.month, year=self.today.year
+            )
+            Transaction.objects.create(
+                user=self.user, category=category, type='expense', amount=10 + i, date=self.today
+            )
+        Investment.objects.create(
+            user=self.user, name=f'Fund {categories}', type='stocks', amount_invested=100,
+            current_value=120, quantity=1, purchase_date=date(2024, 1, 1)
+        )
+
+    def test_query_count_is_constant(self):
+        url = reverse('dashboard-analytics')
+        for categories in (1, 10):
+            self.add_data(categories)
+            # on_commit version bumps never run inside TestCase
+            cache.clear()
+            # Five queries, plus loading the category map into the cache
+            with self.assertNumQueries(6):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['budget_progress']), Budget.objects.filter(user=self.user).count())
+            self.assertEqual(
+                len(response.data['top_spending_categories']),
+                min(5, Category.objects.filter(user=self.user).count())
+            )
+
+
+@skipUnless(connection.vendor == 'postgresql', "Checks PostgreSQL plans")
+class QueryPlanTests(TestCase):
+    """The hot ledger queries use the composite transaction indexes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('plans', password='x')
+        self.category = Category.objects.create(user=self.user, name='Food', type='expense')
+        # Tiny test tables are cheaper to scan; ask the planner what it would do at scale
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_recent_transactions(self):
+        self.assertUsesIndex(
+            Transaction.objects.filter(user=self.user).order_by('-date', '-created_at')[:5],
+            'api_tx_user_date_created_idx',
+        )
+
+    def test_monthly_expense_sum(self):
+        today = date.today()
+        month = periods.date_range_filter(*periods.month_range(today.year, today.month))
+        self.assertUsesIndex(
+            Transaction.objects.filter(user=self.user, type='expense', **month)
+            .values('user').annotate(total=Sum('amount')).order_by(),
+            'api_tx_user_type_date_idx',
+        )
+
+    def test_category_spend_in_range(self):
+        today = date.today()
+        month = periods.date_range_filter(*periods.month_range(today.year, today.month))
+        self.assertUsesIndex(
+            Transaction.objects.filter(user=self.user, category=self.category, **month)
+            .values('user').annotate(total=Sum('amount')).order_by(),
+            'api_tx_user_cat_date_idx',
+        )
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_ROUTERS=['api.routing.ReplicaRouter'], CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': SHARED_CACHE_DIR},
+})
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        routing._health['replica'] = (True, float('inf'))
+        self.addCleanup(routing._health.clear)
+        self.user = User(pk=1, username='reader')
+
+    def request(self, method, url, user=None, write=False):
+        """Run a request through the middleware; returns where its Transaction reads went."""
+        request = getattr(RequestFactory(), method)(url)
+        reads = []
+
+        def view(request):
+            if user is not None:
+                request.user = user
+            reads.append(router.db_for_read(User))
+            reads.append(router.db_for_read(Transaction))
+            if write:
+                router.db_for_write(Transaction)
+                reads.append(router.db_for_read(Transaction))
+            return HttpResponse()
+
+        routing.ReplicaRoutingMiddleware(view)(request)
+        return reads
+
+    def test_read_only_routes_use_the_replica(self):
+        for url in (reverse('dashboard-analytics'), reverse('transaction-list'), reverse('transaction-export-csv')):
+            # Authentication tables stay on the primary
+            self.assertEqual(self.request('get', url, self.user), ['default', 'replica'])
+
+    def test_other_requests_use_the_primary(self):
+        self.assertEqual(self.request('post', reverse('transaction-list'), self.user), ['default', 'default'])
+        self.assertEqual(self.request('get', reverse('transaction-detail', args=[1]), self.user), ['default', 'default'])
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+
+    def test_unauthenticated_reads_use_the_primary(self):
+        self.assertEqual(self.request('get', reverse('dashboard-analytics')), ['default', 'default'])
+
+    def test_writes_pin_the_request_and_the_user_to_the_primary(self):
+        reads = self.request('get', reverse('dashboard-analytics'), self.user, write=True)
+        self.assertEqual(reads, ['default', 'replica', 'default'])
+        self.assertEqual(self.request('get', reverse('dashboard-analytics'), self.user), ['default', 'default'])
+        self.assertEqual(self.request('get', reverse('dashboard-analytics'), User(pk=2)), ['default', 'replica'])
+
+    def test_unhealthy_replicas_fall_back_to_the_primary(self):
+        routing._health['replica'] = (False, float('inf'))
+        self.assertEqual(self.request('get', reverse('dashboard-analytics'), self.user), ['default', 'default'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_replicas_need_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            routing.ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication._revoked_loaded_at = None
+        self.user = User.objects.create_user('jwt', password='jwt-password')
+        self.client = APIClient()
+        response = self.client.post(reverse('login'), {'username': 'jwt', 'password': 'jwt-password'}, format='json')
+        self.tokens = response.data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_authentication_is_query_free_once_warm(self):
+        url = reverse('category-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Only the category list itself
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_changes_apply_on_next_request(self):
+        url = reverse('category-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_cache_holds_no_password_hash(self):
+        url = reverse('category-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        cached = cache.get(authentication.user_key(self.user.pk))
+        self.assertNotIn(self.user.password, repr(cached))
+
+        request = RequestFactory().get(url, HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        user, _ = authentication.CachedJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'jwt', True))
+        user.is_staff = True
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_staff)
+        self.assertTrue(self.user.check_password('jwt-password'))
+
+    def test_logout_revokes_access_token(self):
+        url = reverse('category-list')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('logout'), {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttling._stores.clear()
+        self.user = User.objects.create_user('throttled', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(
+        REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'user': '10/min', 'ip': '100/min'}},
+        THROTTLE_COSTS={'dashboard-analytics': 5},
+    )
+    def test_cost_weighted_bucket(self):
+        url = reverse('dashboard-analytics')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # One bucket per user, whichever endpoint emptied it
+        self.assertEqual(self.client.get(reverse('category-list')).status_code, 429)
+
+    @override_settings(EXPORT_CONCURRENCY=1)
+    def test_export_concurrency_cap(self):
+        url = reverse('transaction-export-csv')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get(url)
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second)
+        b''.join(first.streaming_content)
+        first.close()
+        third = self.client.get(url)
+        self.assertEqual(third.status_code, 200)
+        third.close()
+
+
+class CategoryMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('categories', password='x')
+        # Without signals, so the test's own writes queue the first version bump
+        [self.category] = Category.objects.bulk_create([Category(user=self.user, name='Food', type='expense')])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_validation_uses_cached_map(self):
+        category_map.for_user(self.user)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('category-list'), {'name': 'FOOD', 'type': 'expense'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_writes_invalidate_map(self):
+        self.assertNotIn(self.category.pk + 1, category_map.for_user(self.user))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('category-list'), {'name': 'Rent', 'type': 'expense'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(category_map.for_user(self.user).name(response.data['id']), 'Rent')
+
+    def test_stale_map_reloads_on_miss(self):
+        category_map.for_user(self.user)
+        # Created without a version bump, as by another process whose bump this cache never saw
+        [rent] = Category.objects.bulk_create([Category(user=self.user, name='Rent', type='expense')])
+        response = self.client.post(reverse('transaction-list'), {
+            'category': rent.pk, 'type': 'expense', 'amount': '5.00', 'date': '2024-01-02'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(reverse('transaction-export-csv'))
+        self.assertIn(b'Rent', b''.join(response.streaming_content))
+        response = self.client.post(reverse('transaction-list'), {
+            'category': rent.pk + 100, 'type': 'expense', 'amount': '5.00', 'date': '2024-01-02'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FastReadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('fastread', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_investment_list_matches_serializer(self):
+        for invested, current in [('100.00', '120.00'), ('3.00', '1.00'), ('0.00', '5.00'), ('7.77', '9.99')]:
+            Investment.objects.create(user=self.user, name=f'Fund {invested}', type='stocks',
+                                      amount_invested=invested, current_value=current, purchase_date=date(2024, 1, 1))
+        Investment.objects.update(created_at=datetime(2024, 1, 1, 9, 30, 0, 123456, tzinfo=dt_timezone.utc))
+        expected = InvestmentSerializer(Investment.objects.filter(user=self.user).order_by('-purchase_date', '-id'),
+                                        many=True).data
+        expected = JSONRenderer().render(expected)
+        for fast_read_lists in (False, True):
+            with self.subTest(fast_read_lists=fast_read_lists), override_settings(FAST_READ_LISTS=fast_read_lists):
+                response = self.client.get(reverse('investment-list'))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(b'"created_at":"2024-01-01T09:30:00.123456Z"', response.content)
+                self.assertEqual(JSONRenderer().render(response.json()['results']), expected)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'utc': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'offset': datetime(2024, 1, 2, 3, 4, 5, 6000, tzinfo=dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2024, 1, 2, 3, 4, 5),
+            'time': time(3, 4, 5, 678901),
+            'date': date(2024, 1, 2),
+            'amount': Decimal('12.50'),
+            'text': 'caf\u00e9 \u2028',
+            'none': None,
+        }
+        self.assertEqual(renderers.FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # The encoding used when orjson's datetimes differ from this DRF's
+        del data['text']
+        passthrough = orjson.dumps(data, default=renderers._default,
+                                   option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        self.assertEqual(passthrough, JSONRenderer().render(data))
+
+    def test_sparse_fieldset(self):
+        category = Category.objects.create(user=self.user, name='Food', type='expense')
+        Transaction.objects.create(user=self.user, category=category, type='expense', amount='12.50',
+                                   date=date(2024, 1, 2))
+        response = self.client.get(reverse('transaction-list'), {'fields': 'amount,category'})
+        self.assertEqual(response.json()['results'], [{'category': category.pk, 'amount': '12.50'}])
+        response = self.client.get(reverse('transaction-list'), {'fields': 'amount,owner'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pages', password='x')
+        food, rent = Category.objects.bulk_create([
+            Category(user=self.user, name='Food', type='expense'),
+            Category(user=self.user, name='Rent', type='expense'),
+        ])
+        # Three rows share a date so a page of two splits them; equal created_at leaves the tie to -id
+        rows = [(food, '5.00', 3), (rent, '5.00', 3), (food, '7.00', 3), (rent, '2.00', 2),
+                (food, '5.00', 2), (food, '9.00', 1), (rent, '1.00', 1)]
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=category, type='expense', amount=amount, date=date(2024, 1, day))
+            for category, amount, day in rows
+        ])
+        Transaction.objects.update(created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, response):
+        return [row['id'] for row in response.json()['results']]
+
+    def walk(self, params, link='next'):
+        """Follow `link` from the first page; returns the ids in order and the last response."""
+        response = self.client.get(reverse('transaction-list'), {'page_size': 2, **params})
+        seen = self.ids(response)
+        while response.json()[link]:
+            response = self.client.get(response.json()[link])
+            self.assertEqual(response.status_code, 200)
+            seen += self.ids(response)
+        return seen, response
+
+    def expected(self, *ordering):
+        return list(Transaction.objects.filter(user=self.user).order_by(*ordering).values_list('id', flat=True))
+
+    def test_default_ordering_breaks_date_ties_by_id(self):
+        seen, _ = self.walk({})
+        self.assertEqual(seen, self.expected('-date', '-created_at', '-id'))
+
+    def test_ordering_with_duplicate_values(self):
+        for ordering, expected in [('amount', ('amount', 'id')), ('-amount', ('-amount', '-id')),
+                                   ('date', ('date', 'id'))]:
+            with self.subTest(ordering=ordering):
+                seen, _ = self.walk({'ordering': ordering})
+                self.assertEqual(seen, self.expected(*expected))
+
+    def test_mixed_direction_ordering(self):
+        seen, _ = self.walk({'ordering': 'category__name,-amount'})
+        self.assertEqual(seen, self.expected('category__name', '-amount', 'id'))
+
+        paginator = pagination.KeysetPagination()
+        paginator.fields = [('category__name', False), ('amount', True), ('id', False)]
+        rows = Transaction.objects.filter(user=self.user).order_by('category__name', '-amount', 'id')
+        boundary = rows[2]
+        after = Transaction.objects.filter(user=self.user).filter(
+            paginator.keyset_q(['Food', boundary.amount, boundary.id], reverse=False))
+        self.assertEqual(sorted(after.values_list('id', flat=True)), sorted(row.id for row in rows[3:]))
+        before = Transaction.objects.filter(user=self.user).filter(
+            paginator.keyset_q(['Food', boundary.amount, boundary.id], reverse=True))
+        self.assertEqual(sorted(before.values_list('id', flat=True)), sorted(row.id for row in rows[:2]))
+
+    def test_previous_links_walk_back_to_the_first_page(self):
+        for params in ({}, {'ordering': 'amount'}, {'ordering': 'category__name,-amount'}):
+            with self.subTest(**params):
+                forward, last = self.walk(params)
+                pages = [self.ids(last)]
+                response = last
+                while response.json()['previous']:
+                    response = self.client.get(response.json()['previous'])
+                    self.assertEqual(response.status_code, 200)
+                    pages.insert(0, self.ids(response))
+                self.assertEqual(sum(pages, []), forward)
+                self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+                self.assertIsNone(response.json()['previous'])
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        response = self.client.get(reverse('transaction-list'), {'page_size': 2, 'ordering': 'amount'})
+        cursor = QueryDict(response.json()['next'].split('?', 1)[1])['cursor']
+        response = self.client.get(reverse('transaction-list'), {'page_size': 2, 'ordering': '-amount',
+                                                                 'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('garbage', 'eyJvIjpbXX0=', 'e30='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('transaction-list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    def test_offset_and_limit_fall_back_to_limit_offset_pages(self):
+        expected = self.expected('-date', '-created_at', '-id')
+        response = self.client.get(reverse('transaction-list'), {'offset': 2, 'limit': 3})
+        body = response.json()
+        self.assertEqual(body['count'], len(expected))
+        self.assertEqual(self.ids(response), expected[2:5])
+        self.assertIn('offset=5', body['next'])
+        self.assertNotIn('offset=', body['previous'])
+        response = self.client.get(reverse('transaction-list'), {'limit': 2, 'ordering': 'amount'})
+        self.assertEqual(self.ids(response), self.expected('amount', 'id')[:2])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('search', password='x')
+        other = User.objects.create_user('search-other', password='x')
+        self.food = Category.objects.create(user=self.user, name='Groceries', type='expense')
+        rent = Category.objects.create(user=self.user, name='Rent', type='expense')
+        other_food = Category.objects.create(user=other, name='Groceries', type='expense')
+        self.coffee = self.add(self.user, self.food, '4.50', 'Coffee shop on Main')
+        self.market = self.add(self.user, self.food, '62.10', 'Farmers market')
+        self.rent = self.add(self.user, rent, '900.00', 'October rent')
+        self.add(other, other_food, '4.50', 'Coffee shop on Main')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, user, category, amount, description):
+        return Transaction.objects.create(user=user, category=category, type='expense', amount=amount,
+                                          description=description, date=date(2024, 1, 2)).pk
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('transaction-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_word_prefixes_and_substrings(self):
+        self.assertEqual(self.search('coffee'), {self.coffee})
+        self.assertEqual(self.search('cof sho'), {self.coffee})
+        self.assertEqual(self.search('offee'), {self.coffee})
+        self.assertEqual(self.search('COFFEE main'), {self.coffee})
+        self.assertEqual(self.search('tea'), set())
+
+    def test_category_names(self):
+        self.assertEqual(self.search('grocer'), {self.coffee, self.market})
+        self.assertEqual(self.search('rocer market'), {self.market})
+        self.food.name = 'Supermarket'
+        self.food.save()
+        self.assertEqual(self.search('supermar'), {self.coffee, self.market})
+        self.assertEqual(self.search('groceries'), set())
+
+    def test_amounts(self):
+        self.assertEqual(self.search('4.50'), {self.coffee})
+        self.assertEqual(self.search('>100'), {self.rent})
+        self.assertEqual(self.search('10..70'), {self.market})
+        self.assertEqual(self.search('<=62.10 market'), {self.market})
+
+    def test_edits_and_deletes_reach_the_index(self):
+        Transaction.objects.filter(pk=self.market).update(description='Bakery')
+        self.assertEqual(self.search('bakery'), {self.market})
+        Transaction.objects.filter(pk=self.coffee).delete()
+        self.assertEqual(self.search('coffee'), set())
+
+
+@skipUnless(connection.vendor == 'postgresql', "Checks PostgreSQL plans")
+class SearchPlanTests(TestCase):
+    """Every clause of a text term is answered by a GIN index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('search-plans', password='x')
+        Category.objects.create(user=self.user, name='Groceries', type='expense')
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def plan(self, query, **params):
+        request = SimpleNamespace(query_params=QueryDict(urlencode({'search': query, **params})), user=self.user)
+        queryset = TransactionSearchFilter().filter_queryset(
+            request, Transaction.objects.filter(user=self.user), view=None
+        )
+        return queryset.explain()
+
+    def test_substring_and_prefix_terms(self):
+        plan = self.plan('groc')
+        for index in ('api_tx_search_vector_idx', 'api_tx_description_upper_trgm_idx'):
+            self.assertIn(index, plan, plan)
+        self.assertRegex(plan, r'api_transaction_category_id_\w+|api_tx_user_cat_date_idx')
+        self.assertIn('BitmapOr', plan, plan)
+        self.assertNotIn('SubPlan', plan, plan)
+
+    def test_fuzzy_terms(self):
+        plan = self.plan('grocereis', search_mode='fuzzy')
+        self.assertIn('api_tx_description_trgm_idx', plan, plan)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('export', password='x')
+        food, salary = Category.objects.bulk_create([
+            Category(user=self.user, name='Food', type='expense'),
+            Category(user=self.user, name='Salary', type='income'),
+        ])
+        other = User.objects.create_user('export-other', password='x')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=food, type='expense', amount='12.50', date=date(2024, 1, 2),
+                        description='Lunch, with "quotes"'),
+            Transaction(user=self.user, category=food, type='expense', amount='3.20', date=date(2024, 1, 3)),
+            Transaction(user=self.user, category=salary, type='income', amount='2500.00', date=date(2024, 1, 3),
+                        description='January pay'),
+            Transaction(user=other, category=Category.objects.create(user=other, name='Other', type='expense'),
+                        type='expense', amount='1.00', date=date(2024, 1, 3)),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, params=None, **extra):
+        response = self.client.get(reverse('transaction-export-csv'), params or {}, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def rows(self, body):
+        return list(csv.reader(io.StringIO(body.decode('utf-8'))))
+
+    def test_streams_every_row_with_category_names(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertNotIn('Content-Encoding', response)
+        rows = self.rows(body)
+        self.assertEqual(rows[0], exports.CSV_HEADER)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(sorted(row[2] for row in rows[1:]), ['Food', 'Food', 'Salary'])
+        self.assertIn(['2024-01-02', 'expense', 'Food', '12.50', 'Lunch, with "quotes"'], [row[:5] for row in rows])
+
+    def test_rows_are_written_in_chunks(self):
+        categories = category_map.for_user(self.user)
+        chunks = list(exports.iter_csv(Transaction.objects.filter(user=self.user), categories, lines_per_chunk=2))
+        self.assertEqual(len(chunks), 3)  # header, two rows, one row
+        self.assertEqual(len(self.rows(''.join(chunks).encode())), 4)
+
+    def test_filters_by_date(self):
+        _, body = self.export({'date': '2024-01-03'})
+        rows = self.rows(body)
+        self.assertEqual([row[0] for row in rows[1:]], ['2024-01-03', '2024-01-03'])
+        self.assertEqual(sorted(row[2] for row in rows[1:]), ['Food', 'Salary'])
+
+    def test_accept_encoding_gzip(self):
+        _, plain = self.export()
+        response, body = self.export(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_compress_param_downloads_a_gzip_file(self):
+        _, plain = self.export({'date': '2024-01-03'})
+        response, body = self.export({'date': '2024-01-03', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('transactions.csv.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(body), plain)
+
+
+class StatementPDFTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('statement', password='x')
+        food = Category.objects.create(user=self.user, name='Food (daily)', type='expense')
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, category=food, type='expense', amount=f'{i}.25', date=date(2024, 1, 1 + i % 28),
+                        description=f'Purchase #{i}')
+            for i in range(150)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def objects(self, pdf):
+        """{object id: body} following the xref table the trailer points to."""
+        self.assertTrue(pdf.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        xref_position = int(pdf[pdf.rindex(b'startxref\n') + len(b'startxref\n'):].split(b'\n')[0])
+        self.assertEqual(pdf[xref_position:xref_position + 5], b'xref\n')
+        lines = pdf[xref_position:].split(b'\n')
+        first, size = map(int, lines[1].split())
+        self.assertEqual((first, lines[2]), (0, b'0000000000 65535 f '))
+        trailer = pdf[pdf.index(b'trailer\n', xref_position):]
+        self.assertIn(f'/Size {size} /Root 1 0 R'.encode(), trailer)
+
+        objects = {}
+        for object_id, line in enumerate(lines[3:size + 2], start=1):
+            offset = int(line.split()[0])
+            self.assertTrue(pdf.startswith(f'{object_id} 0 obj\n'.encode(), offset), object_id)
+            objects[object_id] = pdf[offset:pdf.index(b'\nendobj\n', offset)]
+        return objects
+
+    def content(self, body):
+        start = body.index(b'stream\n') + len(b'stream\n')
+        return zlib.decompress(body[start:body.rindex(b'\nendstream')]).decode('cp1252')
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_multi_page_statement_structure(self):
+        generated_at = datetime(2024, 7, 1, 2, 30, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=generated_at):
+            response = self.client.get(reverse('transaction-export-pdf'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        objects = self.objects(b''.join(response.streaming_content))
+
+        self.assertIn(b'/Type /Catalog /Pages 2 0 R', objects[1])
+        kids = [int(kid) for kid in objects[2].split(b'[')[1].split(b']')[0].split(b' 0 R')[:-1]]
+        self.assertGreater(len(kids), 2)
+        self.assertIn(f'/Count {len(kids)}'.encode(), objects[2])
+
+        rows = 0
+        for number, page_id in enumerate(kids, start=1):
+            self.assertIn(b'/Type /Page /Parent 2 0 R', objects[page_id])
+            content_id = int(objects[page_id].split(b'/Contents ')[1].split()[0])
+            text = self.content(objects[content_id])
+            self.assertIn(f'(Page {number}) Tj', text)
+            # Local time of the configured zone, not the server's clock
+            self.assertIn('(Generated 2024-06-30 22:30) Tj', text)
+            rows += text.count(r'Tm (Food \(daily\)) Tj')
+        self.assertEqual(rows, 150)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('metrics', password='x')
+        food = Category.objects.create(user=self.user, name='Food', type='expense')
+        Transaction.objects.create(user=self.user, category=food, type='expense', amount='4.50', date=date(2024, 1, 2))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def samples(self, view, method='GET', status='200'):
+        return {
+            'requests': self.sample('api_requests_total', view=view, method=method, status=status),
+            'latency': self.sample('api_request_duration_seconds_count', view=view, method=method),
+            'queries': self.sample('api_request_db_queries_sum', view=view),
+            'query_count': self.sample('api_request_db_queries_count', view=view),
+            'size': self.sample('api_response_size_bytes_sum', view=view),
+        }
+
+    def delta(self, before, view, **labels):
+        after = self.samples(view, **labels)
+        return {name: after[name] - before[name] for name in before}
+
+    def test_request_is_recorded_under_its_url_name(self):
+        before = self.samples('transaction-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('transaction-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(self.delta(before, 'transaction-list'), {
+            'requests': 1, 'latency': 1, 'queries': len(queries), 'query_count': 1, 'size': len(response.content),
+        })
+
+    def test_unresolved_urls_share_a_label(self):
+        before = self.samples(metrics.UNRESOLVED, status='404')
+        self.assertEqual(self.client.get('/api/no-such-endpoint/').status_code, 404)
+        self.assertEqual(self.delta(before, metrics.UNRESOLVED, status='404')['requests'], 1)
+
+    def test_streamed_responses_are_recorded_when_the_body_ends(self):
+        before = self.samples('transaction-export-csv')
+        response = self.client.get(reverse('transaction-export-csv'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.delta(before, 'transaction-export-csv')['requests'], 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            body = b''.join(response.streaming_content)
+        response.close()
+        delta = self.delta(before, 'transaction-export-csv')
+        self.assertEqual((delta['requests'], delta['latency'], delta['size']), (1, 1, len(body)))
+        # The export's own queries run while the body is sent
+        self.assertGreaterEqual(delta['queries'], len(queries))
+        self.assertGreater(len(queries), 0)
+
+    def test_execute_wrapper_counts_queries(self):
+        self.assertIn(metrics.record_query, connection.execute_wrappers)
+        recorder = metrics.QueryRecorder()
+        token = metrics._recorder.set(recorder)
+        try:
+            list(Transaction.objects.all())
+            Category.objects.count()
+        finally:
+            metrics._recorder.reset(token)
+        Category.objects.count()  # outside a request: not recorded
+        self.assertEqual(recorder.count, 2)
+        self.assertGreater(recorder.seconds, 0)
+
+    def test_exposition(self):
+        self.client.get(reverse('transaction-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        admin = User.objects.create_user('metrics-admin', password='x', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('api_requests_total{method="GET",status="200",view="transaction-list"}', text)
+        self.assertIn('api_request_db_queries_bucket{le="0.0",view="transaction-list"}', text)
+        self.assertIn('# TYPE api_request_duration_seconds histogram', text)
+
+
+class StatementImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('importer', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, text):
+        upload = io.BytesIO(text.encode('utf-8'))
+        upload.name = 'statement.csv'
+        return self.client.post(reverse('transaction-import-file'), {'file': upload}, format='multipart')
+
+    def test_malformed_rows_are_reported(self):
+        response = self.upload('\n'.join([
+            'date,type,category,amount,description',
+            '2024-01-02,expense,Food,12.50,ok',
+            '2024-01-03,expense,Food,3.00,too,many',
+            '2024-01-04,expense,Food,1e5,exponent',
+            '2024-01-05,expense,Food,"1.234,56",european',
+            '2024-01-06,expense,Food,' + '9' * 40 + ',long',
+            '2024-01-07,expense,Food,123456789.00,too large',
+            '2024-01-08,expense,Food,"$ 1,234.56",grouped',
+        ]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5, 6, 7])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('amount', flat=True)),
+            [Decimal('12.50'), Decimal('1234.56')]
+        )
+
+    def test_long_category_names_share_truncated_category(self):
+        prefix = 'x' * 50
+        response = self.upload('\n'.join([
+            'date,type,category,amount',
+            f'2024-01-02,expense,{prefix}a,1.00',
+            f'2024-01-02,expense,{prefix}b,2.00',
+        ]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(len(response.data['categories_created']), 1)
+
+    def test_rows_committed_by_a_concurrent_import_are_duplicates(self):
+        rows = ['date,type,category,amount', '2024-01-02,expense,Food,1.00', '2024-01-03,expense,Food,2.00']
+        self.assertEqual(self.upload('\n'.join(rows)).data['imported'], 2)
+
+        # The hash check runs before the other import commits, so only the unique constraint sees the overlap
+        existing_hashes = importers.TransactionImporter.existing_hashes
+        checks = iter([lambda importer, hashes: set()])
+        with mock.patch.object(importers.TransactionImporter, 'existing_hashes', autospec=True,
+                               side_effect=lambda *args: next(checks, existing_hashes)(*args)):
+            response = self.upload('\n'.join(rows + ['2024-01-04,income,Salary,3.00']))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['imported'], response.data['duplicates']), (1, 2))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+        # The rolled-back attempt left nothing behind in the rollup
+        self.assertEqual(
+            sorted(MonthlyCategoryTotal.objects.filter(user=self.user).values_list('type', 'total', 'count')),
+            [('expense', Decimal('3.00'), 2), ('income', Decimal('3.00'), 1)]
+        )
+
+
+class ReturnsTests(SimpleTestCase):
+    def portfolio(self, rows):
+        as_of = date(2024, 1, 1)
+        empty = np.array([], dtype=np.int64)
+        return returns.Portfolio(
+            ids=np.arange(len(rows), dtype=np.int64),
+            types=np.array([returns.TYPES.index(t) for t, _, _, _ in rows], dtype=np.int64),
+            invested=np.array([invested for _, invested, _, _ in rows], dtype=np.float64),
+            current=np.array([current for _, _, current, _ in rows], dtype=np.float64),
+            purchase_days=np.array([bought.toordinal() for _, _, _, bought in rows], dtype=np.int64),
+            purchase_months=np.array([returns.month_index(bought) for _, _, _, bought in rows], dtype=np.int64),
+            point_holding=empty, point_month=empty, point_value=np.array([], dtype=np.float64),
+            as_of=as_of,
+        )
+
+    def test_written_off_holding_keeps_other_rates(self):
+        stocks, crypto = returns.TYPES[0], returns.TYPES[1]
+        result = returns.compute(self.portfolio([
+            (stocks, 100, 110, date(2023, 1, 1)),
+            (crypto, 100, 0, date(2023, 1, 1)),
+        ]))
+        by_type = {row['type']: row for row in result['by_type']}
+        self.assertIsNone(by_type[crypto]['xirr_percentage'])
+        self.assertAlmostEqual(by_type[stocks]['xirr_percentage'], 10.0, delta=0.05)
+        self.assertAlmostEqual(result['portfolio']['xirr_percentage'], -45.0, delta=0.1)
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('versions', password='x')
+
+    def test_rollup_rebuild_bumps_version(self):
+        version = caching.data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollups.rebuild([self.user.pk])
+        self.assertNotEqual(caching.data_version(self.user.pk), version)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_several_workers_need_shared_cache(self):
+        caching.check_shared_cache(1)
+        with self.assertRaises(ImproperlyConfigured):
+            caching.check_shared_cache(2)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('conditional', password='x')
+        # Without signals, so the test's own writes queue the first version bump
+        [self.category] = Category.objects.bulk_create([Category(user=self.user, name='Food', type='expense')])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('transaction-list'), {
+                'category': self.category.pk, 'type': 'expense', 'amount': '5.00', 'date': '2024-01-02'
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def assertNotModifiedUntilWrite(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # One write per test: captured on_commit callbacks stay queued and would absorb a second bump
+        self.add_transaction()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_modified_until_a_write(self):
+        self.assertNotModifiedUntilWrite(reverse('transaction-list'))
+
+    def test_analytics_not_modified_until_a_write(self):
+        self.assertNotModifiedUntilWrite(reverse('dashboard-analytics'))
+
+    def test_if_modified_since(self):
+        url = reverse('monthly-summary')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_validators_change_when_the_month_rolls_over(self):
+        # Ahead of the real clock, which stamps the user's last write
+        year = timezone.now().year + 1
+        before = datetime(year, 1, 31, 23, 59, tzinfo=dt_timezone.utc)
+        after = datetime(year, 2, 1, 0, 1, tzinfo=dt_timezone.utc)
+        for url in (reverse('dashboard-analytics'), reverse('budget-progress')):
+            with mock.patch('django.utils.timezone.now', return_value=before):
+                response = self.client.get(url)
+                etag, last_modified = response['ETag'], response['Last-Modified']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            with mock.patch('django.utils.timezone.now', return_value=after):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+        # Endpoints that don't depend on the date keep their validators
+        url = reverse('category-breakdown')
+        with mock.patch('django.utils.timezone.now', return_value=before):
+            etag = self.client.get(url)['ETag']
+        with mock.patch('django.utils.timezone.now', return_value=after):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cached_bodies_are_per_day(self):
+        url = reverse('dashboard-analytics')
+        year = timezone.now().year + 1
+        before = datetime(year, 1, 31, 23, 59, tzinfo=dt_timezone.utc)
+        after = datetime(year, 2, 1, 0, 1, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=before):
+            self.assertEqual(self.client.get(url).json()['current_month_summary']['month'], 1)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with mock.patch('django.utils.timezone.now', return_value=after):
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.json()['current_month_summary']['month'], 2)
+
+
+class LedgerAssertions:
+    def ledger_totals(self):
+        """Monthly totals aggregated from the raw transactions, without the rollup code."""
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+        for t in Transaction.objects.filter(user=self.user):
+            entry = totals[(t.category_id, t.type, t.date.year, t.date.month)]
+            entry[0] += t.amount
+            entry[1] += 1
+        return {key: tuple(value) for key, value in totals.items()}
+
+    def assertRollupMatchesLedger(self):
+        stored = {
+            (row.category_id, row.type, row.year, row.month): (row.total, row.count)
+            for row in MonthlyCategoryTotal.objects.filter(user=self.user)
+        }
+        self.assertEqual(stored, self.ledger_totals())
+
+
+class RollupTests(LedgerAssertions, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rollups', password='x')
+        self.food = Category.objects.create(user=self.user, name='Food', type='expense')
+        self.rent = Category.objects.create(user=self.user, name='Rent', type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', type='income')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, category, amount, day):
+        response = self.client.post(reverse('transaction-list'), {
+            'category': category.pk, 'type': category.type, 'amount': amount, 'date': day
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_single_writes(self):
+        first = self.create(self.food, '10.00', '2024-01-05')
+        second = self.create(self.food, '2.50', '2024-01-20')
+        self.create(self.salary, '1000.00', '2024-01-31')
+        self.assertRollupMatchesLedger()
+
+        url = reverse('transaction-detail', args=[first])
+        for change in ({'amount': '12.25'}, {'date': '2024-02-01'}, {'category': self.rent.pk},
+                       {'category': self.salary.pk, 'type': 'income'}):
+            response = self.client.patch(url, change, format='json')
+            self.assertEqual(response.status_code, 200, change)
+            self.assertRollupMatchesLedger()
+
+        self.assertEqual(self.client.delete(reverse('transaction-detail', args=[second])).status_code, 204)
+        self.assertRollupMatchesLedger()
+        self.assertFalse(MonthlyCategoryTotal.objects.filter(category=self.food).exists())
+
+    def test_queryset_and_cascade_deletes(self):
+        for day in ('2024-01-05', '2024-01-06', '2024-02-07'):
+            self.create(self.food, '3.00', day)
+            self.create(self.rent, '500.00', day)
+        Transaction.objects.filter(user=self.user, date__month=1, category=self.food).delete()
+        self.assertRollupMatchesLedger()
+        self.rent.delete()
+        self.assertRollupMatchesLedger()
+
+    def test_statement_import(self):
+        self.create(self.food, '4.00', '2024-01-02')
+        upload = io.BytesIO('\n'.join([
+            'date,type,category,amount',
+            '2024-01-02,expense,Food,4.00',
+            '2024-01-03,expense,Groceries,7.10',
+            '2024-02-01,,Salary,900.00',
+            '2024-02-02,,Refund,-3.20',
+        ]).encode('utf-8'))
+        upload.name = 'statement.csv'
+        response = self.client.post(reverse('transaction-import-file'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['imported'], 4)
+        self.assertRollupMatchesLedger()
+
+    def test_rebuild_matches_ledger(self):
+        self.create(self.food, '4.00', '2024-01-02')
+        self.create(self.salary, '40.00', '2024-03-02')
+        MonthlyCategoryTotal.objects.filter(user=self.user).update(total=0, count=7)
+        rollups.rebuild([self.user.pk])
+        self.assertRollupMatchesLedger()
+        self.assertEqual(rollups.check([self.user.pk]), [])
+
+
+class MonthlySummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('summary', password='x')
+        food = Category.objects.create(user=self.user, name='Food', type='expense')
+        salary = Category.objects.create(user=self.user, name='Salary', type='income')
+        for category, amount, day in [(food, '10.00', date(2024, 1, 5)), (salary, '1000.00', date(2024, 1, 31)),
+                                      (food, '2.50', date(2024, 3, 10)), (food, '7.00', date(2023, 12, 31))]:
+            Transaction.objects.create(user=self.user, category=category, type=category.type, amount=amount, date=day)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self, **params):
+        response = self.client.get(reverse('monthly-summary'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['period']: (row['income'], row['expenses']) for row in response.json()['summary']}
+
+    def tables(self, start, end, granularity):
+        with CaptureQueriesContext(connection) as queries:
+            analytics.monthly_totals(self.user, start, end, granularity)
+        return {table for table in ('api_transaction', 'api_monthlycategorytotal')
+                if any(f'"{table}"' in query['sql'] for query in queries)}
+
+    def test_whole_months_come_from_the_rollup(self):
+        for granularity in ('month', 'quarter', 'year'):
+            with self.subTest(granularity=granularity):
+                self.assertEqual(self.tables(date(2024, 1, 1), date(2024, 12, 31), granularity),
+                                 {'api_monthlycategorytotal'})
+        # A range that cuts a month goes back to the ledger
+        self.assertEqual(self.tables(date(2024, 1, 6), date(2024, 3, 31), 'month'), {'api_transaction'})
+
+    def test_weeks_and_days_come_from_transactions(self):
+        for granularity in ('week', 'day'):
+            with self.subTest(granularity=granularity):
+                self.assertEqual(self.tables(date(2024, 1, 1), date(2024, 1, 31), granularity), {'api_transaction'})
+
+    def test_month_buckets_are_zero_filled(self):
+        summary = self.summary(year=2024)
+        self.assertEqual(len(summary), 12)
+        self.assertEqual(summary['2024-01-01'], (1000.0, 10.0))
+        self.assertEqual(summary['2024-02-01'], (0.0, 0.0))
+        self.assertEqual(summary['2024-03-01'], (0.0, 2.5))
+        self.assertEqual(sum(expenses for _, expenses in summary.values()), 12.5)
+
+        self.assertEqual(self.summary(year=2024, granularity='quarter'), {
+            '2024-01-01': (1000.0, 12.5), '2024-04-01': (0.0, 0.0), '2024-07-01': (0.0, 0.0), '2024-10-01': (0.0, 0.0),
+        })
+        self.assertEqual(self.summary(start='2023-12', end='2024-12', granularity='year'), {
+            '2023-01-01': (0.0, 7.0), '2024-01-01': (1000.0, 12.5),
+        })
+
+    def test_week_and_day_buckets_are_zero_filled(self):
+        self.assertEqual(self.summary(start='2024-01-01', end='2024-01-31', granularity='week'), {
+            '2024-01-01': (0.0, 10.0), '2024-01-08': (0.0, 0.0), '2024-01-15': (0.0, 0.0), '2024-01-22': (0.0, 0.0),
+            '2024-01-29': (1000.0, 0.0),
+        })
+        self.assertEqual(self.summary(start='2024-01-04', end='2024-01-06', granularity='day'), {
+            '2024-01-04': (0.0, 0.0), '2024-01-05': (0.0, 10.0), '2024-01-06': (0.0, 0.0),
+        })
+
+    def test_rejects_too_many_buckets(self):
+        with mock.patch.object(analytics, 'MAX_SUMMARY_BUCKETS', 12):
+            self.assertEqual(len(self.summary(year=2024)), 12)
+            response = self.client.get(reverse('monthly-summary'), {'year': 2024, 'granularity': 'week'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Range too large for week granularity'})
+
+    def test_rejects_bad_parameters(self):
+        for params, error in [({'year': 'abc'}, 'year must be an integer'),
+                              ({'start': '2024-03', 'end': '2024-01'}, 'start must not be after end'),
+                              ({'granularity': 'hour'}, 'granularity must be one of day, week, month, quarter, year')]:
+            with self.subTest(**params):
+                response = self.client.get(reverse('monthly-summary'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': error})
+
+
+class FakeLedgerTests(LedgerAssertions, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('fake', password='x')
+
+    def test_seeded_ledger(self):
+        end = date(2024, 6, 30)
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = fakedata.generate_ledger(self.user, transactions=200, months=6, budget_months=3,
+                                              investments=4, end=end, seed=7, batch_size=64)
+        self.assertEqual(counts['transactions'], 200)
+        self.assertEqual(counts['investments'], 4)
+        self.assertEqual(counts['categories'], len(fakedata.INCOME_CATEGORIES) + len(fakedata.EXPENSE_CATEGORIES))
+        self.assertEqual(counts, {
+            'categories': Category.objects.filter(user=self.user).count(),
+            'transactions': Transaction.objects.filter(user=self.user).count(),
+            'budgets': Budget.objects.filter(user=self.user).count(),
+            'investments': Investment.objects.filter(user=self.user).count(),
+            'valuations': InvestmentValuation.objects.filter(user=self.user).count(),
+        })
+        self.assertGreater(counts['budgets'], 0)
+        self.assertGreater(counts['valuations'], 0)
+
+        ledger = Transaction.objects.filter(user=self.user)
+        self.assertEqual(ledger.filter(description='Monthly salary').count(), 6)
+        self.assertFalse(ledger.exclude(date__range=(date(2024, 1, 1), end)).exists())
+        self.assertFalse(ledger.exclude(category__type=F('type')).exists())
+        self.assertFalse(Budget.objects.filter(user=self.user).exclude(year=2024, month__in=(4, 5, 6)).exists())
+        self.assertRollupMatchesLedger()
+
+        # The same seed gives the same ledger
+        other = User.objects.create_user('fake-again', password='x')
+        self.assertEqual(fakedata.generate_ledger(other, transactions=200, months=6, budget_months=3, investments=4,
+                                                  end=end, seed=7), counts)
+
+        def rows(user):
+            return sorted(Transaction.objects.filter(user=user).values_list('category__name', 'amount', 'date'))
+        self.assertEqual(rows(other), rows(self.user))
+
+    def test_generate_fake_ledger_command(self):
+        out = io.StringIO()
+        call_command('generate_fake_ledger', users=2, transactions=40, months=3, budget_months=2, investments=1,
+                     prefix='cmd', seed=3, stdout=out)
+        self.assertIn('cmd-1: 40 transactions', out.getvalue())
+        self.assertIn('Created 24 categories, 80 transactions', out.getvalue())
+        users = User.objects.filter(username__in=['cmd-1', 'cmd-2'])
+        self.assertEqual(users.count(), 2)
+        for self.user in users:
+            self.assertTrue(self.user.check_password('fake-password'))
+            self.assertRollupMatchesLedger()
+
+        out = io.StringIO()
+        call_command('generate_fake_ledger', users=2, transactions=40, prefix='cmd', stdout=out)
+        self.assertIn('Skipping 2 existing user(s)', out.getvalue())
+        self.assertEqual(Transaction.objects.filter(user__in=users).count(), 80)
+
+    def test_bench_endpoints_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            stderr = io.StringIO()
+            call_command('bench_endpoints', sizes=['small'], repeat=1, output=output.name,
+                         stdout=io.StringIO(), stderr=stderr)
+            results = json.load(output)
+        self.assertEqual(stderr.getvalue(), '')  # every route has a case
+        small = results['sizes']['small']
+        self.assertEqual(small['counts']['transactions'], 200)
+        self.assertTrue(small['cases'])
+        failed = {label: case['status'] for label, case in small['cases'].items() if case['status'] >= 500}
+        self.assertEqual(failed, {})
+
+
+class BatchTests(LedgerAssertions, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('batches', password='x')
+        self.food = Category.objects.create(user=self.user, name='Food', type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', type='income')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('transaction-batch')
+
+    def test_transaction_batches_keep_rollup_in_step(self):
+        response = self.client.post(self.url, [
+            {'category': self.food.pk, 'type': 'expense', 'amount': f'{i + 1}.00', 'date': f'2024-0{i % 3 + 1}-10'}
+            for i in range(9)
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [item['id'] for item in response.data]
+        self.assertRollupMatchesLedger()
+
+        response = self.client.patch(self.url, [
+            {'id': ids[0], 'amount': '50.00'},
+            {'id': ids[1], 'date': '2024-05-01'},
+            {'id': ids[2], 'category': self.salary.pk, 'type': 'income'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupMatchesLedger()
+
+        response = self.client.delete(self.url, {'ids': ids[:5]}, format='json')
+        self.assertEqual(response.data, {'deleted': 5})
+        self.assertRollupMatchesLedger()
+
+        response = self.client.delete(reverse('category-batch'), {'ids': [self.salary.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupMatchesLedger()
+
+    def test_updated_and_deleted_rows_are_locked(self):
+        response = self.client.post(self.url, [
+            {'category': self.food.pk, 'type': 'expense', 'amount': '1.00', 'date': '2024-01-10'},
+            {'category': self.food.pk, 'type': 'expense', 'amount': '2.00', 'date': '2024-01-11'},
+        ], format='json')
+        ids = [item['id'] for item in response.data]
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as select_for_update:
+            def locked():
+                return [call.args[0].model for call in select_for_update.call_args_list].count(Transaction)
+
+            response = self.client.patch(self.url, [{'id': ids[0], 'amount': '5.00'}], format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(locked(), 1)
+            response = self.client.delete(self.url, {'ids': ids}, format='json')
+            self.assertEqual(response.data, {'deleted': 2})
+            self.assertEqual(locked(), 2)
+        self.assertRollupMatchesLedger()
+
+    def test_invalid_item_writes_nothing(self):
+        response = self.client.post(self.url, [
+            {'category': self.food.pk, 'type': 'expense', 'amount': '1.00', 'date': '2024-01-10'},
+            {'category': self.salary.pk, 'type': 'expense', 'amount': '1.00', 'date': '2024-01-10'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertFalse(MonthlyCategoryTotal.objects.filter(user=self.user).exists())
+
+    def test_budget_batch_checks_alerts(self):
+        Transaction.objects.create(user=self.user, category=self.food, type='expense', amount=90, date=date(2024, 1, 5))
+        response = self.client.post(reverse('budget-batch'), [
+            {'category': self.food.pk, 'monthly_limit': '100.00', 'month': 1, 'year': 2024},
+            {'category': self.food.pk, 'monthly_limit': '100.00', 'month': 2, 'year': 2024},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(BudgetAlert.objects.filter(user=self.user).values_list('budget__month', 'threshold')),
+                         [(1, 80)])
+
+
+class BudgetEvaluationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('budgets', password='x')
+        self.other = User.objects.create_user('budgets-other', password='x')
+        self.food = Category.objects.create(user=self.user, name='Food', type='expense')
+        self.rent = Category.objects.create(user=self.user, name='Rent', type='expense')
+        self.fun = Category.objects.create(user=self.user, name='Fun', type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', type='income')
+        other_food = Category.objects.create(user=self.other, name='Food', type='expense')
+        for month in (1, 2, 3):
+            Budget.objects.create(user=self.user, category=self.food, monthly_limit=100, month=month, year=2024)
+        Budget.objects.create(user=self.user, category=self.rent, monthly_limit=500, month=2, year=2024)
+        Budget.objects.create(user=self.user, category=self.fun, monthly_limit=50, month=2, year=2024,
+                              is_active=False)
+        Budget.objects.create(user=self.other, category=other_food, monthly_limit=10, month=2, year=2024)
+        for category, amount, day in [
+            (self.food, '60.00', date(2024, 1, 3)), (self.food, '55.50', date(2024, 1, 28)),
+            (self.food, '20.00', date(2024, 2, 1)), (self.rent, '500.00', date(2024, 2, 1)),
+            (self.fun, '12.00', date(2024, 2, 14)), (self.salary, '3000.00', date(2024, 2, 25)),
+            (self.food, '99.00', date(2024, 4, 1)),
+        ]:
+            Transaction.objects.create(user=self.user, category=category, type=category.type, amount=amount, date=day)
+        Transaction.objects.create(user=self.other, category=other_food, type='expense', amount=5,
+                                   date=date(2024, 2, 2))
+
+    def spent(self, category, year, month):
+        """Expense total from the raw transactions."""
+        return sum((t.amount for t in Transaction.objects.filter(
+            user=self.user, category=category, type='expense', date__year=year, date__month=month
+        )), Decimal('0'))
+
+    def test_range_matches_raw_spend(self):
+        report = budgets.evaluate([self.user.pk], (2024, 1), (2024, 3))[self.user.pk]
+        self.assertEqual([m['period'] for m in report['months']],
+                         [{'month': month, 'year': 2024} for month in (1, 2, 3)])
+        total_budgeted = total_spent = Decimal('0')
+        for month_report in report['months']:
+            month = month_report['period']['month']
+            active = Budget.objects.filter(user=self.user, year=2024, month=month, is_active=True)
+            self.assertEqual({row['budget_id'] for row in month_report['category_progress']},
+                             {budget.pk for budget in active})
+            for row in month_report['category_progress']:
+                budget = active.get(pk=row['budget_id'])
+                spent = self.spent(budget.category, 2024, month)
+                self.assertEqual(row['spent_amount'], float(spent))
+                self.assertEqual(row['remaining_amount'], float(budget.monthly_limit - spent))
+                self.assertEqual(row['is_over_budget'], spent > budget.monthly_limit)
+                total_budgeted += budget.monthly_limit
+                total_spent += spent
+        self.assertEqual(report['overall_summary']['total_budgeted'], float(total_budgeted))
+        self.assertEqual(report['overall_summary']['total_spent'], float(total_spent))
+        self.assertEqual(report['overall_summary']['months_over_budget'], 1)
+        # Spend without an (active) budget is listed separately
+        self.assertEqual(report['months'][1]['categories_without_budget'],
+                         [{'category_id': self.fun.pk, 'category_name': 'Fun', 'spent_amount': 12.0}])
+
+    def test_view_matches_engine(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('budget-progress'), {'month': 2, 'year': 2024})
+        report = budgets.evaluate([self.user.pk], (2024, 2), (2024, 2))[self.user.pk]
+        self.assertEqual(response.data, report['months'][0])
+        response = client.get(reverse('budget-progress'), {'from': '2024-03', 'to': '2024-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+sent_alert_events = []
+
+
+def collect_alert_events(events):
+    sent_alert_events.extend(events)
+
+
+@override_settings(BUDGET_ALERT_THRESHOLDS=[80, 100], BUDGET_ALERT_SINKS=['api.tests.collect_alert_events'])
+class BudgetAlertTests(TestCase):
+    def setUp(self):
+        sent_alert_events.clear()
+        self.user = User.objects.create_user('alerts', password='x')
+        self.food = Category.objects.create(user=self.user, name='Food', type='expense')
+        self.budget = Budget.objects.create(user=self.user, category=self.food, monthly_limit=100, month=3, year=2024)
+
+    def spend(self, amount, day=10):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(user=self.user, category=self.food, type='expense',
+                                              amount=amount, date=date(2024, 3, day))
+
+    def alert_states(self):
+        return list(BudgetAlert.objects.filter(budget=self.budget).order_by('threshold')
+                    .values_list('threshold', 'is_active'))
+
+    def events(self):
+        return [(event['event'], event['threshold']) for event in sent_alert_events]
+
+    def test_thresholds_fire_once(self):
+        self.spend(50)
+        self.assertEqual(self.alert_states(), [])
+        self.spend(30)
+        self.assertEqual(self.alert_states(), [(80, True)])
+        self.spend(5)
+        self.spend(1, day=11)
+        self.assertEqual(self.alert_states(), [(80, True)])
+        self.spend(14)
+        self.assertEqual(self.alert_states(), [(80, True), (100, True)])
+        self.spend(100)
+        self.assertEqual(self.events(), [(alerts.CROSSED, 80), (alerts.CROSSED, 100)])
+
+    def test_clearing_and_rearming(self):
+        self.spend(85)
+        big = self.spend(20)
+        self.assertEqual(self.alert_states(), [(80, True), (100, True)])
+        with self.captureOnCommitCallbacks(execute=True):
+            big.delete()
+        self.assertEqual(self.alert_states(), [(80, True), (100, False)])
+        self.spend(15)
+        self.assertEqual(self.alert_states(), [(80, True), (100, True)])
+        self.assertEqual(self.events(), [
+            (alerts.CROSSED, 80), (alerts.CROSSED, 100), (alerts.CLEARED, 100), (alerts.CROSSED, 100),
+        ])
+
+    def test_limit_changes_and_other_months(self):
+        self.spend(70)
+        Transaction.objects.create(user=self.user, category=self.food, type='expense', amount=500,
+                                   date=date(2024, 4, 1))
+        self.assertEqual(self.alert_states(), [])
+        self.budget.monthly_limit = 70
+        self.budget.save()
+        self.assertEqual(self.alert_states(), [(80, True), (100, True)])
+
+    @override_settings(BUDGET_ALERT_WEBHOOK_URL='http://hooks.invalid/budget', BUDGET_ALERT_WEBHOOK_TIMEOUT=0.5)
+    def test_webhook_is_posted_in_the_background(self):
+        receiver_answered = threading.Event()
+        posted = []
+
+        def urlopen(request, timeout):
+            receiver_answered.wait(5)
+            posted.append((request.full_url, json.loads(request.data), timeout))
+            return io.BytesIO()
+
+        with mock.patch('urllib.request.urlopen', side_effect=urlopen):
+            alerts.webhook_sink([{'event': alerts.CROSSED}])
+            self.assertEqual(posted, [])  # returned without waiting for the receiver
+            receiver_answered.set()
+            alerts._webhook_executor.submit(lambda: None).result(5)
+        self.assertEqual(posted, [('http://hooks.invalid/budget', {'events': [{'event': alerts.CROSSED}]}, 0.5)])
+
+    @override_settings(BUDGET_ALERT_WEBHOOK_URL='http://hooks.invalid/budget')
+    def test_webhook_failures_are_logged(self):
+        with self.assertLogs('api.alerts', 'ERROR') as logs:
+            with mock.patch('urllib.request.urlopen', side_effect=OSError('timed out')):
+                alerts.webhook_sink([{'event': alerts.CROSSED}])
+                alerts._webhook_executor.submit(lambda: None).result(5)
+        self.assertIn('webhook delivery failed', logs.output[0])
+
+
+class ValuationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('valuations', password='x')
+        self.fund = Investment.objects.create(user=self.user, name='Fund', type='stocks', amount_invested=100,
+                                              current_value=100, purchase_date=date(2024, 1, 1))
+        self.coin = Investment.objects.create(user=self.user, name='Coin', type='crypto', amount_invested=50,
+                                              current_value=50, purchase_date=date(2024, 1, 1))
+        InvestmentValuation.objects.all().delete()
+
+    def test_one_row_per_investment_and_day(self):
+        for value in (110, 120, 130):
+            self.fund.current_value = value
+            self.fund.save()
+        self.fund.name = 'Renamed'
+        self.fund.save(update_fields=['name'])
+        self.assertEqual(list(InvestmentValuation.objects.values_list('investment_id', 'value')),
+                         [(self.fund.pk, Decimal('130.00'))])
+
+    def test_series_takes_last_value_per_bucket_and_carries_forward(self):
+        valuations.record([(self.fund.pk, self.user.pk, 90), (self.coin.pk, self.user.pk, 40)], on=date(2023, 12, 31))
+        valuations.record([(self.fund.pk, self.user.pk, 105)], on=date(2024, 1, 3))
+        valuations.record([(self.fund.pk, self.user.pk, 101)], on=date(2024, 1, 20))
+        valuations.record([(self.coin.pk, self.user.pk, 60)], on=date(2024, 3, 2))
+        start, end = date(2024, 1, 1), date(2024, 3, 31)
+        self.assertEqual(valuations.series(self.user, start, end, 'monthly'), [
+            {'date': date(2024, 1, 1), 'value': 141.0},
+            {'date': date(2024, 2, 1), 'value': 141.0},
+            {'date': date(2024, 3, 1), 'value': 161.0},
+        ])
+        self.assertEqual(
+            [point['value'] for point in valuations.series(self.user, start, end, 'monthly', self.fund.pk)],
+            [101.0, 101.0, 101.0]
+        )
+        daily = valuations.series(self.user, start, end, 'daily')
+        self.assertEqual(len(daily), 91)
+        self.assertEqual([daily[i]['value'] for i in (0, 2, 19, 61)], [130.0, 145.0, 141.0, 161.0])
+
+
+class RevaluationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('revaluation', password='x')
+
+        def holding(name, symbol, quantity):
+            return Investment.objects.create(user=self.user, name=name, type='stocks', symbol=symbol,
+                                             quantity=quantity, amount_invested=100, current_value=100,
+                                             purchase_date=date(2024, 1, 1))
+        self.fund = holding('Fund', 'fnd', Decimal('3.5'))
+        self.whale = holding('Whale', 'BIG', Decimal('99999999999.0000'))
+        self.unknown = holding('Unknown', 'FND', None)
+        self.unpriced = holding('Unpriced', 'XYZ', 1)
+
+    def test_out_of_range_values_are_skipped_not_fatal(self):
+        with self.assertLogs('api.revaluation', 'ERROR'):
+            report = revaluation.Revaluation({'FND': Decimal('10.005'), 'BIG': Decimal('1000')}, chunk_size=2).run()
+        self.assertEqual((report['matched'], report['updated']), (3, 1))
+        self.assertEqual(report['out_of_range'], [{'id': self.whale.pk, 'user': self.user.pk, 'symbol': 'BIG'}])
+        self.assertEqual(report['missing_quantity'], [{'id': self.unknown.pk, 'user': self.user.pk, 'symbol': 'FND'}])
+        self.assertEqual(
+            dict(Investment.objects.values_list('name', 'current_value')),
+            {'Fund': Decimal('35.02'), 'Whale': Decimal('100'), 'Unknown': Decimal('100'), 'Unpriced': Decimal('100')}
+        )
+        self.assertEqual(list(InvestmentValuation.objects.filter(investment=self.fund).values_list('value', flat=True)),
+                         [Decimal('35.02')])
+
+
+@override_settings(API_THROTTLING=False)
+class AsyncAnalyticsViewTests(TransactionTestCase):
+    # The async views query from other threads, which can't see a TestCase's transaction
+    endpoints = [
+        ('DashboardAnalyticsView', {}),
+        ('MonthlySummaryView', {'granularity': 'quarter', 'start': '2024-02', 'end': '2025-01'}),
+        ('MonthlySummaryView', {'granularity': 'fortnight'}),
+        ('CategoryBreakdownView', {'start_date': '2024-03-01', 'end_date': '2024-09-15'}),
+        ('InvestmentPerformanceView', {}),
+        ('BudgetProgressView', {'from': '2024-01', 'to': '2024-06'}),
+        ('BudgetProgressView', {'month': '13'}),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', password='x')
+        fakedata.generate_ledger(self.user, transactions=300, months=12, budget_months=6, investments=5,
+                                 end=date(2024, 12, 31), seed=1)
+
+    def get(self, view_class, params, user=None):
+        request = APIRequestFactory().get('/', params)
+        if user is not None:
+            force_authenticate(request, user)
+        view = view_class.as_view()
+        response = async_to_sync(view)(request) if view_class.view_is_async else view(request)
+        return response.render()
+
+    def test_same_responses_as_sync_views(self):
+        for name, params in self.endpoints:
+            with self.subTest(name, **params):
+                cache.clear()
+                expected = self.get(getattr(views, name), params, self.user)
+                cache.clear()
+                response = self.get(getattr(async_views, name), params, self.user)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+                self.assertEqual(response['X-Cache'], 'MISS')
+                if response.status_code == 200:
+                    self.assertTrue(response.has_header('ETag'))
+                    self.assertEqual(self.get(getattr(async_views, name), params, self.user)['X-Cache'], 'HIT')
+
+    def test_drf_authentication_and_errors(self):
+        expected = self.get(views.DashboardAnalyticsView, {})
+        response = self.get(async_views.DashboardAnalyticsView, {})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+
+    def test_query_threads_close_their_connections(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite ignores close() on an in-memory database")
+        self.assertEqual(self.get(async_views.DashboardAnalyticsView, {}, self.user).status_code, 200)
+        workers = async_views._executor._max_workers
+        open_connections = [
+            async_views._executor.submit(lambda: connections['default'].connection is not None)
+            for _ in range(workers)
+        ]
+        self.assertFalse(any(future.result() for future in open_connections))
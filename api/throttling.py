@@ -0,0 +1,253 @@
+"""
+Cost-weighted request throttling and the per-user export cap.
+
+Every request draws tokens from two buckets: one per user ('user' scope,
+authenticated requests) and one per client IP ('ip' scope, every request).
+A bucket holds as many tokens as its rate in DEFAULT_THROTTLE_RATES
+('600/min' holds 600 and refills 600 a minute), and an endpoint costs
+THROTTLE_COSTS[url name] tokens, 1 if not listed, so password hashing,
+PDF rendering and the analytics views use the budget up faster than a
+list page. A request the bucket can't pay for gets a 429 with Retry-After
+set to when it could.
+
+Buckets are kept as GCRA: one "theoretical arrival time" per key instead
+of a token count and a refill time, so a request is a single atomic
+operation. With THROTTLE_CACHE_ALIAS on Redis that is a Lua script on the
+Redis clock, shared by every process and host. Any other backend gets an
+in-process store, one dict under a lock, which limits each process
+separately.
+
+export_slot() caps the exports a user can run at once (EXPORT_CONCURRENCY
+per user). Exports stream their body after the view returns, so the slot
+is freed when the stream ends. The counter lives in the throttle cache and
+expires after EXPORT_SLOT_TIMEOUT in case a worker dies holding a slot.
+
+API_THROTTLING = False turns both off (benchmarks).
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .caching import KEY_PREFIX
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS[1] bucket; ARGV: seconds per token, seconds of burst, tokens requested.
+# Returns the wait in microseconds, 0 when the tokens were taken.
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000000 + tonumber(now_parts[2])
+local interval = tonumber(ARGV[1]) * 1000000
+local burst = tonumber(ARGV[2]) * 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval * tonumber(ARGV[3])
+local wait = new_tat - now - burst
+if wait > 0 then return wait end
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', math.ceil((new_tat - now) / 1000))
+return 0
+"""
+
+
+def parse_rate(rate):
+    """'600/min' -> (600, 60), as DRF reads DEFAULT_THROTTLE_RATES."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def get_alias():
+    return getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+
+
+def get_cache():
+    return caches[get_alias()]
+
+
+def is_enabled():
+    return getattr(settings, 'API_THROTTLING', True)
+
+
+class LocalBucketStore:
+    max_keys = 100000
+
+    def __init__(self):
+        self.tats = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key, tokens, interval, burst):
+        """Seconds to wait before `tokens` are available, or 0 after taking them."""
+        now = time.monotonic()
+        with self.lock:
+            tat = max(self.tats.get(key, now), now)
+            new_tat = tat + interval * tokens
+            wait = new_tat - now - burst
+            if wait > 0:
+                return wait
+            if len(self.tats) >= self.max_keys:
+                # Full buckets carry no state
+                self.tats = {k: v for k, v in self.tats.items() if v > now}
+            self.tats[key] = new_tat
+            return 0
+
+
+class RedisBucketStore:
+    def consume(self, key, tokens, interval, burst):
+        cache = get_cache()
+        key = cache.make_and_validate_key(key)
+        client = cache._cache.get_client(key, write=True)
+        wait = client.eval(GCRA_SCRIPT, 1, key, repr(interval), repr(burst), tokens)
+        return int(wait) / 1000000
+
+
+_stores = {}  # cache alias: store; cache objects themselves are per thread
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    alias = get_alias()
+    with _stores_lock:
+        store = _stores.get(alias)
+        if store is None:
+            store = RedisBucketStore() if isinstance(caches[alias], RedisCache) else LocalBucketStore()
+            _stores[alias] = store
+    return store
+
+
+def request_cost(request):
+    match = getattr(request, 'resolver_match', None)
+    name = match.url_name if match is not None else None
+    return getattr(settings, 'THROTTLE_COSTS', {}).get(name, 1)
+
+
+class CostThrottle(BaseThrottle):
+    """Token bucket per get_key(), charged request_cost() tokens per request."""
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None or not is_enabled():
+            return True
+        key = self.get_key(request)
+        if key is None:
+            return True
+        limit, period = parse_rate(rate)
+        # A request dearer than the whole bucket could never pass; it takes all of it
+        tokens = min(request_cost(request), limit)
+        self.wait_seconds = get_store().consume(
+            f'{KEY_PREFIX}:throttle:{self.scope}:{key}', tokens, period / limit, period
+        )
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserCostThrottle(CostThrottle):
+    scope = 'user'
+
+    def get_key(self, request):
+        user = getattr(request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+
+class IPCostThrottle(CostThrottle):
+    scope = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+# Concurrent exports
+
+def export_slot_key(user_id):
+    return f'{KEY_PREFIX}:exports:{user_id}'
+
+
+def acquire_export_slot(user_id):
+    cache = get_cache()
+    key = export_slot_key(user_id)
+    cache.add(key, 0, settings.EXPORT_SLOT_TIMEOUT)
+    try:
+        running = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, settings.EXPORT_SLOT_TIMEOUT)
+        running = 1
+    if running > settings.EXPORT_CONCURRENCY:
+        release_export_slot(user_id)
+        return False
+    return True
+
+
+def release_export_slot(user_id):
+    try:
+        get_cache().decr(export_slot_key(user_id))
+    except ValueError:
+        pass
+
+
+class ReleaseOnClose:
+    """Streaming content that frees the export slot when exhausted or closed, even if never started."""
+
+    def __init__(self, content, user_id):
+        self.content = content
+        self.iterator = iter(content)
+        self.user_id = user_id
+        self.released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            release_export_slot(self.user_id)
+        if hasattr(self.content, 'close'):
+            self.content.close()
+
+
+def export_slot(view_method):
+    """Hold one of the user's EXPORT_CONCURRENCY export slots until the response body is sent."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not is_enabled():
+            return view_method(self, request, *args, **kwargs)
+        user_id = request.user.pk
+        if not acquire_export_slot(user_id):
+            return Response(
+                {"error": f"At most {settings.EXPORT_CONCURRENCY} exports can run at once"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(settings.EXPORT_RETRY_AFTER)}
+            )
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            release_export_slot(user_id)
+            raise
+        if response.streaming:
+            response.streaming_content = ReleaseOnClose(response.streaming_content, user_id)
+        else:
+            release_export_slot(user_id)
+        return response
+    return wrapper
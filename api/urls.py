@@ -30,17 +30,23 @@ from .views import (
     RegisterView, LoginView, LogoutView,
     CategoryViewSet, TransactionViewSet,
     BudgetViewSet, InvestmentViewSet,
-    DashboardAnalyticsView, MonthlySummaryView,
-    CategoryBreakdownView, InvestmentPerformanceView,
-    BudgetProgressView
+    AnalyticsCacheStatsView,
+    BudgetAlertViewSet, InvestmentHistoryView, InvestmentReturnsView,
+    MetricsView
 )
+from . import async_views, views
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
+
+# Same URLs and responses, with concurrent sub-queries on ASGI deployments
+analytics_views = async_views if settings.ANALYTICS_ASYNC_VIEWS else views
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'budgets', BudgetViewSet, basename='budget')
 router.register(r'investments', InvestmentViewSet, basename='investment')
+router.register(r'budget-alerts', BudgetAlertViewSet, basename='budget-alert')
 
 urlpatterns = [
     # Auth
@@ -50,11 +56,16 @@ urlpatterns = [
 
     
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('analytics/dashboard/', DashboardAnalyticsView.as_view(), name='dashboard-analytics'),
-    path('analytics/monthly-summary/', MonthlySummaryView.as_view(), name='monthly-summary'),
-    path('analytics/category-breakdown/', CategoryBreakdownView.as_view(), name='category-breakdown'),
-    path('analytics/investment-performance/', InvestmentPerformanceView.as_view(), name='investment-performance'),
-    path('analytics/budget-progress/', BudgetProgressView.as_view(), name='budget-progress'),
+    path('analytics/dashboard/', analytics_views.DashboardAnalyticsView.as_view(), name='dashboard-analytics'),
+    path('analytics/monthly-summary/', analytics_views.MonthlySummaryView.as_view(), name='monthly-summary'),
+    path('analytics/category-breakdown/', analytics_views.CategoryBreakdownView.as_view(), name='category-breakdown'),
+    path('analytics/investment-performance/', analytics_views.InvestmentPerformanceView.as_view(),
+         name='investment-performance'),
+    path('analytics/budget-progress/', analytics_views.BudgetProgressView.as_view(), name='budget-progress'),
+    path('analytics/investment-returns/', InvestmentReturnsView.as_view(), name='investment-returns'),
+    path('analytics/investment-history/', InvestmentHistoryView.as_view(), name='investment-history'),
+    path('analytics/cache-stats/', AnalyticsCacheStatsView.as_view(), name='analytics-cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
     path('', include(router.urls)),
 
@@ -0,0 +1,102 @@
+"""
+Investment valuation history and downsampled time series.
+
+InvestmentValuation keeps one row per investment per day: every change of
+current_value (saves, revaluation runs) upserts today's row, so a holding
+revalued many times a day still costs one row. Series are read per
+investment or per portfolio and downsampled into daily, weekly or monthly
+buckets, taking the last value in each bucket and carrying it forward
+through buckets without a valuation.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Max
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import periods
+from .models import InvestmentValuation
+
+INTERVALS = {'daily': 'day', 'weekly': 'week', 'monthly': 'month'}
+TRUNC_FUNCTIONS = {'week': TruncWeek, 'month': TruncMonth}
+
+
+def record(rows, on=None):
+    """Upsert (investment_id, user_id, value) rows as the valuations for `on` (default today)."""
+    on = on or timezone.now().date()
+    InvestmentValuation.objects.bulk_create(
+        [
+            InvestmentValuation(investment_id=investment_id, user_id=user_id, date=on, value=value)
+            for investment_id, user_id, value in rows
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['investment', 'date'],
+        update_fields=['value'],
+    )
+
+
+def record_investments(investments, on=None):
+    record([(i.pk, i.user_id, i.current_value) for i in investments], on)
+
+
+def opening_values(valuations, start):
+    """{investment_id: value} of the last valuation before `start`, per investment."""
+    latest = (
+        valuations.filter(date__lt=start)
+        .values('investment_id').annotate(date=Max('date')).order_by()
+    )
+    latest = {row['investment_id']: row['date'] for row in latest}
+    if not latest:
+        return {}
+    rows = valuations.filter(
+        investment_id__in=list(latest), date__in=set(latest.values())
+    ).values_list('investment_id', 'date', 'value')
+    return {investment_id: value for investment_id, day, value in rows if latest[investment_id] == day}
+
+
+def bucket_rows(valuations, start, end, granularity):
+    """Yield (investment_id, bucket_start, value), keeping the last valuation in each bucket."""
+    rows = valuations.filter(**periods.date_range_filter(start, end))
+    if granularity != 'day' and connection.vendor == 'postgresql':
+        # Downsample in the database: one row per investment and bucket
+        rows = (
+            rows.annotate(bucket=TRUNC_FUNCTIONS[granularity]('date'))
+            .order_by('investment_id', 'bucket', '-date')
+            .distinct('investment_id', 'bucket')
+            .values_list('investment_id', 'bucket', 'value')
+        )
+        yield from rows.iterator(chunk_size=5000)
+        return
+
+    last = {}
+    for investment_id, day, value in (
+        rows.order_by('investment_id', 'date').values_list('investment_id', 'date', 'value').iterator(chunk_size=5000)
+    ):
+        last[(investment_id, periods.bucket_start(day, granularity))] = value
+    for (investment_id, bucket), value in last.items():
+        yield investment_id, bucket, value
+
+
+def series(user, start, end, interval='daily', investment_id=None):
+    """[{'date': bucket start, 'value': float or None}] for one investment or the whole portfolio."""
+    granularity = INTERVALS[interval]
+    valuations = InvestmentValuation.objects.filter(user=user)
+    if investment_id is not None:
+        valuations = valuations.filter(investment_id=investment_id)
+
+    by_bucket = defaultdict(dict)
+    for inv_id, bucket, value in bucket_rows(valuations, start, end, granularity):
+        by_bucket[bucket][inv_id] = value
+
+    current = opening_values(valuations, start)
+    points = []
+    for bucket in periods.iter_buckets(start, end, granularity):
+        current.update(by_bucket.get(bucket, {}))
+        points.append({
+            'date': max(bucket, start),
+            'value': float(sum(current.values(), Decimal('0'))) if current else None,
+        })
+    return points
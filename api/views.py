@@ -1,23 +1,31 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.decorators import action
-from .serializers import RegisterSerializer, LoginSerializer, CategorySerializer, TransactionSerializer, BudgetSerializer, InvestmentSerializer
-from .models import Category, Transaction, Budget, Investment
+from rest_framework.parsers import MultiPartParser
+from .serializers import RegisterSerializer, LoginSerializer, CategorySerializer, TransactionSerializer, BudgetSerializer, InvestmentSerializer, BudgetAlertSerializer
+from .models import Category, Transaction, Budget, Investment, BudgetAlert
+from . import rollups, periods, exports, statements, importers, caching, alerts, revaluation, valuations, returns, metrics, analytics, authentication
+from . import categories as category_map
+from .pagination import TransactionPagination, BudgetPagination, InvestmentPagination
+from .batch import BatchMixin
+from .caching import cached_response
+from .conditional import ConditionalGetMixin, conditional_response
+from .search import TransactionSearchFilter
+from .fastread import FastReadMixin, PercentOf
+from .throttling import export_slot
 from django_filters.rest_framework import DjangoFilterBackend
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, Q, Count, F, Case, When, Value, DecimalField, ExpressionWrapper
+from decimal import Decimal
 from rest_framework import filters
-from django.http import HttpResponse
-from io import BytesIO
-import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from django.http import FileResponse, StreamingHttpResponse, HttpResponse
+from django.utils.cache import patch_vary_headers
 
 
 
@@ -51,31 +59,41 @@ class LogoutView(APIView):
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
+            if request.auth is not None:
+                # Otherwise the access token stays valid until it expires
+                authentication.revoke(request.auth, request.user)
             return Response({"message": "Logged out successfully"}, status=status.HTTP_205_RESET_CONTENT)
         except TokenError:
             return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
         
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, BatchMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['types', 'is_ative']
+    filterset_fields = ['type', 'is_active']
+    batch_category_field = None
     
     def get_queryset(self):
-        return Category.object.filter(user=self.request.user)
+        return Category.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
         # category is tied to a login user
         serializer.save(user=self.request.user)
+    
+    def perform_batch_delete(self, queryset):
+        # The category's rollup rows cascade away with it, so skip per-transaction maintenance
+        with rollups.deferred():
+            return super().perform_batch_delete(queryset)
         
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalGetMixin, FastReadMixin, BatchMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter, filters.OrderingFilter]
     filterset_fields = ['type', 'category', 'date']
-    search_fields = ['description', 'category__name', 'amount']
+    search_fields = ['description', 'category__name', 'amount']  # fallback on databases without search indexes
     ordering_fields = ['date', 'amount', 'created_at', 'category__name']
     ordering = ['-date', '-created_at']
+    pagination_class = TransactionPagination
 
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
@@ -83,511 +101,321 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def validate_batch_update(self, instance, validated_data, categories):
+        category = validated_data.get('category') or categories.get(instance.category_id)
+        tx_type = validated_data.get('type', instance.type)
+        if category is not None and category.type != tx_type:
+            return {'non_field_errors': [f"Transaction type must match category type ({category.type})."]}
+        return None
+    
+    def perform_batch_create(self, objects):
+        super().perform_batch_create(objects)
+        rollups.apply_deltas(rollups.deltas_for(objects))
+    
+    def perform_batch_update(self, changes, fields):
+        instances = [instance for instance, _ in changes]
+        deltas = rollups.deltas_for(instances, sign=-1)
+        super().perform_batch_update(changes, fields)
+        for key, (amount, count) in rollups.deltas_for(instances).items():
+            rollups.add_delta(deltas, key, amount, count)
+        rollups.apply_deltas(deltas)
+    
+    def perform_batch_delete(self, queryset):
+        deltas = rollups.new_deltas()
+        for row in rollups.expected_totals(transactions=queryset):
+            key = (row['user_id'], row['category_id'], row['type'], row['year'], row['month'])
+            rollups.add_delta(deltas, key, -row['total'], -row['count'])
+        with rollups.deferred():
+            deleted = super().perform_batch_delete(queryset)
+        rollups.apply_deltas(deltas)
+        return deleted
+    
     @action(detail=False, methods=['get'])
+    @export_slot
     def export_csv(self, request):
-        """Export transactions to CSV"""
+        """Stream transactions as CSV, gzipped for Accept-Encoding: gzip or as a .csv.gz with ?compress=gzip"""
         transactions = self.get_queryset()
         transactions = self.filter_queryset(transactions)
         
-        response = HttpResponse(content_type='text/csv')
+        rows = exports.iter_csv(transactions, category_map.for_user(request.user))
+        if request.GET.get('compress') == 'gzip':
+            response = StreamingHttpResponse(exports.gzip_stream(rows), content_type='application/gzip')
+            response['Content-Disposition'] = 'attachment; filename="transactions.csv.gz"'
+            return response
+        
+        if exports.accepts_gzip(request):
+            response = StreamingHttpResponse(exports.gzip_stream(rows), content_type='text/csv')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(rows, content_type='text/csv')
+        patch_vary_headers(response, ('Accept-Encoding',))
         response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Bulk import a bank statement upload (CSV, OFX or JSON)"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload a statement in the 'file' field"}, status=status.HTTP_400_BAD_REQUEST)
         
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Type', 'Category', 'Amount', 'Description', 'Created'])
-        
-        for transaction in transactions:
-            writer.writerow([
-                transaction.date,
-                transaction.type,
-                transaction.category.name,
-                transaction.amount,
-                transaction.description or '',
-                transaction.created_at.strftime('%Y-%m-%d %H:%M')
-            ])
+        try:
+            file_type = importers.detect_file_type(upload.name, request.data.get('file_type'))
+            importer = importers.TransactionImporter(request.user, date_format=request.data.get('date_format'))
+            report = importer.run(upload.file, file_type)
+        except (importers.ImportFormatError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return response
+        return Response(report, status=status.HTTP_201_CREATED if report['imported'] else status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'])
+    @export_slot
     def export_pdf(self, request):
-        """Export transactions to PDF"""
+        """Export transactions as a PDF statement"""
         transactions = self.get_queryset()
         transactions = self.filter_queryset(transactions)
         
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Title
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, height - 50, f"Transaction Report - {request.user.username}")
-        
-        # Summary
-        total_income = sum(t.amount for t in transactions if t.type == 'income')
-        total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-        p.setFont("Helvetica", 12)
-        p.drawString(50, height - 80, f"Total Income: ${total_income}")
-        p.drawString(200, height - 80, f"Total Expenses: ${total_expenses}")
-        p.drawString(350, height - 80, f"Net: ${total_income - total_expenses}")
-        
-        # Headers
-        p.setFont("Helvetica-Bold", 10)
-        y = height - 120
-        p.drawString(50, y, "Date")
-        p.drawString(120, y, "Type")
-        p.drawString(180, y, "Category")
-        p.drawString(280, y, "Amount")
-        p.drawString(350, y, "Description")
-        
-        # Data
-        p.setFont("Helvetica", 9)
-        y -= 20
-        
-        for transaction in transactions:
-            if y < 50:
-                p.showPage()
-                y = height - 50
-            
-            p.drawString(50, y, str(transaction.date))
-            p.drawString(120, y, transaction.type)
-            p.drawString(180, y, transaction.category.name[:15])
-            p.drawString(280, y, f"${transaction.amount}")
-            description = transaction.description or ''
-            p.drawString(350, y, description[:20])
-            y -= 15
-        
-        p.save()
-        buffer.seek(0)
+        totals = transactions.aggregate(
+            income=Sum('amount', filter=Q(type='income')),
+            expenses=Sum('amount', filter=Q(type='expense'))
+        )
+        # Category names from the user's category map instead of a join
+        categories = category_map.for_user(request.user)
+        subtotals = [
+            {**item, 'category__name': categories.name(item['category_id'])}
+            for item in transactions
+            .values('category_id', 'type')
+            .annotate(total=Sum('amount'), count=Count('id'))
+            .order_by('type', '-total')
+        ]
+        rows = (
+            (tx_date, tx_type, categories.name(category_id), amount, description)
+            for tx_date, tx_type, category_id, amount, description in transactions.values_list(
+                'date', 'type', 'category_id', 'amount', 'description'
+            ).iterator(chunk_size=2000)
+        )
         
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="transactions.pdf"'
-        return response
+        renderer = statements.StatementRenderer(
+            f"Transaction Report - {request.user.username}", totals, subtotals
+        )
+        return FileResponse(
+            renderer.render(rows),
+            as_attachment=True,
+            filename='transactions.pdf',
+            content_type='application/pdf'
+        )
         
     
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalGetMixin, BatchMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
-    pagination_class = [IsAuthenticated]
+    permission_classes = [IsAuthenticated]
+    pagination_class = BudgetPagination
     filter_backends = [DjangoFilterBackend]
-    filterset_field = ['category', 'month', 'year', 'is_active']
+    filterset_fields = ['category', 'month', 'year', 'is_active']
     
     def get_queryset(self):
         return Budget.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+    
+    def perform_batch_create(self, objects):
+        super().perform_batch_create(objects)
+        alerts.check_budgets(objects)
+    
+    def perform_batch_update(self, changes, fields):
+        super().perform_batch_update(changes, fields)
+        alerts.check_budgets([instance for instance, _ in changes])
 
-class InvestmentViewSet(viewsets.ModelViewSet):
+
+class BudgetAlertViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = BudgetAlertSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['budget', 'threshold', 'is_active', 'budget__month', 'budget__year']
+    
+    def get_queryset(self):
+        return BudgetAlert.objects.filter(user=self.request.user).select_related('budget__category')
+
+class InvestmentViewSet(ConditionalGetMixin, FastReadMixin, viewsets.ModelViewSet):
     serializer_class = InvestmentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['type', 'purchase_date']
+    pagination_class = InvestmentPagination
+    # Investment.profit_loss and profit_loss_percentage, computed by the database for list pages
+    fast_read_annotations = {
+        'profit_loss': ExpressionWrapper(
+            F('current_value') - F('amount_invested'), output_field=DecimalField(max_digits=15, decimal_places=2)
+        ),
+        'profit_loss_percentage': Case(
+            When(amount_invested__gt=0, then=PercentOf(
+                F('current_value') - F('amount_invested'), F('amount_invested'), output_field=DecimalField()
+            )),
+            default=Value(Decimal('0')),
+            output_field=DecimalField(),
+        ),
+    }
 
     def get_queryset(self):
         return Investment.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def revalue(self, request):
+        """Revalue all users' investments from an uploaded price snapshot (staff only)"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload a price file in the 'file' field"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_type = (request.data.get('file_type') or upload.name.rsplit('.', 1)[-1]).lower()
+        try:
+            prices = revaluation.load_prices(upload.file, file_type)
+        except (revaluation.PriceFileError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(revaluation.Revaluation(prices).run())
         
 class DashboardAnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_response('dashboard')
+    @cached_response('dashboard')
     def get(self, request):
-        user = request.user
-        current_date = timezone.now().date()
-        current_month = current_date.month
-        current_year = current_date.year
-        
-        # Current month transactions
-        current_month_transactions = Transaction.objects.filter(
-            user=user,
-            date__month=current_month,
-            date__year=current_year
-        )
-        
-        # Total income and expenses for current month
-        monthly_income = current_month_transactions.filter(type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        monthly_expenses = current_month_transactions.filter(type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        # Current balance (all time)
-        all_income = Transaction.objects.filter(user=user, type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        all_expenses = Transaction.objects.filter(user=user, type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        current_balance = all_income - all_expenses
-        
-        # Top spending categories (current month)
-        top_categories = (
-            current_month_transactions
-            .filter(type='expense')
-            .values('category__name')
-            .annotate(total_spent=Sum('amount'))
-            .order_by('-total_spent')[:5]
-        )
-        
-        # Recent transactions (last 5)
-        recent_transactions = Transaction.objects.filter(user=user).order_by('-date', '-created_at')[:5]
-        recent_transactions_data = [
-            {
-                'id': t.id,
-                'amount': float(t.amount),
-                'type': t.type,
-                'category': t.category.name,
-                'description': t.description,
-                'date': t.date
-            }
-            for t in recent_transactions
-        ]
-        
-        # Investment portfolio value
-        investments = Investment.objects.filter(user=user)
-        total_invested = investments.aggregate(total=Sum('amount_invested'))['total'] or 0
-        total_current_value = investments.aggregate(total=Sum('current_value'))['total'] or 0
-        portfolio_gain_loss = total_current_value - total_invested
-        
-        # Budget progress (current month)
-        current_budgets = Budget.objects.filter(
-            user=user,
-            month=current_month,
-            year=current_year,
-            is_active=True
-        )
-        
-        budget_progress = []
-        for budget in current_budgets:
-            spent = current_month_transactions.filter(
-                category=budget.category,
-                type='expense'
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            progress_percentage = (spent / budget.monthly_limit * 100) if budget.monthly_limit > 0 else 0
-            
-            budget_progress.append({
-                'category': budget.category.name,
-                'budgeted': float(budget.monthly_limit),
-                'spent': float(spent),
-                'remaining': float(budget.monthly_limit - spent),
-                'progress_percentage': round(progress_percentage, 2),
-                'is_over_budget': spent > budget.monthly_limit
-            })
-        
-        return Response({
-            'current_month_summary': {
-                'income': float(monthly_income),
-                'expenses': float(monthly_expenses),
-                'net_income': float(monthly_income - monthly_expenses),
-                'month': current_month,
-                'year': current_year
-            },
-            'overall_summary': {
-                'total_balance': float(current_balance),
-                'total_invested': float(total_invested),
-                'portfolio_value': float(total_current_value),
-                'portfolio_gain_loss': float(portfolio_gain_loss)
-            },
-            'top_spending_categories': [
-                {
-                    'category': cat['category__name'],
-                    'amount': float(cat['total_spent'])
-                }
-                for cat in top_categories
-            ],
-            'recent_transactions': recent_transactions_data,
-            'budget_progress': budget_progress
-        })
+        today = timezone.now().date()
+        # Five independent queries plus the cached category map, regardless of how many budgets or categories the user has
+        results = analytics.run(analytics.dashboard_queries(request.user, today))
+        return Response(analytics.dashboard_payload(results, today))
         
 class MonthlySummaryView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_response('monthly-summary')
+    @cached_response('monthly-summary')
     def get(self, request):
-        user = request.user
-        current_year = timezone.now().year
-        year = int(request.GET.get('year', current_year))
-        
-        monthly_data = []
+        try:
+            start, end, granularity, year = analytics.monthly_summary_range(request.GET, timezone.now().date())
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        for month in range(1, 13):
-            month_transactions = Transaction.objects.filter(
-                user=user,
-                date__month=month,
-                date__year=year
-            )
-            
-            income = month_transactions.filter(type='income').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            expenses = month_transactions.filter(type='expense').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            monthly_data.append({
-                'month': month,
-                'income': float(income),
-                'expenses': float(expenses),
-                'net_income': float(income - expenses)
-            })
-        
-        return Response({
-            'year': year,
-            'monthly_summary': monthly_data
-        })
+        # One grouped query over the rollup, or over the ledger for partial months and finer buckets
+        results = analytics.run(analytics.monthly_summary_queries(request.user, start, end, granularity))
+        return Response(analytics.monthly_summary_payload(results, start, end, granularity, year))
         
 class CategoryBreakdownView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_response('category-breakdown')
+    @cached_response('category-breakdown')
     def get(self, request):
         user = request.user
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
         
-        # Filter transactions by date range
-        transactions = Transaction.objects.filter(user=user)
-        if start_date:
-            transactions = transactions.filter(date__gte=start_date)
-        if end_date:
-            transactions = transactions.filter(date__lte=end_date)
-        
-        # Income breakdown
-        income_breakdown = (
-            transactions.filter(type='income')
-            .values('category__name')
-            .annotate(total=Sum('amount'))
-            .order_by('-total')
-        )
-        
-        # Expense breakdown
-        expense_breakdown = (
-            transactions.filter(type='expense')
-            .values('category__name')
-            .annotate(total=Sum('amount'))
-            .order_by('-total')
-        )
+        try:
+            start = periods.parse_bound(start_date) if start_date else None
+            end = periods.parse_bound(end_date, is_end=True) if end_date else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'date_range': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'income_by_category': [
-                {
-                    'category': item['category__name'],
-                    'amount': float(item['total'])
-                }
-                for item in income_breakdown
-            ],
-            'expenses_by_category': [
-                {
-                    'category': item['category__name'],
-                    'amount': float(item['total'])
-                }
-                for item in expense_breakdown
-            ]
-        })
+        results = analytics.run(analytics.category_breakdown_queries(user, start, end))
+        return Response(analytics.category_breakdown_payload(results, start_date, end_date))
         
 class InvestmentPerformanceView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_response('investment-performance')
+    @cached_response('investment-performance')
     def get(self, request):
-        user = request.user
-        investments = Investment.objects.filter(user=user)
-        
-        # Overall portfolio summary
-        total_invested = investments.aggregate(total=Sum('amount_invested'))['total'] or 0
-        total_current_value = investments.aggregate(total=Sum('current_value'))['total'] or 0
-        total_profit_loss = total_current_value - total_invested
+        results = analytics.run(analytics.investment_performance_queries(request.user))
+        return Response(analytics.investment_performance_payload(results))
         
-        # Calculate overall percentage return
-        overall_return_percentage = 0
-        if total_invested > 0:
-            overall_return_percentage = (total_profit_loss / total_invested) * 100
-        
-        # Individual investment performance
-        individual_investments = []
-        for investment in investments:
-            individual_investments.append({
-                'id': investment.id,
-                'name': investment.name,
-                'type': investment.type,
-                'amount_invested': float(investment.amount_invested),
-                'current_value': float(investment.current_value),
-                'profit_loss': float(investment.profit_loss),
-                'profit_loss_percentage': float(investment.profit_loss_percentage),
-                'purchase_date': investment.purchase_date
-            })
-        
-        # Performance by investment type
-        type_performance = (
-            investments.values('type')
-            .annotate(
-                total_invested=Sum('amount_invested'),
-                total_current_value=Sum('current_value')
-            )
-        )
-        
-        type_breakdown = []
-        for item in type_performance:
-            invested = item['total_invested'] or 0
-            current = item['total_current_value'] or 0
-            profit_loss = current - invested
-            percentage = (profit_loss / invested * 100) if invested > 0 else 0
-            
-            type_breakdown.append({
-                'type': item['type'],
-                'total_invested': float(invested),
-                'total_current_value': float(current),
-                'profit_loss': float(profit_loss),
-                'profit_loss_percentage': round(percentage, 2)
-            })
-        
-        return Response({
-            'portfolio_summary': {
-                'total_invested': float(total_invested),
-                'total_current_value': float(total_current_value),
-                'total_profit_loss': float(total_profit_loss),
-                'overall_return_percentage': round(overall_return_percentage, 2)
-            },
-            'individual_investments': individual_investments,
-            'performance_by_type': type_breakdown
-        })
+class InvestmentReturnsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    @conditional_response('investment-returns')
+    @cached_response('investment-returns')
+    def get(self, request):
+        # ?include=holdings adds per-holding returns
+        include_holdings = 'holdings' in request.GET.get('include', '').split(',')
+        portfolio = returns.Portfolio.load(request.user)
+        return Response(returns.compute(portfolio, include_holdings=include_holdings))
         
-class BudgetProgressView(APIView):
+class InvestmentHistoryView(APIView):
     permission_classes = [IsAuthenticated]
+    max_points = 5000
     
+    @conditional_response('investment-history')
+    @cached_response('investment-history')
     def get(self, request):
         user = request.user
-        current_date = timezone.now().date()
-        month = int(request.GET.get('month', current_date.month))
-        year = int(request.GET.get('year', current_date.year))
-        
-        # Get budgets for the specified month/year
-        budgets = Budget.objects.filter(
-            user=user,
-            month=month,
-            year=year,
-            is_active=True
-        )
-        
-        # Get transactions for the same period
-        transactions_in_period = Transaction.objects.filter(
-            user=user,
-            date__month=month,
-            date__year=year,
-            type='expense'
-        )
-        
-        budget_progress = []
-        total_budgeted = 0
-        total_spent = 0
+        interval = request.GET.get('interval', 'daily')
+        if interval not in valuations.INTERVALS:
+            return Response(
+                {"error": f"interval must be one of {', '.join(valuations.INTERVALS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for budget in budgets:
-            # Calculate spending for this budget's category
-            spent = transactions_in_period.filter(
-                category=budget.category
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            remaining = budget.monthly_limit - spent
-            progress_percentage = (spent / budget.monthly_limit * 100) if budget.monthly_limit > 0 else 0
-            is_over_budget = spent > budget.monthly_limit
-            
-            budget_progress.append({
-                'category_id': budget.category.id,
-                'category_name': budget.category.name,
-                'budgeted_amount': float(budget.monthly_limit),
-                'spent_amount': float(spent),
-                'remaining_amount': float(remaining),
-                'progress_percentage': round(progress_percentage, 2),
-                'is_over_budget': is_over_budget,
-                'days_left_in_month': self.get_days_left_in_month(month, year)
-            })
-            
-            total_budgeted += budget.monthly_limit
-            total_spent += spent
+        # Default to the last year
+        today = timezone.now().date()
+        try:
+            end = periods.parse_bound(request.GET['end'], is_end=True) if request.GET.get('end') else today
+            start = periods.parse_bound(request.GET['start']) if request.GET.get('start') else end - timedelta(days=364)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": "start must not be after end"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        granularity = valuations.INTERVALS[interval]
+        if sum(1 for _ in periods.iter_buckets(start, end, granularity)) > self.max_points:
+            return Response(
+                {"error": f"At most {self.max_points} points per request, use a coarser interval"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Overall budget summary
-        overall_progress = (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0
-        overall_remaining = total_budgeted - total_spent
+        investment_id = request.GET.get('investment')
+        if investment_id is not None:
+            if not investment_id.isdigit() or not Investment.objects.filter(user=user, id=investment_id).exists():
+                return Response({"error": "Investment not found"}, status=status.HTTP_404_NOT_FOUND)
+            investment_id = int(investment_id)
         
         return Response({
-            'period': {
-                'month': month,
-                'year': year
-            },
-            'overall_summary': {
-                'total_budgeted': float(total_budgeted),
-                'total_spent': float(total_spent),
-                'total_remaining': float(overall_remaining),
-                'overall_progress_percentage': round(overall_progress, 2),
-                'is_over_overall_budget': total_spent > total_budgeted
-            },
-            'category_progress': budget_progress,
-            'categories_without_budget': self.get_categories_without_budget(user, month, year)
+            'investment': investment_id,
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'series': valuations.series(user, start, end, interval, investment_id),
         })
-    
-    def get_days_left_in_month(self, month, year):
-        from calendar import monthrange
-        current_date = timezone.now().date()
         
-        if current_date.month == month and current_date.year == year:
-            days_in_month = monthrange(year, month)[1]
-            return days_in_month - current_date.day
-        return 0
+class BudgetProgressView(APIView):
+    permission_classes = [IsAuthenticated]
     
-    def get_categories_without_budget(self, user, month, year):
-        # Find expense categories that have transactions but no budget
-        from .models import Category
-        
-        transactions_in_period = Transaction.objects.filter(
-            user=user,
-            date__month=month,
-            date__year=year,
-            type='expense'
-        )
-        
-        categories_with_spending = transactions_in_period.values_list('category_id', flat=True).distinct()
-        categories_with_budget = Budget.objects.filter(
-            user=user,
-            month=month,
-            year=year,
-            is_active=True
-        ).values_list('category_id', flat=True)
-        
-        categories_without_budget = Category.objects.filter(
-            id__in=categories_with_spending
-        ).exclude(
-            id__in=categories_with_budget
-        )
-        
-        result = []
-        for category in categories_without_budget:
-            spent = transactions_in_period.filter(
-                category=category
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            result.append({
-                'category_id': category.id,
-                'category_name': category.name,
-                'spent_amount': float(spent)
-            })
+    @conditional_response('budget-progress')
+    @cached_response('budget-progress')
+    def get(self, request):
+        # Month range: ?from=2024-01&to=2025-12, or a single month: ?month=&year=
+        try:
+            start, end, single = analytics.budget_progress_range(request.GET, timezone.now().date())
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return result
+        results = analytics.run(analytics.budget_progress_queries(request.user, start, end))
+        return Response(analytics.budget_progress_payload(results, single))
+
+
+class AnalyticsCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
     
-class TransactionViewSet(viewsets.ModelViewSet):
-    serializer_class = TransactionSerializer
-    permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['type', 'category', 'date']
-    search_fields = ['description', 'category__name', 'amount']  # Search in these fields
-    ordering_fields = ['date', 'amount', 'created_at']
-    ordering = ['-date']  # Default ordering
+    def get(self, request):
+        return Response({'endpoints': caching.stats()})
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
     
-    def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
\ No newline at end of file
+    def get(self, request):
+        # Prometheus text format, aggregated across workers in multiprocess mode
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,23 @@
+# Several workers need a shared cache (REDIS_URL); see api/caching.py.
+# Request metrics across workers: export PROMETHEUS_MULTIPROC_DIR=/some/empty/dir before starting gunicorn
+import glob
+import os
+
+
+def on_starting(server):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guy.settings')
+    from api.caching import check_shared_cache
+    check_shared_cache(server.cfg.workers)
+
+    # Values left over from a previous run would be added to this run's
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, '*.db')):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
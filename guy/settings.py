@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram lookups for transaction search
     'api',
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
@@ -44,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so latency covers the other middleware too
+    'api.metrics.MetricsMiddleware',
+    'api.routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +100,62 @@ DATABASES = {
         'PORT': '5432',
     }
 }
+
+# Read replicas: every other alias in DATABASES is a replica of 'default'. Analytics,
+# exports and list GETs read from a healthy replica (see api/routing.py). To try it
+# locally, set DATABASE_REPLICA_HOST=localhost: a second alias to the same database.
+if os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DATABASE_REPLICA_HOST'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.routing.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5  # reads stay on the primary this long after a user writes
+# A replica further behind than the sticky window could serve data older than the user's last write
+REPLICA_MAX_LAG = REPLICA_STICKY_SECONDS  # seconds, PostgreSQL only
+REPLICA_HEALTH_CHECK_INTERVAL = 10  # seconds
+# Cache
+# Local memory is only enough for a single worker process; set REDIS_URL to share
+# the cache (and analytics data versions) between workers and hosts.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+ANALYTICS_CACHE_ALIAS = 'default'
+ANALYTICS_CACHE_TIMEOUT = 300  # seconds
+
+# Under ASGI, serve the dashboard, monthly summary, category breakdown, investment performance
+# and budget progress with api/async_views.py, which runs each request's sub-queries concurrently
+# on up to ANALYTICS_QUERY_THREADS threads (and database connections) per process
+ANALYTICS_ASYNC_VIEWS = os.environ.get('ANALYTICS_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+ANALYTICS_QUERY_THREADS = int(os.environ.get('ANALYTICS_QUERY_THREADS', 8))
+
+# Budget alerts
+# Percent-of-limit thresholds, and dotted paths of callables that receive each batch of
+# alert events after commit (api.alerts.log_sink, api.alerts.webhook_sink). The webhook is
+# POSTed from a background thread; BUDGET_ALERT_WEBHOOK_TIMEOUT is in seconds.
+
+BUDGET_ALERT_THRESHOLDS = (80, 100)
+BUDGET_ALERT_SINKS = []
+BUDGET_ALERT_WEBHOOK_URL = os.environ.get('BUDGET_ALERT_WEBHOOK_URL')
+BUDGET_ALERT_WEBHOOK_TIMEOUT = float(os.environ.get('BUDGET_ALERT_WEBHOOK_TIMEOUT', 2))
+if BUDGET_ALERT_WEBHOOK_URL:
+    BUDGET_ALERT_SINKS.append('api.alerts.webhook_sink')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -138,13 +199,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # api/renderers.py: DRF's JSON, encoded by orjson
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # api/throttling.py: token buckets per user and per client IP, charged THROTTLE_COSTS
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserCostThrottle',
+        'api.throttling.IPCostThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '600/min',
+        'ip': '1200/min',
+    },
 }
 
+# Tokens a request takes from its throttle buckets, by URL name (1 when not listed)
+THROTTLE_COSTS = {
+    'login': 30,
+    'register': 60,
+    'token_refresh': 5,
+    'transaction-export-pdf': 60,
+    'transaction-export-csv': 20,
+    'transaction-import-file': 20,
+    'dashboard-analytics': 5,
+    'monthly-summary': 5,
+    'category-breakdown': 5,
+    'investment-performance': 5,
+    'budget-progress': 5,
+    'investment-returns': 10,
+    'investment-history': 10,
+}
+THROTTLE_CACHE_ALIAS = 'default'
+API_THROTTLING = os.environ.get('API_THROTTLING', '1').lower() not in ('0', 'false', 'no')
+# Exports one user can run at once, and how long a slot outlives a worker that died holding it
+EXPORT_CONCURRENCY = 2
+EXPORT_SLOT_TIMEOUT = 600
+EXPORT_RETRY_AFTER = 5  # seconds
+
+# api/fastread.py: serve full transaction and investment lists from values() rows too,
+# not only ?fields= requests
+FAST_READ_LISTS = os.environ.get('FAST_READ_LISTS', '').lower() in ('1', 'true', 'yes')
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -153,4 +255,9 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# api/authentication.py: seconds a user's authentication fields stay cached, and how often
+# each process reloads the jtis of blacklisted (logged out) access tokens
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_REVOCATION_REFRESH_SECONDS = 30
+
 CORS_ALLOW_ALL_ORIGINS = True   # (for development)
\ No newline at end of file